@@ -1,7 +1,7 @@
 import restate
 from pydantic import BaseModel
-from restate import RunOptions
 
+from .restate import Chain
 from .util.llm_call import llm_call
 
 """
@@ -30,29 +30,29 @@ class Prompt(BaseModel):
 async def run_call_chaining(ctx: restate.Context, prompt: Prompt) -> str:
     """Chains multiple LLM calls sequentially, where each step processes the previous step's output."""
 
-    # Step 1: Process the initial input with the first prompt
-    result = await ctx.run_typed(
-        "Extract metrics",
-        llm_call,
-        RunOptions(max_attempts=3),
-        prompt=f"Extract only the numerical values and their associated metrics from the text. "
-        f"Format each as 'metric name: metric' on a new line. Input: {prompt.message}",
+    chain = (
+        Chain(ctx)
+        # Step 1: Process the initial input with the first prompt
+        .step(
+            "Extract metrics",
+            lambda text: llm_call(
+                prompt=f"Extract only the numerical values and their associated metrics from the text. "
+                f"Format each as 'metric name: metric' on a new line. Input: {text}"
+            ),
+        )
+        # Step 2: Process the result from Step 1
+        .step(
+            "Sort metrics",
+            lambda metrics: llm_call(
+                prompt=f"Sort all lines in descending order by numerical value. Input: {metrics}"
+            ),
+        )
+        # Step 3: Process the result from Step 2
+        .step(
+            "Format as table",
+            lambda sorted_metrics: llm_call(
+                prompt=f"Format the sorted data as a markdown table with columns 'Metric Name' and 'Value'. Input: {sorted_metrics}"
+            ),
+        )
     )
-
-    # Step 2: Process the result from Step 1
-    result2 = await ctx.run_typed(
-        "Sort metrics",
-        llm_call,
-        RunOptions(max_attempts=3),
-        prompt=f"Sort all lines in descending order by numerical value. Input: {result}",
-    )
-
-    # Step 3: Process the result from Step 2
-    result3 = await ctx.run_typed(
-        "Format as table",
-        llm_call,
-        RunOptions(max_attempts=3),
-        prompt=f"Format the sorted data as a markdown table with columns 'Metric Name' and 'Value'. Input: {result2}",
-    )
-
-    return result3
+    return await chain.run(prompt.message)
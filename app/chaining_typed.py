@@ -1,12 +1,18 @@
 import restate
 from pydantic import BaseModel
 from pydantic_ai import Agent
-from restate import RunOptions
 
-from app.restate import RestateAgent
+from app.restate import RestateAgent, journal_usage
+from app.schemas.chaining import Metric
 
 call_chaining_svc_typed = restate.Service("Call_Chaining_Service_Typed")
 
+metrics_agent = Agent[None, list[Metric]](
+    model="openai:gpt-4o",
+    output_type=list[Metric],
+    instructions="Be concise and follow instructions exactly.",
+)
+
 example_prompt = """Q3 Performance Summary:
 Our customer satisfaction score rose to 92 points this quarter.
 Revenue grew by 45% compared to last year.
@@ -18,40 +24,36 @@ class Prompt(BaseModel):
     message: str = example_prompt
 
 
+def sort_metrics(metrics: list[Metric]) -> list[Metric]:
+    """Sorts metrics in descending order by value."""
+    return sorted(metrics, key=lambda metric: metric.value, reverse=True)
+
+
+def format_metrics_table(metrics: list[Metric]) -> str:
+    """Renders metrics as a markdown table with columns 'Metric Name' and 'Value'."""
+    rows = [
+        "| {} | {} |".format(metric.name.replace("|", r"\|"), metric.display_value())
+        for metric in metrics
+    ]
+    return "\n".join(["| Metric Name | Value |", "| --- | --- |", *rows])
+
+
 @call_chaining_svc_typed.handler()
 async def run_typed_call_chaining(ctx: restate.Context, prompt: Prompt) -> str:
-    """Chains multiple LLM calls sequentially, where each step processes the previous step's output."""
+    """Extracts the metrics of a text with one LLM call, then sorts them and formats
+    them as a table locally, since neither needs a model once the metrics are structured."""
 
-    agent = Agent(
-        model="openai:gpt-4o",
-        instructions="Be concise and follow instructions exactly.",
-    )
-    restate_agent = RestateAgent(agent, restate_context=ctx)
-
-    async def agent_call(prompt_text: str) -> str:
-        result = await restate_agent.run(prompt_text)
-        return result.output
-
-    result = await ctx.run_typed(
-        "Extract metrics",
-        agent_call,
-        RunOptions(max_attempts=3),
-        prompt_text=f"Extract only the numerical values and their associated metrics from the text. "
-        f"Format each as 'metric name: metric' on a new line. Input: {prompt.message}",
+    # The agent journals its own model calls, so it isn't wrapped in a `ctx.run`.
+    restate_agent = RestateAgent[None, list[Metric]](
+        metrics_agent, ctx, step="Extract metrics"
     )
-
-    result2 = await ctx.run_typed(
-        "Sort metrics",
-        agent_call,
-        RunOptions(max_attempts=3),
-        prompt_text=f"Sort all lines in descending order by numerical value. Input: {result}",
+    result = await restate_agent.run(
+        f"Extract only the numerical values and their associated metrics from the text. "
+        f"Input: {prompt.message}"
     )
+    table = format_metrics_table(sort_metrics(result.output))
 
-    result3 = await ctx.run_typed(
-        "Format as table",
-        agent_call,
-        RunOptions(max_attempts=3),
-        prompt_text=f"Format the sorted data as a markdown table with columns 'Metric Name' and 'Value'. Input: {result2}",
-    )
+    usage = await journal_usage(ctx)
+    usage.log()
 
-    return result3
+    return table
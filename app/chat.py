@@ -0,0 +1,156 @@
+import os
+
+import logfire
+import restate
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    SystemPromptPart,
+    TextPart,
+    UserPromptPart,
+)
+from restate import ObjectContext, ObjectSharedContext
+
+from app.restate import ModelMessagesSerde, ModelRouter, RestateAgent, model_router
+
+load_dotenv()
+
+logfire.configure(send_to_logfire="if-token-present")
+logfire.instrument_pydantic_ai()
+
+# Histories are compacted once their serialized form grows past this size.
+MAX_HISTORY_BYTES = 32_000
+# Number of most recent messages that are always kept verbatim.
+KEEP_RECENT_MESSAGES = 8
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+HISTORY = "history"
+HISTORY_SERDE = ModelMessagesSerde()
+# Returned to clients as plain JSON.
+HISTORY_OUTPUT_SERDE = ModelMessagesSerde(compress_threshold=None)
+
+chat_agent = Agent(
+    "openai:gpt-4.1-mini",
+    instructions="You are a helpful assistant, keep your answers short.",
+)
+
+compaction_agent = Agent(
+    "openai:gpt-4.1-mini",
+    instructions=(
+        "Summarize the conversation below in a few sentences. Keep names, facts, "
+        "decisions and open questions, drop small talk."
+    ),
+)
+
+# Chat answers are interactive: once the chat model's recent p95 latency is over
+# this many seconds, messages go to the fallback model, if MODEL_FALLBACK sets one.
+CHAT_LATENCY_BUDGET = float(os.getenv("CHAT_LATENCY_BUDGET", "10"))
+chat_router = ModelRouter(
+    fallback=model_router.fallback,
+    latency_budgets={"Chat": CHAT_LATENCY_BUDGET},
+)
+
+example_message = "Hi, my name is Alice. What's a good name for a cat?"
+
+
+class ChatMessage(BaseModel):
+    message: str = example_message
+
+
+chat_object = restate.VirtualObject("Chat")
+
+
+def history_size(messages: list[ModelMessage]) -> int:
+    return len(ModelMessagesTypeAdapter.dump_json(messages, exclude_none=True))
+
+
+def _is_turn_start(message: ModelMessage) -> bool:
+    # Splitting a history anywhere else could separate a tool call from its result.
+    return isinstance(message, ModelRequest) and any(
+        isinstance(part, UserPromptPart) for part in message.parts
+    )
+
+
+def _transcript(messages: list[ModelMessage]) -> str:
+    lines: list[str] = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, SystemPromptPart):
+                lines.append(part.content)
+            elif isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                lines.append(f"User: {part.content}")
+            elif isinstance(part, TextPart):
+                lines.append(f"Assistant: {part.content}")
+    return "\n".join(lines)
+
+
+async def compact_history(
+    ctx: ObjectContext, messages: list[ModelMessage]
+) -> list[ModelMessage]:
+    """Bounds the size of a conversation history.
+
+    Once the history is larger than `MAX_HISTORY_BYTES`, every turn before the last
+    `KEEP_RECENT_MESSAGES` messages is replaced by a single summary message. If that
+    is still too large, the oldest remaining turns are dropped.
+
+    Args:
+        ctx: Context the summarization model call is journaled in.
+        messages: The full history, oldest message first.
+
+    Returns:
+        list[ModelMessage]: The compacted history.
+    """
+    if history_size(messages) <= MAX_HISTORY_BYTES:
+        return messages
+
+    boundaries = [i for i, m in enumerate(messages) if _is_turn_start(m)]
+    split = max(
+        (i for i in boundaries if i <= len(messages) - KEEP_RECENT_MESSAGES), default=0
+    )
+    if split > 0:
+        with logfire.span("compacting chat history", messages=split):
+            restate_agent = RestateAgent(compaction_agent, restate_context=ctx)
+            result = await restate_agent.run(_transcript(messages[:split]))
+        summary = ModelRequest(
+            parts=[SystemPromptPart(content=SUMMARY_PREFIX + result.output)]
+        )
+        messages = [summary, *messages[split:]]
+
+    # Hard cap, drop whole turns after the summary until the history fits.
+    head = messages[:1] if split > 0 else []
+    while history_size(messages) > MAX_HISTORY_BYTES:
+        next_turn = next(
+            (i for i, m in enumerate(messages) if i > len(head) and _is_turn_start(m)),
+            None,
+        )
+        if next_turn is None:
+            break
+        messages = [*head, *messages[next_turn:]]
+    return messages
+
+
+@chat_object.handler()
+async def send_message(ctx: ObjectContext, chat_message: ChatMessage) -> str:
+    """Answers a message, with the history of the conversation stored under the key."""
+    history = await ctx.get(HISTORY, serde=HISTORY_SERDE) or []
+    restate_agent = RestateAgent(
+        chat_agent, restate_context=ctx, step="Chat", model_router=chat_router
+    )
+    result = await restate_agent.run(chat_message.message, message_history=history)
+    messages = await compact_history(ctx, result.all_messages())
+    ctx.set(HISTORY, messages, serde=HISTORY_SERDE)
+    return result.output
+
+
+@chat_object.handler(kind="shared", output_serde=HISTORY_OUTPUT_SERDE)
+async def get_history(ctx: ObjectSharedContext) -> list[ModelMessage]:
+    return await ctx.get(HISTORY, serde=HISTORY_SERDE) or []
+
+
+@chat_object.handler()
+async def clear(ctx: ObjectContext) -> None:
+    ctx.clear(HISTORY)
@@ -0,0 +1,59 @@
+import urllib.parse
+
+import logfire
+from httpx import AsyncClient, Response
+from pydantic import BaseModel
+
+from app.util.hedging import hedger
+from app.util.rate_limit import raise_for_rate_limit, rate_limiter
+
+GEOCODING_URL = "https://api.mapbox.com/geocoding/v5/mapbox.places/{}.json"
+
+
+class LatLng(BaseModel):
+    lat: float
+    lng: float
+
+
+class _Feature(BaseModel):
+    center: tuple[float, float]
+    """Longitude, latitude."""
+
+
+class _GeocodingResponse(BaseModel):
+    """The fields of a Mapbox geocoding response that are used, others are skipped."""
+
+    features: list[_Feature]
+
+
+def lat_lng_from_response(content: bytes) -> LatLng | None:
+    """Validates a Mapbox geocoding response straight from its JSON bytes.
+
+    Returns the coordinates of the best match, or `None` if nothing matched.
+    """
+    features = _GeocodingResponse.model_validate_json(content).features
+    if not features:
+        return None
+    lng, lat = features[0].center
+    return LatLng(lat=lat, lng=lng)
+
+
+async def geocode(
+    client: AsyncClient, access_token: str | None, location: str
+) -> LatLng | None:
+    """Geocodes a location with Mapbox, returns `None` if it could not be found."""
+    params = {"access_token": access_token}
+    url = GEOCODING_URL.format(urllib.parse.quote(location))
+
+    async def send_request() -> Response:
+        async with rate_limiter("mapbox").limit():
+            r = await client.get(url, params=params)
+            raise_for_rate_limit("mapbox", r.status_code, r.headers)
+            r.raise_for_status()
+        return r
+
+    with logfire.span("calling geocoding API", params=params) as span:
+        r = await hedger("mapbox").run(send_request)
+        lat_lng = lat_lng_from_response(r.content)
+        span.set_attribute("response", lat_lng)
+    return lat_lng
@@ -0,0 +1,58 @@
+from typing import Any, TypeVar
+
+import logfire
+from httpx import AsyncClient
+from pydantic import BaseModel
+from restate import TerminalError
+
+from app.schemas.tavily import TavilyResponse
+from app.util.rate_limit import raise_for_rate_limit, rate_limiter
+
+SEARCH_URL = "https://api.tavily.com/search"
+
+# Tavily answers with these when the plan's or the pay-as-you-go usage limit is hit.
+USAGE_LIMIT_STATUS_CODES = frozenset({432, 433})
+
+# Searches with raw content can take a while, this matches the Tavily SDK.
+SEARCH_TIMEOUT = 60
+
+R = TypeVar("R", bound=BaseModel)
+
+
+async def search(
+    client: AsyncClient,
+    api_key: str | None,
+    query: str,
+    response_type: type[R] = TavilyResponse,
+    **params: Any,
+) -> R:
+    """Searches the web with Tavily.
+
+    The response bytes are validated straight into `response_type`, fields the model
+    does not declare (e.g. `answer`, `images` and `follow_up_questions`) are skipped
+    instead of being decoded into dicts first. Pass a narrower model to project away
+    fields that are not needed, e.g. `raw_content` when only snippets are used.
+
+    Args:
+        client: The HTTP client to send the request with.
+        api_key: The Tavily API key.
+        query: The search query.
+        response_type: The model to validate the response into.
+        **params: Other search parameters, e.g. `max_results` or `include_domains`.
+    """
+    async with rate_limiter("tavily").limit():
+        r = await client.post(
+            SEARCH_URL,
+            json={"query": query, **params},
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=SEARCH_TIMEOUT,
+        )
+        raise_for_rate_limit("tavily", r.status_code, r.headers)
+        if r.status_code in USAGE_LIMIT_STATUS_CODES:
+            # Retrying doesn't help until the plan is upgraded or the limit resets.
+            raise TerminalError(
+                "Tavily usage limit exceeded", status_code=r.status_code
+            )
+        r.raise_for_status()
+    with logfire.span("validating Tavily response", bytes=len(r.content)):
+        return response_type.model_validate_json(r.content)
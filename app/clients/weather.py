@@ -0,0 +1,92 @@
+from types import MappingProxyType
+
+import logfire
+from httpx import AsyncClient, Response
+from pydantic import BaseModel
+
+from app.util.hedging import hedger
+from app.util.rate_limit import raise_for_rate_limit, rate_limiter
+
+REALTIME_URL = "https://api.tomorrow.io/v4/weather/realtime"
+
+# https://docs.tomorrow.io/reference/data-layers-weather-codes
+WEATHER_CODES = MappingProxyType(
+    {
+        1000: "Clear, Sunny",
+        1100: "Mostly Clear",
+        1101: "Partly Cloudy",
+        1102: "Mostly Cloudy",
+        1001: "Cloudy",
+        2000: "Fog",
+        2100: "Light Fog",
+        4000: "Drizzle",
+        4001: "Rain",
+        4200: "Light Rain",
+        4201: "Heavy Rain",
+        5000: "Snow",
+        5001: "Flurries",
+        5100: "Light Snow",
+        5101: "Heavy Snow",
+        6000: "Freezing Drizzle",
+        6001: "Freezing Rain",
+        6200: "Light Freezing Rain",
+        6201: "Heavy Freezing Rain",
+        7000: "Ice Pellets",
+        7101: "Heavy Ice Pellets",
+        7102: "Light Ice Pellets",
+        8000: "Thunderstorm",
+    }
+)
+
+
+class _RealtimeValues(BaseModel):
+    temperatureApparent: float
+    weatherCode: int
+
+
+class _RealtimeData(BaseModel):
+    values: _RealtimeValues
+
+
+class _RealtimeResponse(BaseModel):
+    """The fields of a Tomorrow.io realtime response that are used, others are skipped."""
+
+    data: _RealtimeData
+
+
+class WeatherReport(BaseModel):
+    temperature: str
+    description: str
+
+    @classmethod
+    def from_response(cls, content: bytes) -> "WeatherReport":
+        """Validates a Tomorrow.io realtime response straight from its JSON bytes."""
+        values = _RealtimeResponse.model_validate_json(content).data.values
+        return cls(
+            temperature=f"{values.temperatureApparent}°C",
+            description=WEATHER_CODES.get(values.weatherCode, "Unknown"),
+        )
+
+
+async def fetch_weather(
+    client: AsyncClient, api_key: str | None, lat: float, lng: float
+) -> WeatherReport:
+    """Fetches the current weather at a location from Tomorrow.io."""
+    params = {
+        "apikey": api_key,
+        "location": f"{lat},{lng}",
+        "units": "metric",
+    }
+
+    async def send_request() -> Response:
+        async with rate_limiter("tomorrow_io").limit():
+            r = await client.get(REALTIME_URL, params=params)
+            raise_for_rate_limit("tomorrow_io", r.status_code, r.headers)
+            r.raise_for_status()
+        return r
+
+    with logfire.span("calling weather API", params=params) as span:
+        r = await hedger("tomorrow_io").run(send_request)
+        report = WeatherReport.from_response(r.content)
+        span.set_attribute("response", report)
+    return report
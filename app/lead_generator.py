@@ -1,20 +1,28 @@
 import json
 import os
-from typing import List
+from datetime import timedelta
 
 import logfire
 import restate
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from httpx import AsyncClient
 from pydantic_ai import Agent
+from pydantic_ai.usage import UsageLimits
 from restate import RunOptions
-from tavily import AsyncTavilyClient
 
-from app.restate import RestateAgent
+from app.clients import tavily
+from app.restate import (
+    RestateAgent,
+    WorkflowBudget,
+    invocation_usage,
+    journal_usage,
+    set_budget,
+)
 from app.schemas.lead_generator import (
     Company,
+    LeadSearchSummary,
     LinkedInLeadQueries,
-    TavilyResponse,
+    TierQueryResults,
     TopLeads,
     TopLeadsWithMessaging,
 )
@@ -24,33 +32,28 @@ from app.system_prompts.lead_generator import (
     structured_instructions,
     unstructured_instructions,
 )
+from app.util.artifacts import artifact_sink
+from app.util.prompts import log_prompt_cache_usage
+from app.util.top_k import TieredTopK
 
 load_dotenv()
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
-logfire.configure(send_to_logfire="if-token-present")
-logfire.instrument_pydantic_ai()
-
-
-class QueryResults(BaseModel):
-    query: str
-    description: str
-    results: TavilyResponse
-
-
-class TierResults(BaseModel):
-    name: str
-    description: str
-    priority: int
-    results: List[QueryResults]
+# Number of highest scoring search results per priority tier handed to the scoring agent.
+TOP_LEADS_QUOTAS = {1: 50}
 
+# A bad query plan can run up the searches, the lead lists sent to the scoring and
+# outreach agents grow with them, so the budget covers every step of an invocation.
+LEAD_GENERATOR_BUDGET = WorkflowBudget(
+    limits=UsageLimits(request_limit=30, total_tokens_limit=500_000),
+    wall_time=timedelta(minutes=15),
+    degraded_model="openai:gpt-4.1-mini",
+    max_degraded_part_chars=40_000,
+)
 
-class Leads(BaseModel):
-    company_context: str
-    total_tiers: int
-    usage_instructions: List[str]
-    tiers: List[TierResults]
+logfire.configure(send_to_logfire="if-token-present")
+logfire.instrument_pydantic_ai()
 
 
 lead_generator_service = restate.Service("Lead_Generator_Service")
@@ -63,20 +66,23 @@ async def run_lead_generator(ctx: restate.Context, company: Company) -> str:
     "what_we_do": "{company.what_we_do}"
     "target_market": "{company.target_market}"
     """
+    invocation_id = ctx.request().id
+    await set_budget(ctx, LEAD_GENERATOR_BUDGET)
     with logfire.span("Generating leads") as span:
         unstructured_leads_agent = Agent(
             "openai:gpt-4.1",
             instructions=unstructured_instructions,
             retries=2,
         )
+        # The agents are called directly rather than inside a `ctx.run`: their model
+        # calls are journaled already, so a replay adds their usage up again before
+        # the budget checks of the steps that follow.
         unstructured_restate_agent = RestateAgent(
-            unstructured_leads_agent, restate_context=ctx
+            unstructured_leads_agent,
+            restate_context=ctx,
+            step="Freeform leads generator",
         )
 
-        async def unstructured_agent_call(prompt_text: str) -> str:
-            result = await unstructured_restate_agent.run(prompt_text)
-            return result.output
-
         structured_leads_agent = Agent[None, LinkedInLeadQueries](
             "openai:gpt-4.1-mini",
             instructions=structured_instructions,
@@ -85,84 +91,78 @@ async def run_lead_generator(ctx: restate.Context, company: Company) -> str:
         )
 
         structured_restate_agent: RestateAgent[None, LinkedInLeadQueries] = (
-            RestateAgent(structured_leads_agent, restate_context=ctx)
+            RestateAgent(
+                structured_leads_agent,
+                restate_context=ctx,
+                step="Structured leads generator",
+            )
         )
 
-        async def structured_leads_agent_call(prompt_text: str) -> LinkedInLeadQueries:
-            result = await structured_restate_agent.run(prompt_text)
-            return result.output
-
         with logfire.span("Generating Query Plan") as span:
-            unstructured_output: str = await ctx.run_typed(
-                "Freeform leads generator",
-                unstructured_agent_call,
-                RunOptions(max_attempts=3, type_hint=str),
-                prompt_text=prompt,
-            )
+            unstructured_result = await unstructured_restate_agent.run(prompt)
+            unstructured_output = unstructured_result.output
         with logfire.span("Generating Structured Query Config") as span:
-            structured_output: LinkedInLeadQueries = await ctx.run_typed(
-                "Structured leads generator",
-                structured_leads_agent_call,
-                RunOptions(max_attempts=3, type_hint=LinkedInLeadQueries),
-                prompt_text=f"Structure these LinkedIn search queries for automated lead generation: {unstructured_output}",
+            structured_result = await structured_restate_agent.run(
+                f"Structure these LinkedIn search queries for automated lead generation: {unstructured_output}"
             )
-
-        async def query_executor_call(structured_output: LinkedInLeadQueries):
-            tavily_client = AsyncTavilyClient(api_key=TAVILY_API_KEY)
-
-            company_context = structured_output.company_context
-            total_tiers = structured_output.total_tiers
-            usage_instructions = structured_output.usage_instructions
-            tiers = structured_output.priority_tiers
-
-            tier_results = []
-            for tier in tiers:
-                with logfire.span(f"Tier {tier.priority_level} queries") as span:
-                    name = tier.tier_name
-                    description = tier.tier_description
-                    priority = tier.priority_level
-                    query_results = []
-                    for q in tier.queries:
-                        with logfire.span(f"{q.query}", query=q.query) as span:
-                            query = f"{q.query} site:linkedin.com"
-                            response = await tavily_client.search(
-                                query=query,
-                                include_raw_content=True,
-                                max_results=10,
-                                include_domains=["linkedin.com"],
-                            )
-                            query_results.append(
-                                QueryResults(
+            structured_output = structured_result.output
+
+        async def query_executor_call(
+            structured_output: LinkedInLeadQueries,
+        ) -> LeadSearchSummary:
+            # Each query's results are streamed to leads.ndjson as soon as the search
+            # completes, and only the top candidates are kept in memory and journaled.
+            selector = TieredTopK(
+                TOP_LEADS_QUOTAS, key=lambda x: x.score, tie_breaker=lambda x: x.url
+            )
+            total_queries = 0
+            total_results = 0
+
+            async with (
+                AsyncClient() as client,
+                artifact_sink.stream(invocation_id, "leads.ndjson") as stream,
+            ):
+                for tier in structured_output.priority_tiers:
+                    with logfire.span(f"Tier {tier.priority_level} queries") as span:
+                        for q in tier.queries:
+                            invocation_usage(ctx).check_budget()
+                            with logfire.span(f"{q.query}", query=q.query) as span:
+                                query = f"{q.query} site:linkedin.com"
+                                response = await tavily.search(
+                                    client,
+                                    TAVILY_API_KEY,
+                                    query,
+                                    include_raw_content=True,
+                                    max_results=10,
+                                    include_domains=["linkedin.com"],
+                                )
+                                query_results = TierQueryResults(
+                                    tier=tier.tier_name,
+                                    priority=tier.priority_level,
                                     query=q.query,
                                     description=q.description,
-                                    results=TavilyResponse(**response),
+                                    results=response,
                                 )
-                            )
-                    tier_results.append(
-                        TierResults(
-                            name=name,
-                            description=description,
-                            priority=priority,
-                            results=query_results,
-                        )
-                    )
-            return Leads(
-                company_context=company_context,
-                total_tiers=total_tiers,
-                usage_instructions=usage_instructions,
-                tiers=tier_results,
+                                await stream.emit(query_results)
+                                results = query_results.results.results
+                                selector.extend(tier.priority_level, results)
+                                total_queries += 1
+                                total_results += len(results)
+
+            return LeadSearchSummary(
+                company_context=structured_output.company_context,
+                total_queries=total_queries,
+                total_results=total_results,
+                top_results=selector.result(),
             )
 
         with logfire.span("Executing queries") as span:
-            leads: Leads = await ctx.run_typed(
+            search_summary: LeadSearchSummary = await ctx.run_typed(
                 "Executing queries",
                 query_executor_call,
-                RunOptions(max_attempts=3, type_hint=Leads),
+                RunOptions(max_attempts=3, type_hint=LeadSearchSummary),
                 structured_output,
             )
-        with logfire.span("Saving leads") as span:
-            with open("leads.json", "w", encoding="utf-8") as f:
-                json.dump(leads.model_dump(), f, indent=2)
 
         top_leads = [
             {
@@ -171,17 +171,7 @@ async def run_lead_generator(ctx: restate.Context, company: Company) -> str:
                 "content": lead.content,
                 "score": lead.score,
             }
-            for lead in sorted(
-                (
-                    result
-                    for tier in leads.tiers
-                    if tier.priority == 1
-                    for query_results in tier.results
-                    for result in query_results.results.results
-                ),
-                key=lambda x: x.score,
-                reverse=True,
-            )
+            for lead in search_summary.top_results
         ]
 
         scoring_instructions = generate_lead_scoring_instructions(company)
@@ -193,23 +183,17 @@ async def run_lead_generator(ctx: restate.Context, company: Company) -> str:
             retries=2,
         )
         scoring_restate_agent = RestateAgent[None, TopLeads](
-            scoring_agent, restate_context=ctx
+            scoring_agent, restate_context=ctx, step="Scoring top leads"
         )
 
-        async def scoring_agent_call(prompt_text: str) -> TopLeads:
-            result = await scoring_restate_agent.run(prompt_text)
-            return result.output
-
         with logfire.span("Scoring top leads") as span:
-            scored_leads: TopLeads = await ctx.run_typed(
-                "Scoring top leads",
-                scoring_agent_call,
-                RunOptions(max_attempts=3, type_hint=TopLeads),
-                prompt_text=json.dumps(top_leads, indent=2),
+            scoring_result = await scoring_restate_agent.run(
+                json.dumps(top_leads, indent=2)
             )
+            log_prompt_cache_usage("Lead scoring agent", scoring_result.usage())
+            scored_leads = scoring_result.output
         with logfire.span("Saving scored leads") as span:
-            with open("scored_leads.json", "w", encoding="utf-8") as f:
-                json.dump(scored_leads.model_dump(), f, indent=2)
+            await artifact_sink.write(invocation_id, "scored_leads.json", scored_leads)
 
         outreach_instructions = generate_outreach_content_instructions(company)
 
@@ -220,22 +204,21 @@ async def run_lead_generator(ctx: restate.Context, company: Company) -> str:
             retries=2,
         )
         outreach_restate_agent = RestateAgent[None, TopLeadsWithMessaging](
-            outreach_agent, restate_context=ctx
+            outreach_agent, restate_context=ctx, step="Enriching top leads"
         )
 
-        async def outreach_agent_call(prompt_text: str) -> TopLeadsWithMessaging:
-            result = await outreach_restate_agent.run(prompt_text)
-            return result.output
-
         with logfire.span("Enriching top leads") as span:
-            enriched_leads: TopLeadsWithMessaging = await ctx.run_typed(
-                "Enriching top leads",
-                outreach_agent_call,
-                RunOptions(max_attempts=3, type_hint=TopLeadsWithMessaging),
-                prompt_text=json.dumps(scored_leads.model_dump(), indent=2),
+            outreach_result = await outreach_restate_agent.run(
+                json.dumps(scored_leads.model_dump(), indent=2)
             )
+            log_prompt_cache_usage("Outreach agent", outreach_result.usage())
+            enriched_leads = outreach_result.output
         with logfire.span("Saving enriched leads") as span:
-            with open("enriched_leads.json", "w", encoding="utf-8") as f:
-                json.dump(enriched_leads.model_dump(), f, indent=2)
+            await artifact_sink.write(
+                invocation_id, "enriched_leads.json", enriched_leads
+            )
+
+        usage = await journal_usage(ctx)
+        usage.log()
 
         return enriched_leads.model_dump()
@@ -7,6 +7,7 @@ from hypercorn.asyncio import serve
 
 from app.chaining import call_chaining_svc
 from app.chaining_typed import call_chaining_svc_typed
+from app.chat import chat_object
 from app.lead_generator import lead_generator_service
 from app.message import message_service
 from app.search import search_service
@@ -19,6 +20,7 @@ app = restate.app(
     services=[
         call_chaining_svc_typed,
         call_chaining_svc,
+        chat_object,
         lead_generator_service,
         message_service,
         search_service,
@@ -1,11 +1,50 @@
 from ._agent import RestateAgent
+from ._budget import WorkflowBudget
+from ._chain import CHAIN_INPUT, Chain
+from ._mcp_pool import MCPSessionPool, mcp_session_pool
 from ._model import RestateModelWrapper
-from ._serde import PydanticTypeAdapter
-from ._toolset import RestateContextRunToolset
+from ._policy import RunPolicy, RunPolicyRegistry, run_policies
+from ._routing import ModelRoute, ModelRouter, model_router
+from ._serde import ModelMessagesSerde, PydanticTypeAdapter
+from ._toolset import (
+    BATCHED_TOOL_METADATA,
+    PURE_TOOL_METADATA,
+    MCPToolCache,
+    RestateContextRunToolset,
+    mcp_tool_cache,
+)
+from ._usage import (
+    InvocationUsage,
+    StepUsage,
+    invocation_usage,
+    journal_usage,
+    set_budget,
+)
 
 __all__ = [
+    "BATCHED_TOOL_METADATA",
+    "CHAIN_INPUT",
+    "Chain",
+    "InvocationUsage",
+    "MCPSessionPool",
+    "MCPToolCache",
+    "ModelMessagesSerde",
+    "ModelRoute",
+    "ModelRouter",
+    "PURE_TOOL_METADATA",
     "PydanticTypeAdapter",
     "RestateAgent",
     "RestateContextRunToolset",
     "RestateModelWrapper",
+    "RunPolicy",
+    "RunPolicyRegistry",
+    "StepUsage",
+    "WorkflowBudget",
+    "invocation_usage",
+    "journal_usage",
+    "mcp_session_pool",
+    "mcp_tool_cache",
+    "model_router",
+    "run_policies",
+    "set_budget",
 ]
@@ -21,6 +21,8 @@ from pydantic_ai.usage import RunUsage, UsageLimits
 from restate import Context, TerminalError
 
 from ._model import RestateModelWrapper
+from ._policy import RunPolicyRegistry, run_policies
+from ._routing import ModelRouter, model_router
 from ._toolset import RestateContextRunToolset
 
 
@@ -65,6 +67,14 @@ class RestateAgent(WrapperAgent[AgentDepsT, OutputDataT]):
             result = await agent.run(f'What is the weather in {city}?', deps=WeatherDeps(restate_context=ctx, ...))
             return result.output
        ...
+    How often tool and model calls are retried, and how long a single attempt may
+    take, is configured per tool name in a `RunPolicyRegistry`, by default the process
+    wide `run_policies`.
+    The usage of every agent in an invocation is added up by `step`, by default the
+    agent's name or else its model's, see `invocation_usage` and `journal_usage`.
+    A `WorkflowBudget` set with `set_budget` applies to all of them together.
+    Which model serves a call is decided per step by a `ModelRouter`, by default the
+    process wide `model_router`.
     """
 
     def __init__(
@@ -73,6 +83,9 @@ class RestateAgent(WrapperAgent[AgentDepsT, OutputDataT]):
         restate_context: Context,
         *,
         disable_auto_wrapping_tools: bool = False,
+        run_policies: RunPolicyRegistry = run_policies,
+        step: str | None = None,
+        model_router: ModelRouter = model_router,
     ):
         super().__init__(wrapped)
         if not isinstance(wrapped.model, Model):
@@ -80,7 +93,11 @@ class RestateAgent(WrapperAgent[AgentDepsT, OutputDataT]):
                 "An agent needs to have a `model` in order to be used with Restate, it cannot be set at agent run time."
             )
         self._model = RestateModelWrapper(
-            wrapped.model, restate_context, max_attempts=3
+            wrapped.model,
+            restate_context,
+            policy=run_policies.model,
+            step=step or wrapped.name,
+            router=model_router,
         )
 
         def set_context(
@@ -90,7 +107,7 @@ class RestateAgent(WrapperAgent[AgentDepsT, OutputDataT]):
             if isinstance(toolset, FunctionToolset) and not disable_auto_wrapping_tools:
                 return cast(
                     AbstractToolset[AgentDepsT],
-                    RestateContextRunToolset(toolset, restate_context),
+                    RestateContextRunToolset(toolset, restate_context, run_policies),
                 )
             try:
                 from pydantic_ai.mcp import MCPServer
@@ -205,7 +222,7 @@ class RestateAgent(WrapperAgent[AgentDepsT, OutputDataT]):
                 "An agent needs to have a `model` in order to be used with Restate, it cannot be set at agent run time."
             )
         with self._restate_overrides():
-            return await super(WrapperAgent, self).run(
+            result = await super(WrapperAgent, self).run(
                 user_prompt=user_prompt,
                 output_type=output_type,
                 message_history=message_history,
@@ -219,3 +236,6 @@ class RestateAgent(WrapperAgent[AgentDepsT, OutputDataT]):
                 toolsets=toolsets,
                 event_stream_handler=event_stream_handler,
             )
+        # Model calls are added as they are made, tool calls once the run is done.
+        self._model.usage.record_tool_calls(self._model.step, result.usage().tool_calls)
+        return result
@@ -0,0 +1,86 @@
+from dataclasses import dataclass, replace
+from datetime import timedelta
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelRequestPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models import KnownModelName, Model
+from pydantic_ai.usage import RunUsage, UsageLimits
+
+from restate import TerminalError
+
+TRUNCATION_MARKER = " [truncated]"
+
+
+@dataclass(frozen=True)
+class WorkflowBudget:
+    """A budget for all agents of an invocation together.
+
+    Once any share of the budget reaches `degrade_at`, model calls switch to
+    `degraded_model` and long prompts and tool results are cut to
+    `max_degraded_part_chars`. Once it is used up, the next model call fails the
+    invocation with a `TerminalError`.
+    """
+
+    limits: UsageLimits | None = None
+    """Token and request limits, checked against the usage of the whole invocation."""
+    wall_time: timedelta | None = None
+    """How long the invocation may take, from when the budget was set."""
+    degrade_at: float = 0.8
+    degraded_model: Model | KnownModelName | str | None = None
+    max_degraded_part_chars: int | None = None
+
+    def used(self, usage: RunUsage, elapsed: float) -> float:
+        """The largest share of any limit that has been used, 1 or more once exceeded."""
+        shares = [0.0]
+        if self.limits is not None:
+            for used, limit in (
+                (usage.requests, self.limits.request_limit),
+                (usage.tool_calls, self.limits.tool_calls_limit),
+                (usage.input_tokens, self.limits.input_tokens_limit),
+                (usage.output_tokens, self.limits.output_tokens_limit),
+                (usage.total_tokens, self.limits.total_tokens_limit),
+            ):
+                if limit is not None:
+                    shares.append(used / limit if limit else float("inf"))
+        if self.wall_time is not None:
+            shares.append(elapsed / self.wall_time.total_seconds())
+        return max(shares)
+
+    def check(self, service: str, usage: RunUsage, elapsed: float) -> bool:
+        """Raises a `TerminalError` once the budget is used up.
+
+        Returns:
+            Whether model calls should be degraded.
+        """
+        used = self.used(usage, elapsed)
+        if used >= 1:
+            raise TerminalError(
+                f"{service} used up its budget after {usage.requests} model calls, "
+                f"{usage.total_tokens} tokens and {elapsed:.0f}s"
+            )
+        return used >= self.degrade_at
+
+
+def _truncate_part(part: ModelRequestPart, max_chars: int) -> ModelRequestPart:
+    if isinstance(part, (UserPromptPart, ToolReturnPart)):
+        content = part.content
+        if isinstance(content, str) and len(content) > max_chars:
+            return replace(part, content=content[:max_chars] + TRUNCATION_MARKER)
+    return part
+
+
+def truncate_messages(
+    messages: list[ModelMessage], max_chars: int
+) -> list[ModelMessage]:
+    """Cuts user prompts and tool results longer than `max_chars`, leaving the rest."""
+    return [
+        replace(message, parts=[_truncate_part(p, max_chars) for p in message.parts])
+        if isinstance(message, ModelRequest)
+        else message
+        for message in messages
+    ]
@@ -0,0 +1,153 @@
+import asyncio
+import inspect
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import restate
+from restate import Context
+
+from ._policy import RunPolicy
+from ._serde import PydanticTypeAdapter
+
+CHAIN_INPUT = "input"
+"""The name under which steps get the input of the chain."""
+
+
+@dataclass(frozen=True)
+class ChainStep:
+    name: str
+    action: Callable[..., Any | Awaitable[Any]]
+    inputs: tuple[str, ...]
+    serde: PydanticTypeAdapter[Any]
+    policy: RunPolicy
+    durable: bool
+
+
+async def _call(action: Callable[..., Any | Awaitable[Any]], *args: Any) -> Any:
+    """Calls a step's action, awaiting what it returns if that is awaitable.
+
+    Restate only awaits actions that are coroutine functions and journals whatever
+    any other action returns, so a lambda returning a coroutine has to be wrapped.
+    Blocking actions still run in a thread, like Restate runs them.
+    """
+    if inspect.iscoroutinefunction(action):
+        return await action(*args)
+    output = await asyncio.to_thread(action, *args)
+    if inspect.isawaitable(output):
+        output = await output
+    return output
+
+
+class Chain:
+    """A chain of steps, each journaled with `ctx.run_typed` under its own name.
+
+    A step gets the outputs of the steps named in its `inputs`, by default the step
+    before it. Steps whose inputs are all available run concurrently, so
+    independent steps don't wait for each other. They are started in the order they
+    were added, which keeps the journal the same on replay.
+
+    A step whose action is durable by itself, such as a `RestateAgent` run, whose
+    model and tool calls are journaled already, is added with `durable=True` and
+    called directly. Wrapping it in a `ctx.run` as well would journal its own
+    entries inside the step's, which a replay of the step skips. Durable steps run
+    one at a time, in the order they were added, so their entries keep their order.
+
+    Example:
+        ```python
+        chain = (
+            Chain(ctx)
+            .step("Summarize", summarize)
+            .step("Translate", translate, inputs=["input"])
+            .step("Combine", combine, inputs=["Summarize", "Translate"])
+        )
+        result = await chain.run(prompt.message)
+        ```
+    """
+
+    def __init__(self, ctx: Context, policy: RunPolicy = RunPolicy(max_attempts=3)):
+        """
+        Args:
+            ctx: The Restate context the steps are journaled in.
+            policy: How steps are retried, unless a step has its own policy.
+        """
+        self.ctx = ctx
+        self.policy = policy
+        self.steps: list[ChainStep] = []
+
+    def step(
+        self,
+        name: str,
+        action: Callable[..., Any | Awaitable[Any]],
+        *,
+        inputs: Sequence[str] | None = None,
+        output_type: Any = str,
+        policy: RunPolicy | None = None,
+        durable: bool = False,
+    ) -> "Chain":
+        """Adds a step, returning the chain so that calls can be chained.
+
+        Args:
+            name: The name the step is journaled under.
+            action: Called with the outputs of `inputs`, in order.
+            inputs: Earlier steps, or `CHAIN_INPUT`, the step depends on.
+            output_type: The type of the step's output, used to journal it.
+            policy: How the step is retried, the chain's policy if not given.
+            durable: Whether `action` journals itself, rather than in a `ctx.run`.
+                `output_type` and `policy` don't apply to it then.
+        """
+        known = {CHAIN_INPUT, *(step.name for step in self.steps)}
+        if name in known:
+            raise ValueError(f"Duplicate chain step {name!r}")
+        if inputs is None:
+            inputs = [self.steps[-1].name if self.steps else CHAIN_INPUT]
+        if unknown := [i for i in inputs if i not in known]:
+            raise ValueError(f"Chain step {name!r} depends on unknown steps {unknown}")
+        self.steps.append(
+            ChainStep(
+                name=name,
+                action=action,
+                inputs=tuple(inputs),
+                serde=PydanticTypeAdapter(output_type),
+                policy=policy or self.policy,
+                durable=durable,
+            )
+        )
+        return self
+
+    async def run_all(self, input: Any) -> dict[str, Any]:
+        """Runs the chain, returning the output of every step by name."""
+        outputs: dict[str, Any] = {CHAIN_INPUT: input}
+        pending = list(self.steps)
+        while pending:
+            ready = [s for s in pending if all(i in outputs for i in s.inputs)]
+            journaled = [s for s in ready if not s.durable]
+            futures = [
+                self.ctx.run_typed(
+                    step.name,
+                    _call,
+                    step.policy.run_options(step.serde),
+                    step.action,
+                    *(outputs[i] for i in step.inputs),
+                )
+                for step in journaled
+            ]
+            for step in ready:
+                if step.durable:
+                    output = step.action(*(outputs[i] for i in step.inputs))
+                    if inspect.isawaitable(output):
+                        output = await output
+                    outputs[step.name] = output
+            if len(futures) > 1:
+                await restate.gather(*futures)
+            for step, future in zip(journaled, futures):
+                outputs[step.name] = await future
+            pending = [s for s in pending if s.name not in outputs]
+        return outputs
+
+    async def run(self, input: Any) -> Any:
+        """Runs the chain, returning the output of its last step."""
+        if not self.steps:
+            return input
+        outputs = await self.run_all(input)
+        return outputs[self.steps[-1].name]
@@ -0,0 +1,223 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+
+import logfire
+from pydantic_ai.mcp import MCPServer
+
+
+@dataclass(eq=False)
+class _PooledSession:
+    server: MCPServer
+    ready: asyncio.Future[None]
+    stop: asyncio.Event = field(default_factory=asyncio.Event)
+    task: asyncio.Task[None] | None = None
+    check: asyncio.Task[bool] | None = None
+    """The health check in progress, shared by everyone acquiring the session."""
+    last_used: float = field(default_factory=time.monotonic)
+    last_checked: float = field(default_factory=time.monotonic)
+
+
+class MCPSessionPool:
+    """Keeps MCP server sessions open across Restate invocations.
+
+    `RestateAgent` is created per invocation, and an `MCPServer` closes its session,
+    and for stdio servers stops the subprocess, as soon as the last agent run using it
+    exits. The pool holds every server it hands out entered, so agent runs only bump
+    the server's reference count instead of paying the process spawn and handshake.
+
+    Each session is owned by a background task, since the MCP client has to be exited
+    from the task that entered it. Sessions idle for longer than `idle_timeout` are
+    closed, by a reaper task that runs every `reap_interval` seconds while sessions
+    are open, and the least recently used one is closed when more than `max_sessions`
+    servers are open. A session that was not used for `health_check_interval` seconds
+    is pinged before it is handed out again and reopened if the ping fails. Sessions
+    an agent run is still using are never closed.
+
+    The lock only guards the bookkeeping: opening, pinging and closing sessions
+    happens outside of it, so a slow server doesn't hold up the others.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_sessions: int = 8,
+        idle_timeout: float = 300,
+        reap_interval: float = 60,
+        health_check_interval: float = 30,
+        health_check_timeout: float = 5,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        # Keyed by `id()`, as MCP servers are unhashable.
+        self._sessions: dict[int, _PooledSession] = {}
+        self._lock = asyncio.Lock()
+        self._reaper: asyncio.Task[None] | None = None
+
+    async def acquire(self, server: MCPServer) -> None:
+        """Makes sure `server` has an open, healthy session."""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                evicted = self._evict(now, keep=server)
+                session = self._sessions.get(id(server))
+                if session is None:
+                    session = self._open(server)
+                elif (
+                    session.check is None
+                    and session.ready.done()
+                    and not self._in_use(session)
+                    and now - session.last_checked >= self.health_check_interval
+                ):
+                    session.check = asyncio.create_task(self._healthy(session))
+                check = session.check
+                session.last_used = now
+                self._start_reaper()
+            await self._stop(*evicted)
+            # Shielded, so that a cancelled caller doesn't fail the others waiting.
+            await asyncio.shield(session.ready)
+            if check is None or await asyncio.shield(check):
+                return
+            async with self._lock:
+                self._discard(session)
+            await self._stop(session)
+
+    async def close(self, server: MCPServer | None = None) -> None:
+        """Closes the pooled session of `server`, or every session if it is `None`."""
+        async with self._lock:
+            sessions = [
+                session
+                for session in self._sessions.values()
+                if server is None or session.server is server
+            ]
+            for session in sessions:
+                self._discard(session)
+            if server is None and self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+        await self._stop(*sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _open(self, server: MCPServer) -> _PooledSession:
+        """Starts opening a session, which is ready once `session.ready` is done."""
+        session = _PooledSession(server, asyncio.get_running_loop().create_future())
+
+        async def hold() -> None:
+            try:
+                async with server:
+                    session.ready.set_result(None)
+                    logfire.info("Opened MCP session", server=repr(server))
+                    await session.stop.wait()
+            except Exception as e:
+                if not session.ready.done():
+                    session.ready.set_exception(e)
+                else:
+                    logfire.error(
+                        "MCP session failed", server=repr(server), _exc_info=e
+                    )
+            finally:
+                if not session.ready.done():
+                    session.ready.cancel()
+                self._discard(session)
+
+        session.task = asyncio.create_task(hold(), name=f"mcp-session {server!r}")
+        self._sessions[id(server)] = session
+        return session
+
+    def _discard(self, session: _PooledSession) -> None:
+        if self._sessions.get(id(session.server)) is session:
+            del self._sessions[id(session.server)]
+
+    async def _stop(self, *sessions: _PooledSession) -> None:
+        for session in sessions:
+            session.stop.set()
+        await asyncio.gather(
+            *(s.task for s in sessions if s.task is not None), return_exceptions=True
+        )
+
+    async def _healthy(self, session: _PooledSession) -> bool:
+        try:
+            if session.task is None or session.task.done():
+                return False
+            # `MCPServer` has no public ping, the client session does.
+            client = getattr(session.server, "_client", None)
+            if client is None:
+                return False
+            try:
+                await asyncio.wait_for(client.send_ping(), self.health_check_timeout)
+            except Exception as e:
+                logfire.warn(
+                    "MCP health check failed", server=repr(session.server), error=e
+                )
+                return False
+            session.last_checked = time.monotonic()
+            return True
+        finally:
+            session.check = None
+
+    def _in_use(self, session: _PooledSession) -> bool:
+        # The session is closed by whichever task exits the server last, which must be
+        # the task that entered it, so only sessions no agent run is using are closed.
+        return session.server._running_count > 1
+
+    def _evictable(self, session: _PooledSession, keep: MCPServer | None) -> bool:
+        return (
+            session.server is not keep
+            and session.ready.done()
+            and session.check is None
+            and not self._in_use(session)
+        )
+
+    def _evict(self, now: float, keep: MCPServer | None) -> list[_PooledSession]:
+        """Removes idle sessions, and the least recently used ones over
+        `max_sessions`, from the pool, returning them to be stopped."""
+        evicted = [
+            s
+            for s in self._sessions.values()
+            if self._evictable(s, keep) and now - s.last_used > self.idle_timeout
+        ]
+        if keep is not None:
+            others = sorted(
+                (
+                    s
+                    for s in self._sessions.values()
+                    if s not in evicted and self._evictable(s, keep)
+                ),
+                key=lambda s: s.last_used,
+            )
+            # Leave room for `keep`, whether it is open already or not.
+            open_others = sum(
+                1
+                for s in self._sessions.values()
+                if s.server is not keep and s not in evicted
+            )
+            excess = open_others + 1 - self.max_sessions
+            evicted += others[: max(0, excess)]
+        for session in evicted:
+            self._discard(session)
+        return evicted
+
+    def _start_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap(), name="mcp-session-reaper")
+
+    async def _reap(self) -> None:
+        """Closes idle sessions in the background, until none are left."""
+        while self._sessions:
+            await asyncio.sleep(self.reap_interval)
+            async with self._lock:
+                idle = self._evict(time.monotonic(), keep=None)
+            await self._stop(*idle)
+
+
+mcp_session_pool = MCPSessionPool(
+    max_sessions=int(os.getenv("MCP_MAX_SESSIONS", "8")),
+    idle_timeout=float(os.getenv("MCP_SESSION_IDLE_TIMEOUT", "300")),
+    reap_interval=float(os.getenv("MCP_SESSION_REAP_INTERVAL", "60")),
+)
@@ -1,24 +1,212 @@
+import hashlib
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
 from typing import Any
 
-from pydantic_ai.messages import ModelResponse
-from pydantic_ai.models import Model
+import logfire
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models import Model, infer_model
 from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_core import to_json
 
+from app.restate._budget import truncate_messages
+from app.restate._policy import RunPolicy, run_policies
+from app.restate._routing import ModelRouter, model_router
 from app.restate._serde import PydanticTypeAdapter
-from restate import Context, RunOptions
+from app.restate._usage import (
+    invocation_usage,
+    record_model_call_metrics,
+    record_model_call_timeout,
+)
+from app.util.rate_limit import RateLimited, find_rate_limiter, parse_retry_after
+from restate import Context
 
-MODEL_RESPONSE_SERDE = PydanticTypeAdapter(ModelResponse)
+
+@dataclass
+class RestateModelCallResult:
+    """The journaled result of a model call."""
+
+    response: ModelResponse
+    history_digest: str
+    """Digest of the message history the response was generated for."""
+    duration: float | None = None
+    """Seconds the model took to respond."""
+    model: str | None = None
+    """The model the call was routed to."""
+
+
+MODEL_CALL_SERDE = PydanticTypeAdapter(RestateModelCallResult, exclude_none=True)
+
+
+def _retry_after(error: ModelHTTPError) -> float | None:
+    # The provider SDK error the model raised from carries the HTTP response.
+    response = getattr(error.__cause__, "response", None)
+    headers = getattr(response, "headers", None)
+    return parse_retry_after(headers) if headers is not None else None
+
+
+def _without_timestamps(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _without_timestamps(v) for k, v in value.items() if k != "timestamp"}
+    if isinstance(value, list):
+        return [_without_timestamps(v) for v in value]
+    return value
+
+
+class MessageHistoryDigest:
+    """An incrementally updated digest of the message history of an agent run.
+
+    Messages are only ever appended during a run, so each model call hashes just the
+    messages added since the previous call instead of the whole conversation.
+    Timestamps are left out, as requests get new ones when a handler is replayed.
+    """
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self._count = 0
+        self._last: ModelMessage | None = None
+
+    def update(self, messages: list[ModelMessage]) -> str:
+        if len(messages) < self._count or (
+            self._count and messages[self._count - 1] is not self._last
+        ):
+            # A different history, e.g. from a new run of the same agent.
+            self._hash = hashlib.sha256()
+            self._count = 0
+        delta = messages[self._count :]
+        if delta:
+            dumped = ModelMessagesTypeAdapter.dump_python(
+                delta, mode="json", exclude_none=True
+            )
+            for message in dumped:
+                self._hash.update(to_json(_without_timestamps(message)))
+            self._count = len(messages)
+            self._last = messages[-1]
+        return self._hash.hexdigest()[:16]
 
 
 class RestateModelWrapper(WrapperModel):
     def __init__(
-        self, wrapped: Model, context: Context, max_attempts: int | None = None
+        self,
+        wrapped: Model,
+        context: Context,
+        max_attempts: int | None = None,
+        policy: RunPolicy | None = None,
+        step: str | None = None,
+        router: ModelRouter | None = None,
     ):
         super().__init__(wrapped)
-        self.options = RunOptions(serde=MODEL_RESPONSE_SERDE, max_attempts=max_attempts)
+        self.policy = policy or run_policies.model
+        if max_attempts is not None:
+            self.policy = replace(self.policy, max_attempts=max_attempts)
+        self.options = self.policy.run_options(MODEL_CALL_SERDE)
         self.context = context
+        self.history_digest = MessageHistoryDigest()
+        self.usage = invocation_usage(context)
+        self.step = step or wrapped.model_name
+        self.router = router or model_router
+        self._degraded_model: Model | None = None
+
+    def _degrade(
+        self, messages: list[ModelMessage]
+    ) -> tuple[Model, list[ModelMessage]]:
+        """The model and messages to use once the invocation is low on budget."""
+        budget = self.usage.budget
+        assert budget is not None
+        model = self.wrapped
+        if budget.degraded_model is not None:
+            if self._degraded_model is None:
+                self._degraded_model = infer_model(budget.degraded_model)
+            model = self._degraded_model
+        if budget.max_degraded_part_chars is not None:
+            messages = truncate_messages(messages, budget.max_degraded_part_chars)
+        logfire.warn(
+            "{service} is low on budget, calling {model}",
+            service=self.usage.service,
+            step=self.step,
+            model=model.model_name,
+        )
+        return model, messages
+
+    async def _attempt(
+        self,
+        model: Model,
+        messages: list[ModelMessage],
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> ModelResponse:
+        health = self.router.health(model)
+        limiter = find_rate_limiter(model.system)
+        async with limiter.limit() if limiter else nullcontext():
+            start = time.perf_counter()
+            try:
+                response = await self.policy.attempt(
+                    model.request(messages, *args, **kwargs)
+                )
+            except TimeoutError:
+                # A timeout counts towards the latency too, it took at least that long.
+                health.record(ok=False, latency=time.perf_counter() - start)
+                record_model_call_timeout(self.usage, self.step, model.model_name)
+                raise
+            except ModelHTTPError as e:
+                health.record(ok=False)
+                if e.status_code == 429:
+                    raise RateLimited(model.system, _retry_after(e)) from e
+                raise
+            except Exception:
+                health.record(ok=False)
+                raise
+        health.record(ok=True, latency=time.perf_counter() - start)
+        return response
+
+    async def request(
+        self, messages: list[ModelMessage], *args: Any, **kwargs: Any
+    ) -> ModelResponse:
+        # Only the response is journaled, together with a digest of the history it
+        # answers, so the journal grows linearly with the length of the run.
+        digest = self.history_digest.update(messages)
+
+        async def routed_request() -> RestateModelCallResult:
+            # The model is picked inside the journaled action, so a replay returns
+            # the same response whatever the budget, clock or model health by then.
+            model = self.router.choose(self.wrapped, self.step, messages)
+            request_messages = messages
+            if self.usage.check_budget():
+                model, request_messages = self._degrade(messages)
+            start = time.perf_counter()
+            try:
+                response = await self._attempt(model, request_messages, args, kwargs)
+            except TimeoutError:
+                fallback = self.router.fallback_for(model)
+                if fallback is None:
+                    raise
+                logfire.warn(
+                    "{model} timed out, falling back to {fallback}",
+                    model=model.model_name,
+                    fallback=fallback.model_name,
+                    step=self.step,
+                )
+                model = fallback
+                response = await self._attempt(model, request_messages, args, kwargs)
+            duration = time.perf_counter() - start
+            record_model_call_metrics(self.usage, self.step, response.usage, duration)
+            return RestateModelCallResult(
+                response=response,
+                history_digest=digest,
+                duration=duration,
+                model=model.model_name,
+            )
 
-    async def request(self, *args: Any, **kwargs: Any) -> ModelResponse:
-        return await self.context.run_typed(
-            "Model call", self.wrapped.request, self.options, *args, **kwargs
+        result = await self.context.run_typed(
+            "Model call", routed_request, self.options
         )
+        if result.history_digest != digest:
+            logfire.warn(
+                "Model call replayed with a different message history",
+                journaled=result.history_digest,
+                current=digest,
+            )
+        self.usage.record_request(self.step, result.response.usage, result.duration)
+        return result.response
@@ -0,0 +1,111 @@
+import asyncio
+import dataclasses
+import os
+from collections.abc import Awaitable
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TypeVar
+
+from restate import RunOptions
+from restate.serde import Serde
+
+T = TypeVar("T")
+
+# Retry interval options only exist in newer Restate SDKs.
+_RUN_OPTIONS_FIELDS = {f.name for f in dataclasses.fields(RunOptions)}
+_RETRY_INTERVAL_FIELDS = {
+    "initial_retry_interval",
+    "retry_interval_factor",
+    "max_retry_interval",
+}
+
+
+@dataclass(frozen=True)
+class RunPolicy:
+    """How a tool call or model call is retried by Restate."""
+
+    max_attempts: int | None = None
+    """Attempts, including the first one, before Restate gives up, `None` retries forever."""
+    max_retry_duration: timedelta | None = None
+    """How long Restate keeps retrying, `None` retries forever."""
+    initial_retry_interval: timedelta | None = None
+    """Delay before the first retry, ignored by Restate SDKs without retry intervals."""
+    retry_interval_factor: float | None = None
+    """Factor the retry interval grows by after every attempt."""
+    max_retry_interval: timedelta | None = None
+    """Upper bound for the retry interval."""
+    attempt_timeout: timedelta | None = None
+    """Time after which a single attempt is abandoned and counted as failed."""
+    fast_fail: bool = False
+    """Don't retry at all. A failing tool reports its error back to the model instead,
+    a failing model call ends the run."""
+
+    def run_options(self, serde: Serde[T]) -> RunOptions[T]:
+        options = RunOptions(
+            serde=serde,
+            max_attempts=1 if self.fast_fail else self.max_attempts,
+            max_retry_duration=self.max_retry_duration,
+        )
+        intervals: dict[str, timedelta | float] = {
+            name: value
+            for name in _RETRY_INTERVAL_FIELDS & _RUN_OPTIONS_FIELDS
+            if (value := getattr(self, name)) is not None
+        }
+        if intervals:
+            options = dataclasses.replace(options, **intervals)
+        return options
+
+    async def attempt(self, awaitable: Awaitable[T]) -> T:
+        """Awaits one attempt, bounded by `attempt_timeout`."""
+        if self.attempt_timeout is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, self.attempt_timeout.total_seconds())
+
+
+class RunPolicyRegistry:
+    """Run policies by tool name, with one policy for model calls.
+
+    Example:
+        ```python
+        run_policies.register(
+            "get_weather",
+            RunPolicy(max_attempts=3, attempt_timeout=timedelta(seconds=5)),
+        )
+        run_policies.model = RunPolicy(max_attempts=5)
+        ```
+    """
+
+    def __init__(
+        self,
+        default: RunPolicy = RunPolicy(),
+        model: RunPolicy = RunPolicy(max_attempts=3),
+    ):
+        """
+        Args:
+            default: Policy for tools without a registered policy.
+            model: Policy for model calls.
+        """
+        self.default = default
+        self.model = model
+        self._tools: dict[str, RunPolicy] = {}
+
+    def register(self, tool_name: str, policy: RunPolicy) -> None:
+        self._tools[tool_name] = policy
+
+    def get(self, tool_name: str) -> RunPolicy:
+        return self._tools.get(tool_name, self.default)
+
+
+run_policies = RunPolicyRegistry(
+    model=RunPolicy(
+        max_attempts=3,
+        attempt_timeout=timedelta(
+            seconds=float(os.getenv("MODEL_ATTEMPT_TIMEOUT", "120"))
+        ),
+        # Restate retries a step by replaying the invocation, so how long a model
+        # call keeps retrying can only be bounded by Restate itself.
+        max_retry_duration=timedelta(
+            seconds=float(os.getenv("MODEL_STEP_TIMEOUT", "600"))
+        ),
+    )
+)
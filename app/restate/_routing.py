@@ -0,0 +1,167 @@
+import math
+import os
+from collections import deque
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+
+from pydantic_ai.messages import ModelMessage, ModelRequest
+from pydantic_ai.models import KnownModelName, Model, infer_model
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """Sends matching model calls to `model` instead of the agent's own model.
+
+    Routed models should come from the same provider as the agent's, so they
+    understand the same request parameters.
+    """
+
+    model: Model | KnownModelName | str
+    steps: frozenset[str] = field(default_factory=frozenset)
+    """Steps the route applies to, every step if empty."""
+    max_prompt_chars: int | None = None
+    """Only route calls whose messages have at most this many characters of text."""
+
+    def matches(self, step: str, prompt_chars: int) -> bool:
+        if self.steps and step not in self.steps:
+            return False
+        return self.max_prompt_chars is None or prompt_chars <= self.max_prompt_chars
+
+
+def prompt_chars(messages: list[ModelMessage]) -> int:
+    """The number of characters of text in the requests of a message history."""
+    return sum(
+        len(part.content)
+        for message in messages
+        if isinstance(message, ModelRequest)
+        for part in message.parts
+        if isinstance(getattr(part, "content", None), str)
+    )
+
+
+class ModelHealth:
+    """The outcome and latency of the last `window` calls to a model."""
+
+    def __init__(self, window: int):
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def record(self, ok: bool, latency: float | None = None) -> None:
+        """Records a call, with how long it took unless it failed before answering."""
+        self._outcomes.append(ok)
+        if latency is not None:
+            self._latencies.append(latency)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    @property
+    def calls(self) -> int:
+        return len(self._outcomes)
+
+    @property
+    def p95(self) -> float | None:
+        """The 95th percentile latency of the recent calls in seconds, if any."""
+        if not self._latencies:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)]
+
+
+class ModelRouter:
+    """Picks the model for every model call of a `RestateModelWrapper`.
+
+    The first matching route wins, otherwise the agent's model is used. A model
+    whose recent error rate is above `max_error_rate`, or whose recent p95 latency is
+    above the step's latency budget, is skipped in favour of `fallback`, which also
+    gets a second try at calls that timed out, see `RunPolicy.attempt_timeout`.
+
+    Routing happens inside the journaled model call, so replays return the journaled
+    response of whichever model was picked.
+    """
+
+    def __init__(
+        self,
+        routes: Iterable[ModelRoute] = (),
+        fallback: Model | KnownModelName | str | None = None,
+        max_error_rate: float = 0.5,
+        health_window: int = 20,
+        min_health_calls: int = 5,
+        latency_budgets: Mapping[str, float] | None = None,
+    ):
+        """
+        Args:
+            routes: The routes, in order of precedence.
+            fallback: The model to use when the picked model is unhealthy or timed out.
+            max_error_rate: Error rate above which a model is considered unhealthy.
+            health_window: How many recent calls the error rate is taken over.
+            min_health_calls: Calls needed before a model can be considered unhealthy.
+            latency_budgets: Per step, the p95 latency in seconds a model may have.
+        """
+        self.routes = list(routes)
+        self.fallback = fallback
+        self.max_error_rate = max_error_rate
+        self.health_window = health_window
+        self.min_health_calls = min_health_calls
+        self.latency_budgets = dict(latency_budgets or {})
+        self._models: dict[str, Model] = {}
+        self._health: dict[str, ModelHealth] = {}
+
+    def add(self, route: ModelRoute) -> None:
+        self.routes.append(route)
+
+    def _model(self, model: Model | KnownModelName | str) -> Model:
+        if isinstance(model, Model):
+            return model
+        if model not in self._models:
+            self._models[model] = infer_model(model)
+        return self._models[model]
+
+    def health(self, model: Model) -> ModelHealth:
+        key = f"{model.system}:{model.model_name}"
+        if key not in self._health:
+            self._health[key] = ModelHealth(self.health_window)
+        return self._health[key]
+
+    def healthy(self, model: Model) -> bool:
+        health = self.health(model)
+        return (
+            health.calls < self.min_health_calls
+            or health.error_rate <= self.max_error_rate
+        )
+
+    def within_budget(self, model: Model, step: str) -> bool:
+        """Whether the recent p95 latency of `model` fits the latency budget of `step`."""
+        budget = self.latency_budgets.get(step)
+        health = self.health(model)
+        if budget is None or health.calls < self.min_health_calls:
+            return True
+        p95 = health.p95
+        return p95 is None or p95 <= budget
+
+    def fallback_for(self, model: Model) -> Model | None:
+        if self.fallback is None:
+            return None
+        fallback = self._model(self.fallback)
+        return None if fallback.model_name == model.model_name else fallback
+
+    def choose(self, default: Model, step: str, messages: list[ModelMessage]) -> Model:
+        """The model to call for `step` with `messages`."""
+        model = default
+        if self.routes:
+            chars = prompt_chars(messages)
+            for route in self.routes:
+                if route.matches(step, chars):
+                    model = self._model(route.model)
+                    break
+        usable = self.healthy(model) and self.within_budget(model, step)
+        if not usable and (fallback := self.fallback_for(model)):
+            return fallback
+        return model
+
+
+model_router = ModelRouter(fallback=os.getenv("MODEL_FALLBACK") or None)
+"""The process wide router, used by every `RestateAgent` unless given another."""
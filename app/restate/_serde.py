@@ -1,6 +1,8 @@
 import typing
+import zlib
 
 from pydantic import TypeAdapter
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
 
 from restate.serde import Serde
 
@@ -10,12 +12,20 @@ T = typing.TypeVar("T")
 class PydanticTypeAdapter(Serde[T]):
     """A serializer/deserializer for Pydantic models."""
 
-    def __init__(self, model_type: type[T]):
+    def __init__(self, model_type: type[T], exclude_none: bool = False):
         """Initializes a new instance of the PydanticTypeAdaptorSerde class.
         Args:
             model_type (typing.Type[T]): The Pydantic model type to serialize/deserialize.
+            exclude_none (bool): Whether to leave out fields that are `None`, only safe
+                when every such field defaults to `None`.
         """
         self._model_type = TypeAdapter(model_type)
+        self._exclude_none = exclude_none
+        # Building a TypeAdapter is expensive, so keep one per serialized type. Values
+        # of a parametrized generic, e.g. `Result[LatLng]`, are instances of `Result`.
+        self._adapters: dict[typing.Any, TypeAdapter[typing.Any]] = {
+            typing.get_origin(model_type) or model_type: self._model_type
+        }
 
     def deserialize(self, buf: bytes) -> T | None:
         """Deserializes a bytearray to a Pydantic model.
@@ -37,5 +47,39 @@ class PydanticTypeAdapter(Serde[T]):
         """
         if obj is None:
             return b""
-        tpe = TypeAdapter(type(obj))
-        return tpe.dump_json(obj)
+        tpe = self._adapters.get(type(obj))
+        if tpe is None:
+            tpe = self._adapters[type(obj)] = TypeAdapter(type(obj))
+        return tpe.dump_json(obj, exclude_none=self._exclude_none)
+
+
+class ModelMessagesSerde(Serde[list[ModelMessage]]):
+    """A compact serializer/deserializer for conversation histories.
+
+    Fields that are `None` are left out, and payloads larger than `compress_threshold`
+    bytes are zlib compressed. Compressed and plain payloads can be told apart by their
+    first byte, so the threshold can be changed without migrating stored histories.
+    """
+
+    def __init__(self, compress_threshold: int | None = 4096):
+        """Initializes a new instance of the ModelMessagesSerde class.
+        Args:
+            compress_threshold (int | None): Size in bytes above which payloads are
+                compressed, `None` never compresses.
+        """
+        self.compress_threshold = compress_threshold
+
+    def deserialize(self, buf: bytes) -> list[ModelMessage] | None:
+        if not buf:
+            return None
+        if not buf.startswith(b"["):
+            buf = zlib.decompress(buf)
+        return ModelMessagesTypeAdapter.validate_json(buf)
+
+    def serialize(self, obj: list[ModelMessage] | None) -> bytes:
+        if obj is None:
+            return b""
+        buf = ModelMessagesTypeAdapter.dump_json(obj, exclude_none=True)
+        if self.compress_threshold is not None and len(buf) > self.compress_threshold:
+            return zlib.compress(buf)
+        return buf
@@ -1,31 +1,97 @@
 from __future__ import annotations
 
+import os
+import time
 from collections.abc import Callable
-from dataclasses import dataclass
-from typing import Any, Literal
+from dataclasses import dataclass, replace
+from typing import Any, Generic, Literal, Self, TypeVar, get_type_hints
 
+import logfire
+from mcp import types as mcp_types
+from pydantic import PydanticSchemaGenerationError, TypeAdapter, ValidationError
 from pydantic_ai import ToolDefinition
+from pydantic_ai._function_schema import FunctionSchema
 from pydantic_ai._run_context import AgentDepsT
 from pydantic_ai.exceptions import ApprovalRequired, CallDeferred, ModelRetry, UserError
 from pydantic_ai.mcp import MCPServer, ToolResult
+from pydantic_ai.messages import ModelResponse, ToolCallPart
 from pydantic_ai.tools import RunContext
 from pydantic_ai.toolsets.abstract import AbstractToolset, ToolsetTool
 from pydantic_ai.toolsets.wrapper import WrapperToolset
 
 from restate import Context, RunOptions, TerminalError
 
+from ._mcp_pool import mcp_session_pool
+from ._policy import RunPolicy, RunPolicyRegistry, run_policies
 from ._serde import PydanticTypeAdapter
 
+T = TypeVar("T")
+
 
 @dataclass
-class RestateContextRunResult:
+class RestateContextRunResult(Generic[T]):
     """A simple wrapper for tool results to be used with Restate's run_typed."""
 
-    kind: Literal["output", "call_deferred", "approval_required"]
-    output: Any
+    kind: Literal["output", "call_deferred", "approval_required", "model_retry"]
+    output: T | None = None
+    message: str | None = None
+    """The retry prompt for the model, if `kind` is `model_retry`."""
+
+
+CONTEXT_RUN_SERDE = PydanticTypeAdapter(RestateContextRunResult[Any])
+
+
+class _ToolResultType:
+    """Serializes the results of one tool according to its return annotation."""
+
+    def __init__(self, return_type: Any):
+        self.serde = PydanticTypeAdapter(RestateContextRunResult[return_type])
+        self.output = TypeAdapter(return_type)
+
+
+_ANY_RESULT = _ToolResultType(Any)
+_tool_result_types: dict[Callable[..., Any], _ToolResultType] = {}
+
+
+def _result_type(tool: ToolsetTool[Any]) -> _ToolResultType:
+    """Returns the result type of a function tool, derived once per function.
+
+    Results of other tools, and of functions without a usable return annotation, are
+    serialized as `Any` and replayed as plain JSON values.
+    """
+    schema = getattr(getattr(tool, "call_func", None), "__self__", None)
+    if not isinstance(schema, FunctionSchema):
+        return _ANY_RESULT
+    function = schema.function
+    if (result_type := _tool_result_types.get(function)) is None:
+        try:
+            return_type = get_type_hints(function).get("return", Any)
+            result_type = _ToolResultType(return_type)
+        except (NameError, TypeError, PydanticSchemaGenerationError):
+            result_type = _ANY_RESULT
+        _tool_result_types[function] = result_type
+    return result_type
+
+
+@dataclass
+class RestateBatchRunResult:
+    """The results of several tool calls journaled as one entry, by tool call id."""
+
+    results: dict[str, RestateContextRunResult[Any]]
+
+
+BATCH_RUN_SERDE = PydanticTypeAdapter(RestateBatchRunResult)
 
+JOURNAL_METADATA_KEY = "restate_journal"
+PURE_TOOL_METADATA = {JOURNAL_METADATA_KEY: "inline"}
+"""Tool metadata for deterministic tools, which run inline without a journal entry."""
+BATCHED_TOOL_METADATA = {JOURNAL_METADATA_KEY: "batch"}
+"""Tool metadata for cheap tools, whose calls of one step share a journal entry."""
 
-CONTEXT_RUN_SERDE = PydanticTypeAdapter(RestateContextRunResult)
+
+def _journal_mode(tool: ToolsetTool[Any] | None) -> str | None:
+    metadata = tool.tool_def.metadata if tool is not None else None
+    return metadata.get(JOURNAL_METADATA_KEY) if metadata else None
 
 
 @dataclass
@@ -48,13 +114,129 @@ class RestateMCPToolRunResult:
 MCP_RUN_SERDE = PydanticTypeAdapter(RestateMCPToolRunResult)
 
 
-class RestateContextRunToolset(WrapperToolset[AgentDepsT]):
-    """A toolset that automatically wraps tool calls with restate's `ctx.run_typed()`."""
+@dataclass
+class _CachedMCPTools:
+    server: MCPServer
+    tool_defs: dict[str, ToolDefinition]
+    tools: dict[str, ToolsetTool[Any]]
+    expires_at: float
+
+
+class MCPToolCache:
+    """A process wide cache of the tools MCP servers expose.
+
+    Listing the tools of an MCP server is a round trip to the server, and wrapping the
+    definitions in `ToolsetTool` objects is not free either when a server has dozens of
+    tools. The cache keeps both per server instance until `ttl` seconds have passed or
+    the server sends a `notifications/tools/list_changed`.
+
+    Only tools fetched from a live server are stored. Definitions replayed from the
+    journal of an older invocation may be out of date, they are used for that
+    invocation alone.
+    """
+
+    def __init__(self, ttl: float = 300):
+        """
+        Args:
+            ttl: Seconds tool definitions are reused for.
+        """
+        self.ttl = ttl
+        # Keyed by `id()`, as MCP servers are unhashable; the entry keeps the server
+        # alive so the id is not reused.
+        self._entries: dict[int, _CachedMCPTools] = {}
+
+    def tool_defs(self, server: MCPServer) -> dict[str, ToolDefinition] | None:
+        entry = self._entries.get(id(server))
+        if entry is None or entry.expires_at < time.monotonic():
+            return None
+        return entry.tool_defs
+
+    def store(self, server: MCPServer, tools: dict[str, ToolsetTool[Any]]) -> None:
+        """Caches the tools just listed by `server`."""
+        tool_defs = {name: tool.tool_def for name, tool in tools.items()}
+        self._entries[id(server)] = _CachedMCPTools(
+            server, tool_defs, tools, time.monotonic() + self.ttl
+        )
+
+    def tools(
+        self, server: MCPServer, tool_defs: dict[str, ToolDefinition]
+    ) -> dict[str, ToolsetTool[Any]]:
+        """Returns the `ToolsetTool`s for `tool_defs`, the cached ones if they match.
+
+        Nothing is stored, as `tool_defs` may come from the journal.
+        """
+        entry = self._entries.get(id(server))
+        if entry is not None and entry.tool_defs == tool_defs:
+            return entry.tools
+        return {
+            name: server.tool_for_tool_def(tool_def)
+            for name, tool_def in tool_defs.items()
+        }
+
+    def invalidate(self, server: MCPServer | None = None) -> None:
+        """Drops the cached tools of `server`, or of every server if it is `None`."""
+        if server is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(id(server), None)
+
+    def watch(self, server: MCPServer) -> None:
+        """Invalidates the tools of `server` when it reports that they changed.
+
+        Must be called after the server was entered, as it hooks into the client
+        session. Watching a session more than once is a no-op.
+        """
+        client = getattr(server, "_client", None)
+        handler = getattr(client, "_message_handler", None)
+        if handler is None or getattr(handler, "__mcp_tool_cache__", False):
+            return
+
+        async def message_handler(message: Any) -> None:
+            if isinstance(message, mcp_types.ServerNotification) and isinstance(
+                message.root, mcp_types.ToolListChangedNotification
+            ):
+                logfire.info("MCP tools changed", server=repr(server))
+                self.invalidate(server)
+            await handler(message)
+
+        message_handler.__mcp_tool_cache__ = True  # type: ignore[attr-defined]
+        client._message_handler = message_handler  # type: ignore[union-attr]
+
+
+mcp_tool_cache = MCPToolCache(ttl=float(os.getenv("MCP_TOOLS_CACHE_TTL", "300")))
+
 
-    def __init__(self, wrapped: AbstractToolset[AgentDepsT], context: Context):
+class RestateContextRunToolset(WrapperToolset[AgentDepsT]):
+    """A toolset that automatically wraps tool calls with restate's `ctx.run_typed()`.
+
+    How each tool is retried is looked up by tool name in `policies`.
+
+    Tools can opt out of their own journal entry with their metadata:
+    `PURE_TOOL_METADATA` runs a deterministic tool inline, it is simply run again when
+    the handler is replayed. `BATCHED_TOOL_METADATA` runs every call of such tools the
+    model made in one step together, and journals their results as one entry. Only
+    tools with the same run policy are batched together, and the batch is retried
+    under that policy, so batching doesn't change how a call times out or is retried,
+    except that a retry runs the other calls of the batch again too.
+    Example:
+       ...
+       @agent.tool_plain(metadata=PURE_TOOL_METADATA)
+       def celsius_to_fahrenheit(celsius: float) -> float:
+            return celsius * 9 / 5 + 32
+       ...
+    """
+
+    def __init__(
+        self,
+        wrapped: AbstractToolset[AgentDepsT],
+        context: Context,
+        policies: RunPolicyRegistry = run_policies,
+    ):
         super().__init__(wrapped)
         self._context = context
-        self.options = RunOptions[RestateContextRunResult](serde=CONTEXT_RUN_SERDE)
+        self._policies = policies
+        self._batched: dict[str, RestateContextRunResult[Any]] = {}
+        self._batched_ids: set[str] = set()
 
     async def call_tool(
         self,
@@ -63,30 +245,142 @@ class RestateContextRunToolset(WrapperToolset[AgentDepsT]):
         ctx: RunContext[AgentDepsT],
         tool: ToolsetTool[AgentDepsT],
     ) -> Any:
-        async def action() -> RestateContextRunResult:
-            try:
-                # A tool may raise ModelRetry, CallDeferred, ApprovalRequired, or UserError
-                # to signal special conditions to the caller.
-                # Since, restate ctx.run() will retry this exception we need to convert these exceptions
-                # to a return value and handle them outside of the ctx.run().
-                output = await self.wrapped.call_tool(name, tool_args, ctx, tool)
-                return RestateContextRunResult(kind="output", output=output)
-            except ModelRetry:
-                # we let restate to retry this
-                raise
-            except CallDeferred:
-                return RestateContextRunResult(kind="call_deferred", output=None)
-            except ApprovalRequired:
-                return RestateContextRunResult(kind="approval_required", output=None)
-            except UserError as e:
-                raise TerminalError(str(e)) from e
-
-        res = await self._context.run_typed(f"Calling {name}", action, self.options)
+        journal_mode = _journal_mode(tool)
+        if journal_mode == "inline":
+            return await self.wrapped.call_tool(name, tool_args, ctx, tool)
+        if journal_mode == "batch":
+            return await self._call_batched(name, tool_args, ctx, tool)
+
+        policy = self._policies.get(name)
+        result_type = _result_type(tool)
+
+        async def action() -> RestateContextRunResult[Any]:
+            return await self._run_tool(policy, name, tool_args, ctx, tool)
+
+        res = await self._context.run_typed(
+            f"Calling {name}", action, policy.run_options(result_type.serde)
+        )
+        return self._unwrap(res)
+
+    async def _run_tool(
+        self,
+        policy: RunPolicy,
+        name: str,
+        tool_args: dict[str, Any],
+        ctx: RunContext[AgentDepsT],
+        tool: ToolsetTool[AgentDepsT],
+    ) -> RestateContextRunResult[Any]:
+        """Runs one tool call inside a `ctx.run_typed()`, batched or not."""
+        try:
+            # A tool may raise ModelRetry, CallDeferred, ApprovalRequired, or UserError
+            # to signal special conditions to the caller.
+            # Since, restate ctx.run() will retry this exception we need to convert these exceptions
+            # to a return value and handle them outside of the ctx.run().
+            output = await policy.attempt(
+                self.wrapped.call_tool(name, tool_args, ctx, tool)
+            )
+            return RestateContextRunResult(kind="output", output=output)
+        except ModelRetry as e:
+            if policy.fast_fail:
+                return RestateContextRunResult(kind="model_retry", message=e.message)
+            # we let restate to retry this
+            raise
+        except CallDeferred:
+            return RestateContextRunResult(kind="call_deferred")
+        except ApprovalRequired:
+            return RestateContextRunResult(kind="approval_required")
+        except UserError as e:
+            raise TerminalError(str(e)) from e
+        except TerminalError:
+            raise
+        except Exception as e:
+            if policy.fast_fail:
+                # Let the model decide what to do instead of retrying.
+                message = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+                return RestateContextRunResult(kind="model_retry", message=message)
+            raise
+
+    async def _call_batched(
+        self,
+        name: str,
+        tool_args: dict[str, Any],
+        ctx: RunContext[AgentDepsT],
+        tool: ToolsetTool[AgentDepsT],
+    ) -> Any:
+        if ctx.tool_call_id is None or ctx.tool_call_id not in self._batched:
+            self._batched.update(await self._run_batch(name, tool_args, ctx, tool))
+        return self._unwrap(self._batched.pop(ctx.tool_call_id or ""))
 
+    async def _run_batch(
+        self,
+        name: str,
+        tool_args: dict[str, Any],
+        ctx: RunContext[AgentDepsT],
+        tool: ToolsetTool[AgentDepsT],
+    ) -> dict[str, RestateContextRunResult[Any]]:
+        """Runs the batched tool calls of the current step that have the same run
+        policy as this one in one `ctx.run_typed()`, under that policy."""
+        policy = self._policies.get(name)
+        calls = [(ctx.tool_call_id or "", name, tool_args, ctx, tool)]
+        # The tool calls of the step are in the model response that requested them.
+        response = next(
+            (m for m in reversed(ctx.messages) if isinstance(m, ModelResponse)), None
+        )
+        if response is not None and ctx.tool_call_id is not None:
+            tools = await self.wrapped.get_tools(ctx)
+            for part in response.parts:
+                if (
+                    not isinstance(part, ToolCallPart)
+                    or part.tool_call_id == ctx.tool_call_id
+                    or part.tool_call_id in self._batched_ids
+                    or _journal_mode(other := tools.get(part.tool_name)) != "batch"
+                    or self._policies.get(part.tool_name) != policy
+                ):
+                    continue
+                try:
+                    args = other.args_validator.validate_json(part.args_as_json_str())
+                except ValidationError:
+                    # Left for the agent to report when it calls the tool.
+                    continue
+                other_ctx = replace(
+                    ctx,
+                    tool_name=part.tool_name,
+                    tool_call_id=part.tool_call_id,
+                    retry=ctx.retries.get(part.tool_name, 0),
+                    max_retries=other.max_retries,
+                )
+                calls.append(
+                    (part.tool_call_id, part.tool_name, args, other_ctx, other)
+                )
+
+        async def action() -> RestateBatchRunResult:
+            results: dict[str, RestateContextRunResult[Any]] = {}
+            for tool_call_id, name, tool_args, ctx, tool in calls:
+                results[tool_call_id] = await self._run_tool(
+                    policy, name, tool_args, ctx, tool
+                )
+            return RestateBatchRunResult(results=results)
+
+        self._batched_ids.update(tool_call_id for tool_call_id, *_ in calls)
+        names = ", ".join(sorted({name for _, name, *_ in calls}))
+        res = await self._context.run_typed(
+            f"Calling {names}", action, policy.run_options(BATCH_RUN_SERDE)
+        )
+        # The batch mixes tools, so its outputs are journaled untyped.
+        for tool_call_id, _, _, _, tool in calls:
+            result = res.results.get(tool_call_id)
+            if result is not None and result.kind == "output":
+                result.output = _result_type(tool).output.validate_python(result.output)
+        return res.results
+
+    @staticmethod
+    def _unwrap(res: RestateContextRunResult[Any]) -> Any:
         if res.kind == "call_deferred":
             raise CallDeferred()
         elif res.kind == "approval_required":
             raise ApprovalRequired()
+        elif res.kind == "model_retry":
+            raise ModelRetry(res.message or "")
         else:
             assert res.kind == "output"
             return res.output
@@ -99,12 +393,28 @@ class RestateContextRunToolset(WrapperToolset[AgentDepsT]):
 
 
 class RestateMCPServer(WrapperToolset[AgentDepsT]):
-    """A wrapper for MCPServer that integrates with restate."""
+    """A wrapper for MCPServer that integrates with restate.
+
+    The tool definitions are journaled once per invocation, on the first agent step
+    that asks for them, and served from `mcp_tool_cache` across invocations. Changes
+    to the server's tools are picked up by the next invocation, so that every step of
+    an invocation, including replays, sees the same tools.
+
+    The server's session is taken from `mcp_session_pool`, so it stays open between
+    invocations.
+    """
 
     def __init__(self, wrapped: MCPServer, context: Context):
         super().__init__(wrapped)
         self._wrapped = wrapped
         self._context = context
+        self._tools: dict[str, ToolsetTool[AgentDepsT]] | None = None
+
+    async def __aenter__(self) -> Self:
+        await mcp_session_pool.acquire(self._wrapped)
+        await super().__aenter__()
+        mcp_tool_cache.watch(self._wrapped)
+        return self
 
     def visit_and_replace(
         self,
@@ -115,8 +425,14 @@ class RestateMCPServer(WrapperToolset[AgentDepsT]):
     async def get_tools(
         self, ctx: RunContext[AgentDepsT]
     ) -> dict[str, ToolsetTool[AgentDepsT]]:
+        if self._tools is not None:
+            return self._tools
+
         async def get_tools_in_context() -> RestateMCPGetToolsContextRunResult:
+            if (tool_defs := mcp_tool_cache.tool_defs(self._wrapped)) is not None:
+                return RestateMCPGetToolsContextRunResult(output=tool_defs)
             res = await self._wrapped.get_tools(ctx)
+            mcp_tool_cache.store(self._wrapped, res)
             # ToolsetTool is not serializable as it holds a SchemaValidator
             # (which is also the same for every MCP tool so unnecessary to pass along the wire every time),
             # so we just return the ToolDefinitions and wrap them in ToolsetTool outside of the activity.
@@ -130,10 +446,8 @@ class RestateMCPServer(WrapperToolset[AgentDepsT]):
             "get mcp tools", get_tools_in_context, options
         )
 
-        return {
-            name: self.tool_for_tool_def(tool_def)
-            for name, tool_def in tool_defs.output.items()
-        }
+        self._tools = mcp_tool_cache.tools(self._wrapped, tool_defs.output)
+        return self._tools
 
     def tool_for_tool_def(self, tool_def: ToolDefinition) -> ToolsetTool[AgentDepsT]:
         assert isinstance(self.wrapped, MCPServer)
@@ -147,6 +461,7 @@ class RestateMCPServer(WrapperToolset[AgentDepsT]):
         tool: ToolsetTool[AgentDepsT],
     ) -> ToolResult:
         async def call_tool_in_context() -> RestateMCPToolRunResult:
+            await mcp_session_pool.acquire(self._wrapped)
             res = await self._wrapped.call_tool(name, tool_args, ctx, tool)
             return RestateMCPToolRunResult(output=res)
 
@@ -0,0 +1,176 @@
+import time
+from dataclasses import dataclass, field
+from weakref import WeakKeyDictionary
+
+import logfire
+from pydantic_ai.usage import RequestUsage, RunUsage
+
+from app.restate._budget import WorkflowBudget
+from app.restate._serde import PydanticTypeAdapter
+from restate import Context, RunOptions
+
+_tokens = logfire.metric_histogram(
+    "agent.tokens",
+    unit="{token}",
+    description="Tokens used by a model call, by service, step and token type",
+)
+_model_call_duration = logfire.metric_histogram(
+    "agent.model_call.duration",
+    unit="s",
+    description="Duration of a model call, by service and step",
+)
+_model_call_timeouts = logfire.metric_counter(
+    "agent.model_call.timeouts",
+    unit="{attempt}",
+    description="Model call attempts that timed out, by service, step and model",
+)
+
+
+@dataclass
+class StepUsage:
+    usage: RunUsage = field(default_factory=RunUsage)
+    model_seconds: float = 0.0
+    """Time spent waiting for model responses."""
+
+
+@dataclass
+class InvocationUsage:
+    """The usage of every agent run in one invocation, by step.
+
+    Model calls are added as their journaled responses come in, so a replayed
+    invocation adds up to the same totals, without calling the model again.
+    """
+
+    service: str = ""
+    steps: dict[str, StepUsage] = field(default_factory=dict)
+    budget: WorkflowBudget | None = None
+    """The budget of the whole invocation, checked before every model call."""
+    budget_started: float | None = None
+    """When the budget was set, as a journaled Unix timestamp."""
+
+    @property
+    def total(self) -> RunUsage:
+        total = RunUsage()
+        for step in self.steps.values():
+            total.incr(step.usage)
+        return total
+
+    def step(self, name: str) -> StepUsage:
+        if name not in self.steps:
+            self.steps[name] = StepUsage()
+        return self.steps[name]
+
+    def check_budget(self) -> bool:
+        """Raises a `TerminalError` once the budget is used up.
+
+        Model calls check it for themselves, other long running steps can check it
+        too, to stop when the invocation runs out of time.
+
+        Returns:
+            Whether model calls should be degraded.
+        """
+        if self.budget is None:
+            return False
+        elapsed = time.time() - (self.budget_started or time.time())
+        return self.budget.check(self.service, self.total, elapsed)
+
+    def record_request(
+        self, step: str, usage: RequestUsage, duration: float | None
+    ) -> None:
+        step_usage = self.step(step)
+        step_usage.usage.incr(usage)
+        step_usage.usage.requests += 1
+        step_usage.model_seconds += duration or 0.0
+
+    def record_tool_calls(self, step: str, tool_calls: int) -> None:
+        self.step(step).usage.tool_calls += tool_calls
+
+    def log(self) -> None:
+        """Logs the usage of every step and the invocation total."""
+        for name, step in self.steps.items():
+            logfire.info(
+                "{service} {step}: {tokens} tokens in {requests} requests, {seconds:.1f}s",
+                service=self.service,
+                step=name,
+                tokens=step.usage.total_tokens,
+                requests=step.usage.requests,
+                seconds=step.model_seconds,
+                usage=step.usage,
+            )
+        total = self.total
+        logfire.info(
+            "{service}: {tokens} tokens in {requests} requests",
+            service=self.service,
+            tokens=total.total_tokens,
+            requests=total.requests,
+            usage=total,
+        )
+
+
+STEPS_SERDE = PydanticTypeAdapter(dict[str, StepUsage])
+
+_invocations: WeakKeyDictionary[Context, InvocationUsage] = WeakKeyDictionary()
+
+
+def _service_name(context: Context) -> str:
+    handler = getattr(context, "handler", None)
+    service = getattr(getattr(handler, "service_tag", None), "name", None)
+    return service or type(context).__name__
+
+
+def invocation_usage(context: Context) -> InvocationUsage:
+    """The usage of the invocation `context` belongs to, shared by all its agents."""
+    usage = _invocations.get(context)
+    if usage is None:
+        usage = _invocations[context] = InvocationUsage(service=_service_name(context))
+    return usage
+
+
+def record_model_call_metrics(
+    usage: InvocationUsage, step: str, request_usage: RequestUsage, duration: float
+) -> None:
+    """Records the histograms of a model call that was actually made, not replayed."""
+    attributes = {"service": usage.service, "step": step}
+    _model_call_duration.record(duration, attributes)
+    for token_type, tokens in (
+        ("input", request_usage.input_tokens),
+        ("output", request_usage.output_tokens),
+        ("cache_read", request_usage.cache_read_tokens),
+    ):
+        _tokens.record(tokens, {**attributes, "token_type": token_type})
+
+
+def record_model_call_timeout(usage: InvocationUsage, step: str, model: str) -> None:
+    _model_call_timeouts.add(
+        1, {"service": usage.service, "step": step, "model": model}
+    )
+
+
+async def set_budget(context: Context, budget: WorkflowBudget) -> None:
+    """Sets the budget of every agent in the invocation `context` belongs to.
+
+    The start of its wall time is journaled, so the clock keeps running across
+    retries of the invocation.
+    """
+    usage = invocation_usage(context)
+    usage.budget = budget
+    usage.budget_started = await context.run_typed(
+        "Budget started", time.time, RunOptions(type_hint=float)
+    )
+
+
+async def journal_usage(context: Context) -> InvocationUsage:
+    """Journals the usage of the invocation so far.
+
+    Agents that run inside a `ctx.run` are skipped on replay, together with their
+    model calls. The journaled usage includes them, and replaces what a replay has
+    added up by the time it gets here.
+    """
+    usage = invocation_usage(context)
+    journaled = await context.run_typed(
+        "Usage",
+        lambda: usage.steps,
+        RunOptions(serde=STEPS_SERDE),
+    )
+    usage.steps = journaled
+    return usage
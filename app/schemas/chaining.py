@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+
+
+class Metric(BaseModel):
+    name: str = Field(description="Name of the metric, e.g. 'Revenue growth'")
+    value: float = Field(description="The numerical value of the metric")
+    unit: str = Field(
+        default="",
+        description="Unit of the value, e.g. '%' or 'points', empty if it has none",
+    )
+
+    def display_value(self) -> str:
+        if not self.unit or self.unit == "%":
+            return f"{self.value:g}{self.unit}"
+        return f"{self.value:g} {self.unit}"
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List
 
 from pydantic import BaseModel, Field
 
@@ -7,6 +7,7 @@ from app.data.example_prompt import (
     target_market,
     what_we_do,
 )
+from app.schemas.tavily import TavilyResponse, TavilyResult
 
 
 class SearchQuery(BaseModel):
@@ -40,21 +41,21 @@ class LinkedInLeadQueries(BaseModel):
     )
 
 
-class TavilyResult(BaseModel):
-    url: str = Field(description="URL of the search result")
-    title: str = Field(description="Title of the search result")
-    content: str = Field(description="Content snippet from the search result")
-    score: float = Field(description="Relevance score of the result")
-    raw_content: Optional[str] = Field(
-        default=None, description="Raw content if available"
-    )
+class TierQueryResults(BaseModel):
+    """One line of the `leads.ndjson` export: a query's results and the tier it belongs to."""
+
+    query: str
+    description: str
+    results: TavilyResponse
+    tier: str
+    priority: int
 
 
-class TavilyResponse(BaseModel):
-    query: str = Field(description="The search query that was executed")
-    results: List[TavilyResult] = Field(description="List of search results")
-    response_time: float = Field(description="Time taken to execute the search")
-    request_id: str = Field(description="Unique identifier for this search request")
+class LeadSearchSummary(BaseModel):
+    company_context: str
+    total_queries: int
+    total_results: int
+    top_results: List[TavilyResult]
 
 
 class SearchResults(BaseModel):
@@ -0,0 +1,39 @@
+import sys
+from typing import Annotated, List, Optional
+
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, TypeAdapter
+from pydantic.dataclasses import dataclass
+
+# The same profiles turn up in the results of many queries of a lead run.
+InternedStr = Annotated[str, AfterValidator(sys.intern)]
+
+
+@dataclass(frozen=True, slots=True)
+class TavilyResult:
+    """A search result.
+
+    A slotted dataclass rather than a model, as lead runs hold tens of thousands of
+    them: instances carry no `__dict__` or fields-set bookkeeping, and the URLs and
+    titles repeated across queries share one string.
+    """
+
+    url: InternedStr = Field(description="URL of the search result")
+    title: InternedStr = Field(description="Title of the search result")
+    content: str = Field(description="Content snippet from the search result")
+    score: float = Field(description="Relevance score of the result")
+    raw_content: Optional[str] = Field(
+        default=None, description="Raw content if available"
+    )
+
+
+class TavilyResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    query: str = Field(description="The search query that was executed")
+    results: List[TavilyResult] = Field(description="List of search results")
+    response_time: float = Field(description="Time taken to execute the search")
+    request_id: str = Field(description="Unique identifier for this search request")
+
+
+TAVILY_RESULTS = TypeAdapter(List[TavilyResult])
+"""Validates and dumps lists of results in one pass, e.g. `validate_json(content)`."""
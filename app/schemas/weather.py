@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class CityWeather(BaseModel):
+    location: str
+    lat: float | None = None
+    lng: float | None = None
+    temperature: str | None = None
+    description: str | None = None
+    error: str | None = None
@@ -1,17 +1,18 @@
 import os
 from dataclasses import dataclass
 from datetime import date
-from typing import List, Optional
 
 import logfire
 import restate
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+from httpx import AsyncClient
+from pydantic import BaseModel
 from pydantic_ai import Agent, RunContext
 from restate import Context, RunOptions
-from tavily import AsyncTavilyClient
 
-from app.restate import RestateAgent
+from app.clients import tavily
+from app.restate import PURE_TOOL_METADATA, RestateAgent
+from app.schemas.tavily import TavilyResponse
 
 load_dotenv()
 
@@ -21,7 +22,7 @@ logfire.instrument_pydantic_ai()
 
 @dataclass
 class Deps:
-    client: AsyncTavilyClient
+    client: AsyncClient
     restate_context: Context
     tavily_api_key: str | None
     todays_date: str
@@ -34,40 +35,15 @@ search_agent = Agent[Deps](
 )
 
 
-class TavilyResult(BaseModel):
-    url: str = Field(description="URL of the search result")
-    title: str = Field(description="Title of the search result")
-    content: str = Field(description="Content snippet from the search result")
-    score: float = Field(description="Relevance score of the result")
-    raw_content: Optional[str] = Field(
-        default=None, description="Raw content if available"
-    )
-
-
-class TavilyResponse(BaseModel):
-    query: str = Field(description="The search query that was executed")
-    results: List[TavilyResult] = Field(description="List of search results")
-    response_time: float = Field(description="Time taken to execute the search")
-    request_id: str = Field(description="Unique identifier for this search request")
-
-
-@search_agent.tool
+# The date is journaled once per invocation by the handler, so the tool is pure.
+@search_agent.tool(metadata=PURE_TOOL_METADATA)
 async def get_todays_date(ctx: RunContext[Deps]) -> str:
     """Returns today's date"""
-
-    async def fetch_todays_date():
-        with logfire.span(
-            "getting today's date", todays_date=ctx.deps.todays_date
-        ) as span:
-            return ctx.deps.todays_date
-
-    return await ctx.deps.restate_context.run_typed(
-        "Getting todays date", fetch_todays_date, RunOptions(type_hint=str)
-    )
+    return ctx.deps.todays_date
 
 
 @search_agent.tool
-async def tavily_search(ctx: RunContext[Deps], query: str) -> dict:
+async def tavily_search(ctx: RunContext[Deps], query: str) -> TavilyResponse:
     """Tavily web search API
 
     Args:
@@ -76,12 +52,13 @@ async def tavily_search(ctx: RunContext[Deps], query: str) -> dict:
 
     async def fetch_search_results():
         with logfire.span("calling Tavily API", query=query) as span:
-            response = await ctx.deps.client.search(
-                query=query,
+            return await tavily.search(
+                ctx.deps.client,
+                ctx.deps.tavily_api_key,
+                query,
                 include_raw_content=True,
                 max_results=10,
             )
-            return TavilyResponse(**response)
 
     return await ctx.deps.restate_context.run_typed(
         "Getting search results",
@@ -101,17 +78,22 @@ class Prompt(BaseModel):
 
 @search_service.handler()
 async def handle_search_request(ctx: Context, prompt: Prompt):
-    tavily_api_key = os.getenv("TAVILY_API_KEY")
-    tavily_client = AsyncTavilyClient(api_key=tavily_api_key)
-    current_date = date.today()
-    date_string = current_date.strftime("%Y-%m-%d")
-    deps = Deps(
-        client=tavily_client,
-        restate_context=ctx,
-        tavily_api_key=tavily_api_key,
-        todays_date=date_string,
+    date_string = await ctx.run_typed(
+        "Getting todays date",
+        lambda: date.today().strftime("%Y-%m-%d"),
+        RunOptions(type_hint=str),
     )
-    restate_agent = RestateAgent(search_agent, restate_context=ctx)
-    result = await restate_agent.run(prompt.prompt, deps=deps)
+    async with AsyncClient() as client:
+        deps = Deps(
+            client=client,
+            restate_context=ctx,
+            tavily_api_key=os.getenv("TAVILY_API_KEY"),
+            todays_date=date_string,
+        )
+        # `tavily_search` journals its own step, a `ctx.run` around it would nest it.
+        restate_agent = RestateAgent(
+            search_agent, restate_context=ctx, disable_auto_wrapping_tools=True
+        )
+        result = await restate_agent.run(prompt.prompt, deps=deps)
     print(result.output)
     return result.output
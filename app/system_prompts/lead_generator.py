@@ -1,4 +1,5 @@
 from app.schemas.lead_generator import Company
+from app.util.prompts import PromptTemplate
 
 unstructured_instructions = """
 You are an assistant that helps users generate optimized LinkedIn search queries to find high-quality leads for their business.
@@ -45,26 +46,9 @@ The query field should contain only space-separated keywords without any quotes
 """
 
 
-def generate_lead_scoring_instructions(company: Company) -> str:
-    """
-    Dynamically generate lead scoring instructions based on the company's specific context.
-
-    Args:
-        company_name: Name of the company
-        what_we_do: Description of company's product/service and value proposition
-        target_market: Description of ideal customer segment
-
-    Returns:
-        Customized lead scoring instructions string
-    """
-
-    return f"""
-You are a B2B lead qualification specialist analyzing LinkedIn prospects for {company.company_name}.
-
-**COMPANY CONTEXT:**
-- Company: {company.company_name}
-- Offering: {company.what_we_do}
-- Target Market: {company.target_market}
+lead_scoring_template = PromptTemplate(
+    instructions="""
+You are a B2B lead qualification specialist analyzing LinkedIn prospects for the company described under COMPANY CONTEXT at the end of these instructions.
 
 **YOUR TASK:**
 Analyze LinkedIn search results to identify the highest-quality prospects who match the target market profile and have decision-making authority relevant to the company's offering.
@@ -72,7 +56,7 @@ Analyze LinkedIn search results to identify the highest-quality prospects who ma
 **LEAD ANALYSIS CRITERIA:**
 
 **1. TARGET MARKET ALIGNMENT (40% of score)**
-Based on the target market description: "{company.target_market}"
+Based on the target market description in the company context:
 - Geographic location match
 - Industry/sector alignment  
 - Company size/type fit
@@ -80,7 +64,7 @@ Based on the target market description: "{company.target_market}"
 - Compliance/regulatory requirements (if applicable)
 
 **2. DECISION-MAKING AUTHORITY (35% of score)**
-Prioritize based on purchasing power for: {company.what_we_do}
+Prioritize based on purchasing power for the company's offering:
 - C-level executives (CEO, CTO, CFO, etc.)
 - VPs and Senior Directors
 - Department heads relevant to the offering
@@ -88,7 +72,7 @@ Prioritize based on purchasing power for: {company.what_we_do}
 - Procurement/purchasing decision makers
 
 **3. ROLE RELEVANCE (15% of score)**
-How closely their role relates to: {company.what_we_do}
+How closely their role relates to the company's offering:
 - Direct users of the product/service
 - Technical evaluators or implementers
 - Business stakeholders who would benefit
@@ -108,9 +92,9 @@ How closely their role relates to: {company.what_we_do}
 - Below 60: Poor fit - Exclude from top 10
 
 **SPECIFIC FOCUS AREAS:**
-Given that {company.company_name} offers {company.what_we_do}, pay special attention to:
+Given what the company offers, pay special attention to:
 - Leads who would directly benefit from or evaluate this offering
-- Companies that match the target market: {company.target_market}
+- Companies that match the target market
 - Decision makers who typically purchase similar solutions
 - Geographic and industry alignment as specified
 
@@ -121,29 +105,26 @@ Given that {company.company_name} offers {company.what_we_do}, pay special atten
 - Include tactical outreach recommendations based on their profile and company context
 - Focus on leads most likely to engage and convert
 
-Remember: These leads will receive personalized outreach from {company.company_name}, so prioritize quality matches who genuinely fit the target market profile.
-"""
-
-
-def generate_outreach_content_instructions(company: Company) -> str:
-    """
-    Dynamically generate outreach content instructions based on the company's specific context.
-    """
-
-    return f"""
-You’re an outreach specialist helping {company.company_name} connect with the right people on LinkedIn.
+Remember: These leads will receive personalized outreach from the company, so prioritize quality matches who genuinely fit the target market profile.
+""",
+    context="""
+**COMPANY CONTEXT:**
+- Company: {company_name}
+- Offering: {what_we_do}
+- Target Market: {target_market}
+""",
+)
 
-**COMPANY SNAPSHOT:**
-- Company: {company.company_name}
-- What We Do: {company.what_we_do}
-- Who We Serve: {company.target_market}
+outreach_content_template = PromptTemplate(
+    instructions="""
+You’re an outreach specialist helping the company described under COMPANY SNAPSHOT at the end of these instructions connect with the right people on LinkedIn.
 
 **YOUR ROLE:**
 Write short, personal LinkedIn messages for the top 10 leads. Each one should be 2–3 sentences, no longer.
 
 **WHAT TO INCLUDE:**
 1. **Personal Touch** – Mention something tied to their role, company, or challenges.  
-2. **Value Connection** – Show how {company.what_we_do} could make their work easier, better, or more effective.  
+2. **Value Connection** – Show how what the company does could make their work easier, better, or more effective.  
 3. **Clear Purpose** – Make it obvious why you’re reaching out.  
 4. **Tone** – Professional, approachable, and human (not stiff or overly formal).  
 5. **Next Step** – End with a light invitation (e.g. “open to a quick chat?”).  
@@ -170,4 +151,34 @@ For a “VP of Operations at a mid-size manufacturing company”:
 
 **REMEMBER:**  
 Keep each message short, warm, and tailored to the person. The goal is to spark a conversation, not close a deal right away.
-"""
+""",
+    context="""
+**COMPANY SNAPSHOT:**
+- Company: {company_name}
+- What We Do: {what_we_do}
+- Who We Serve: {target_market}
+""",
+)
+
+
+def generate_lead_scoring_instructions(company: Company) -> str:
+    """
+    Generate lead scoring instructions for the company's specific context.
+
+    The static criteria come first and the company context last, so the prefix is
+    shared across companies by the upstream prompt cache. Rendered per company once.
+
+    Args:
+        company: The company the leads are scored for
+
+    Returns:
+        Customized lead scoring instructions string
+    """
+    return lead_scoring_template.render(company)
+
+
+def generate_outreach_content_instructions(company: Company) -> str:
+    """
+    Generate outreach content instructions for the company's specific context.
+    """
+    return outreach_content_template.render(company)
@@ -0,0 +1,215 @@
+import asyncio
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Self
+
+import logfire
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+def _encode(obj: Any, indent: int | None = None) -> bytes:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump_json(indent=indent).encode("utf-8")
+    return to_json(obj, indent=indent)
+
+
+class ArtifactSink:
+    """Writes JSON artifacts for an invocation on a background thread.
+
+    Artifacts are stored under `<root>/<invocation_id>/<name>`, so concurrent invocations
+    never clobber each other. Each artifact is written at most once: a write that is
+    already queued, or whose file already exists, is skipped. This makes it safe to call
+    `write` from a handler that Restate replays.
+
+    Encoding and file IO both happen off the event loop. At most `max_pending` writes are
+    queued at a time; further calls to `write` wait for a slot, which bounds the memory
+    held by queued artifacts.
+    """
+
+    def __init__(
+        self,
+        root: str | os.PathLike[str],
+        *,
+        max_pending: int = 8,
+        indent: int | None = None,
+    ):
+        """
+        Args:
+            root: Directory artifacts are written to.
+            max_pending: Maximum number of queued writes before `write` applies backpressure.
+            indent: Indentation for the JSON output, `None` writes compact JSON.
+        """
+        self.root = Path(root)
+        self.indent = indent
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="artifact-writer"
+        )
+        self._slots = asyncio.Semaphore(max_pending)
+        self._in_flight: set[Path] = set()
+        self._pending: set[asyncio.Future[Any]] = set()
+
+    def path(self, invocation_id: str, name: str) -> Path:
+        return self.root / invocation_id / name
+
+    async def write(self, invocation_id: str, name: str, obj: Any) -> bool:
+        """Queues `obj` to be written as JSON, unless it already was.
+
+        Args:
+            invocation_id: Restate invocation id the artifact belongs to.
+            name: File name of the artifact.
+            obj: A Pydantic model or any value `pydantic_core.to_json` can encode.
+
+        Returns:
+            bool: `True` if the write was queued, `False` if it was skipped.
+        """
+        path = self.path(invocation_id, name)
+        if path in self._in_flight or path.exists():
+            return False
+        self._in_flight.add(path)
+        future = await self._submit(self._write, path, obj)
+        future.add_done_callback(lambda f: self._in_flight.discard(path))
+        return True
+
+    def stream(self, invocation_id: str, name: str) -> "ArtifactStream":
+        """Opens a JSON-lines artifact that is written one record at a time.
+
+        The records are written to a temporary file that only replaces the artifact once
+        the stream is closed successfully. If the artifact already exists the stream
+        discards everything emitted to it.
+
+        Args:
+            invocation_id: Restate invocation id the artifact belongs to.
+            name: File name of the artifact.
+
+        Returns:
+            ArtifactStream: An async context manager to emit records to.
+        """
+        return ArtifactStream(self, self.path(invocation_id, name))
+
+    async def flush(self) -> None:
+        """Waits for all queued writes to finish."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> asyncio.Future[Any]:
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, fn, *args)
+        self._pending.add(future)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: asyncio.Future[Any]) -> None:
+        self._pending.discard(future)
+        self._slots.release()
+        if not future.cancelled() and (e := future.exception()):
+            logfire.error("Failed to write artifact", _exc_info=e)
+
+    def _write(self, path: Path, obj: Any) -> None:
+        if path.exists():
+            return
+        data = _encode(obj, self.indent)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a truncated artifact
+        # behind that would then block the rewrite.
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+
+
+class ArtifactStream:
+    """A JSON-lines artifact written record by record through an `ArtifactSink`.
+
+    Records are encoded and appended on the sink's writer thread in the order they are
+    emitted, so the caller never holds more than the sink's `max_pending` records.
+    """
+
+    def __init__(self, sink: ArtifactSink, path: Path):
+        self.path = path
+        self._sink = sink
+        self._tmp_path = path.with_name(f"{path.name}.tmp")
+        self._file: IO[bytes] | None = None
+        self._skip = path.exists()
+        # Only touched on the writer thread.
+        self._failed = False
+        # Only touched on the event loop.
+        self._error: BaseException | None = None
+
+    async def __aenter__(self) -> Self:
+        if not self._skip:
+            await self._submit(self._open)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.close(commit=exc is None)
+
+    async def emit(self, obj: Any) -> None:
+        """Queues `obj` to be appended as one line of JSON."""
+        if not self._skip:
+            await self._submit(self._append, obj)
+
+    async def close(self, commit: bool = True) -> None:
+        """Waits for queued records and publishes the artifact.
+
+        Args:
+            commit: Whether to replace the artifact with the records written so far.
+                Pass `False` to discard them, e.g. when the producer failed.
+
+        Raises:
+            Exception: The first error raised while writing a record.
+        """
+        if self._skip:
+            return
+        self._skip = True
+        # The writer thread runs tasks in order, so this completes after every record.
+        await (await self._submit(self._close, commit))
+        if self._error is not None:
+            raise self._error
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> asyncio.Future[Any]:
+        future = await self._sink._submit(fn, *args)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: asyncio.Future[Any]) -> None:
+        if self._error is None and not future.cancelled():
+            self._error = future.exception()
+
+    def _open(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self._tmp_path.open("wb")
+        except BaseException:
+            self._failed = True
+            raise
+
+    def _append(self, obj: Any) -> None:
+        if self._failed or self._file is None:
+            return
+        try:
+            self._file.write(_encode(obj) + b"\n")
+        except BaseException:
+            self._failed = True
+            raise
+
+    def _close(self, commit: bool) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if commit and not self._failed:
+            self._tmp_path.replace(self.path)
+        else:
+            self._tmp_path.unlink(missing_ok=True)
+
+
+artifact_sink = ArtifactSink(os.getenv("ARTIFACTS_DIR", "artifacts"))
@@ -0,0 +1,120 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class HedgePolicy:
+    enabled: bool = False
+    """Hedging is opt-in, only use it for idempotent requests."""
+    percentile: float = 0.95
+    """Latency percentile after which a hedged request is sent."""
+    min_delay: float = 0.05
+    """Lower bound for the hedge delay, in seconds."""
+    max_delay: float = 2.0
+    """Upper bound for the hedge delay, in seconds."""
+    initial_delay: float = 0.5
+    """Hedge delay used until `min_samples` latencies have been observed."""
+    min_samples: int = 20
+    window: int = 200
+    """Number of recent latencies the percentile is computed over."""
+
+
+@dataclass
+class HedgeMetrics:
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+
+
+class Hedger:
+    """Sends a second, hedged request when the first one is slower than usual.
+
+    If the first attempt has not finished after the configured latency percentile of
+    recent requests, a second attempt is started and whichever succeeds first wins; the
+    other one is cancelled. Call it inside the `ctx.run` of a Restate step so that only
+    the winning result is journaled.
+    """
+
+    def __init__(self, name: str, policy: HedgePolicy):
+        self.name = name
+        self.policy = policy
+        self.metrics = HedgeMetrics()
+        self._latencies: deque[float] = deque(maxlen=policy.window)
+
+    def delay(self) -> float:
+        policy = self.policy
+        if len(self._latencies) < policy.min_samples:
+            return policy.initial_delay
+        latencies = sorted(self._latencies)
+        index = max(0, math.ceil(policy.percentile * len(latencies)) - 1)
+        return min(policy.max_delay, max(policy.min_delay, latencies[index]))
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        """Runs `request`, hedging it with a second call if it is slow.
+
+        Args:
+            request: Sends the request, it is called at most twice.
+
+        Returns:
+            T: The result of the first attempt to succeed.
+        """
+        if not self.policy.enabled:
+            return await request()
+
+        self.metrics.requests += 1
+        first = asyncio.ensure_future(self._timed(request))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.delay())
+            if done:
+                return first.result()
+
+            self.metrics.hedged += 1
+            second = asyncio.ensure_future(self._timed(request))
+            pending = {first, second}
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if (e := task.exception()) is None:
+                        if task is second:
+                            self.metrics.hedge_wins += 1
+                        return task.result()
+                    error = error or e
+            assert error is not None
+            raise error
+        finally:
+            # Also reached when the caller is cancelled while waiting.
+            for task in pending:
+                task.cancel()
+
+    async def _timed(self, request: Callable[[], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        result = await request()
+        self._latencies.append(time.monotonic() - start)
+        return result
+
+
+_hedgers: dict[str, Hedger] = {}
+
+
+def hedger(name: str) -> Hedger:
+    """Returns the process wide hedger for the upstream `name`.
+
+    Hedging is enabled for the upstreams listed in the comma separated
+    `HEDGE_REQUESTS` environment variable, e.g. `HEDGE_REQUESTS=mapbox,tomorrow_io`.
+    """
+    if (h := _hedgers.get(name)) is None:
+        enabled = name in os.getenv("HEDGE_REQUESTS", "").split(",")
+        h = _hedgers[name] = Hedger(name, HedgePolicy(enabled=enabled))
+    return h
@@ -0,0 +1,47 @@
+import os
+from collections.abc import Iterator
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+from app.schemas.lead_generator import TierQueryResults
+from app.schemas.tavily import TavilyResult
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def iter_ndjson(path: str | os.PathLike[str], model: type[M]) -> Iterator[M]:
+    """Lazily validates each line of a JSON-lines file as `model`.
+
+    Args:
+        path: Path of the JSON-lines file.
+        model: The Pydantic model every line is validated as.
+
+    Returns:
+        Iterator[M]: One model per non-empty line, read as the iterator advances.
+
+    Raises:
+        ValidationError: When the iterator reaches a line that isn't a valid `model`,
+            e.g. a truncated last line.
+    """
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield model.model_validate_json(line)
+
+
+def iter_tavily_results(
+    path: str | os.PathLike[str], priority: int | None = None
+) -> Iterator[TavilyResult]:
+    """Lazily reads the search results of a `leads.ndjson` export.
+
+    Args:
+        path: Path of the `leads.ndjson` artifact.
+        priority: Only yield results of the tier with this priority level.
+
+    Returns:
+        Iterator[TavilyResult]: The search results in the order they were exported.
+    """
+    for query_results in iter_ndjson(path, TierQueryResults):
+        if priority is None or query_results.priority == priority:
+            yield from query_results.results.results
@@ -0,0 +1,52 @@
+from functools import lru_cache
+
+import logfire
+from pydantic import BaseModel
+from pydantic_ai.usage import RunUsage
+
+
+class PromptTemplate:
+    """A system prompt with static instructions first and per-request context last.
+
+    Upstream prompt caches (e.g. OpenAI's) reuse the longest previously seen prefix of
+    a request, so everything that varies is kept at the end: the instructions are then
+    a shared prefix across requests, whatever context follows them.
+
+    Rendered prompts are memoized per context value, so repeated invocations for the
+    same context skip formatting.
+    """
+
+    def __init__(self, instructions: str, context: str, maxsize: int = 128):
+        """
+        Args:
+            instructions: The static part of the prompt, rendered as is.
+            context: A `str.format` template, filled in with the fields of a model.
+            maxsize: How many rendered prompts to keep.
+        """
+        self.instructions = instructions.strip()
+        self.context = context.strip()
+        self._render = lru_cache(maxsize=maxsize)(self._format)
+
+    def render(self, values: BaseModel) -> str:
+        # Models aren't hashable, a tuple of their (field, value) pairs is.
+        return self._render(tuple(values))
+
+    def _format(self, fields: tuple[tuple[str, object], ...]) -> str:
+        return f"{self.instructions}\n\n{self.context.format(**dict(fields))}\n"
+
+
+def cached_token_ratio(usage: RunUsage) -> float:
+    """The share of input tokens that were read from the upstream prompt cache."""
+    if not usage.input_tokens:
+        return 0.0
+    return usage.cache_read_tokens / usage.input_tokens
+
+
+def log_prompt_cache_usage(name: str, usage: RunUsage) -> None:
+    logfire.info(
+        "{name} read {ratio:.0%} of its input tokens from the prompt cache",
+        name=name,
+        ratio=cached_token_ratio(usage),
+        input_tokens=usage.input_tokens,
+        cache_read_tokens=usage.cache_read_tokens,
+    )
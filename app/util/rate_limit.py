@@ -0,0 +1,231 @@
+import asyncio
+import os
+import time
+from collections.abc import AsyncIterator, Mapping
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from email.utils import parsedate_to_datetime
+
+from restate import TerminalError
+
+
+class RateLimited(Exception):
+    """Raised when an upstream API rejects a request because of rate limiting."""
+
+    def __init__(self, upstream: str, retry_after: float | None = None):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        message = f"{upstream} rate limited the request"
+        if retry_after is not None:
+            message += f", retry after {retry_after:.1f}s"
+        super().__init__(message)
+
+
+@dataclass
+class RateLimitMetrics:
+    requests: int = 0
+    throttled: int = 0
+    retries_denied: int = 0
+    wait_seconds: float = 0.0
+    qps: float = 0.0
+
+
+@dataclass
+class RateLimitConfig:
+    qps: float
+    """Sustained requests per second."""
+    burst: int
+    """Maximum number of requests that can be sent back to back."""
+    adaptive: bool = True
+    """Whether to adapt the rate with additive increase / multiplicative decrease."""
+    min_qps: float = 0.1
+    """Lower bound for the adaptive rate."""
+    increase: float = 0.1
+    """Requests per second added back after every successful request."""
+    decrease: float = 0.5
+    """Factor the rate is multiplied with after every throttled request."""
+    retry_ratio: float = 0.2
+    """Retries allowed per successful request, on top of `min_retries`."""
+    min_retries: int = 5
+    """Retries that are always allowed, even before any request succeeded."""
+    max_retries: int = 50
+    """Upper bound for the retries saved up by successful requests."""
+
+
+class RateLimiter:
+    """An async token bucket shared by every call to one upstream API.
+
+    Each request takes a token; tokens refill at `qps` up to `burst`. When the upstream
+    answers with a 429, the bucket stops handing out tokens until its `Retry-After` has
+    passed and, in adaptive mode, halves its rate, which then grows back linearly with
+    every successful request (AIMD).
+
+    Retries of throttled requests are drawn from a retry budget that refills with
+    successful requests, so a struggling upstream is not hammered by unbounded retries.
+    """
+
+    def __init__(self, name: str, config: RateLimitConfig):
+        self.name = name
+        self.config = config
+        self.metrics = RateLimitMetrics(qps=config.qps)
+        self._qps = config.qps
+        self._tokens = float(config.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._retry_budget = float(config.min_retries)
+        self._lock = asyncio.Lock()
+
+    @property
+    def qps(self) -> float:
+        return self._qps
+
+    async def acquire(self) -> None:
+        """Waits until a request may be sent to the upstream."""
+        async with self._lock:
+            start = time.monotonic()
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                else:
+                    await asyncio.sleep((1 - self._tokens) / self._qps)
+            self.metrics.requests += 1
+            self.metrics.wait_seconds += time.monotonic() - start
+
+    def record_success(self) -> None:
+        config = self.config
+        self._retry_budget = min(
+            self._retry_budget + config.retry_ratio, float(config.max_retries)
+        )
+        if config.adaptive:
+            self._set_qps(min(config.qps, self._qps + config.increase))
+
+    def record_throttled(self, retry_after: float | None = None) -> bool:
+        """Slows the bucket down after the upstream throttled a request.
+
+        Args:
+            retry_after: Seconds the upstream asked to wait before the next request.
+
+        Returns:
+            bool: Whether the retry budget allows retrying the request.
+        """
+        self.metrics.throttled += 1
+        if retry_after is not None:
+            self._blocked_until = max(
+                self._blocked_until, time.monotonic() + retry_after
+            )
+        if self.config.adaptive:
+            self._set_qps(max(self.config.min_qps, self._qps * self.config.decrease))
+        if self._retry_budget >= 1:
+            self._retry_budget -= 1
+            return True
+        self.metrics.retries_denied += 1
+        return False
+
+    @asynccontextmanager
+    async def limit(self) -> AsyncIterator[None]:
+        """Acquires a token for the request made in the body of the `async with` block.
+
+        Raise `RateLimited` from the body when the upstream throttles the request. It is
+        re-raised so that Restate retries the step, or converted to a `TerminalError`
+        once the retry budget is exhausted. The request only counts as a success if the
+        body doesn't raise, so check for error responses in it, e.g. with
+        `raise_for_status()`.
+        """
+        await self.acquire()
+        try:
+            yield
+        except RateLimited as e:
+            if not self.record_throttled(e.retry_after):
+                raise TerminalError(
+                    f"{e}, retry budget exhausted", status_code=429
+                ) from e
+            raise
+        else:
+            self.record_success()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(float(self.config.burst), self._tokens + elapsed * self._qps)
+
+    def _set_qps(self, qps: float) -> None:
+        self._qps = qps
+        self.metrics.qps = qps
+
+
+# Rate limits per upstream, each value can be overridden with the
+# `RATE_LIMIT_<NAME>_QPS` and `RATE_LIMIT_<NAME>_BURST` environment variables.
+# Upstreams without an entry here or a `RATE_LIMIT_<NAME>_QPS` are not limited.
+DEFAULT_RATE_LIMITS: dict[str, RateLimitConfig] = {
+    "mapbox": RateLimitConfig(qps=10, burst=10),
+    "tomorrow_io": RateLimitConfig(qps=3, burst=3),
+    "tavily": RateLimitConfig(qps=5, burst=5),
+    "openai": RateLimitConfig(qps=10, burst=20),
+}
+
+_rate_limiters: dict[str, RateLimiter] = {}
+
+
+def _rate_limit_config(name: str) -> RateLimitConfig | None:
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    qps = os.getenv(f"{prefix}_QPS")
+    default = DEFAULT_RATE_LIMITS.get(name)
+    if default is None:
+        if qps is None:
+            return None
+        default = RateLimitConfig(qps=float(qps), burst=max(1, int(float(qps))))
+    return replace(
+        default,
+        qps=float(qps or default.qps),
+        burst=int(os.getenv(f"{prefix}_BURST", default.burst)),
+    )
+
+
+def find_rate_limiter(name: str) -> RateLimiter | None:
+    """Returns the process wide rate limiter for the upstream `name`, `None` if the
+    upstream has no rate limit configured."""
+    if (limiter := _rate_limiters.get(name)) is None:
+        if (config := _rate_limit_config(name)) is None:
+            return None
+        limiter = _rate_limiters[name] = RateLimiter(name, config)
+    return limiter
+
+
+def rate_limiter(name: str) -> RateLimiter:
+    """Returns the process wide rate limiter for the upstream `name`, which must have
+    a rate limit configured."""
+    if (limiter := find_rate_limiter(name)) is None:
+        raise KeyError(f"No rate limit configured for {name!r}")
+    return limiter
+
+
+def rate_limit_metrics() -> dict[str, RateLimitMetrics]:
+    return {name: limiter.metrics for name, limiter in _rate_limiters.items()}
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """Parses a `Retry-After` header given in seconds or as an HTTP date."""
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_rate_limit(
+    upstream: str, status_code: int, headers: Mapping[str, str]
+) -> None:
+    """Raises `RateLimited` if an HTTP response signals rate limiting."""
+    if status_code == 429:
+        raise RateLimited(upstream, parse_retry_after(headers))
@@ -0,0 +1,142 @@
+import heapq
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class _Entry(Generic[T]):
+    score: float
+    tie: str
+    seq: int
+    item: T
+
+    def __lt__(self, other: "_Entry[T]") -> bool:
+        # Orders entries worst-first so the heap root is always the next one to evict:
+        # lower score, then larger tie-breaker, then later arrival.
+        if self.score != other.score:
+            return self.score < other.score
+        if self.tie != other.tie:
+            return self.tie > other.tie
+        return self.seq > other.seq
+
+
+class TopK(Generic[T]):
+    """Streaming top-K selector backed by a bounded min-heap.
+
+    Items are ranked by `key` (highest first). Ties are broken by `tie_breaker`
+    (lowest first) and then by arrival order, so the selection only depends on the
+    items themselves and is stable across Restate replays.
+    """
+
+    def __init__(
+        self,
+        k: int,
+        key: Callable[[T], float],
+        tie_breaker: Callable[[T], str] | None = None,
+    ):
+        """
+        Args:
+            k: Maximum number of items to keep.
+            key: Returns the score of an item, higher is better.
+            tie_breaker: Returns a string used to order items with equal scores.
+        """
+        if k < 0:
+            raise ValueError("k must be non-negative")
+        self.k = k
+        self._key = key
+        self._tie_breaker = tie_breaker
+        self._heap: list[_Entry[T]] = []
+        self._seq = 0
+
+    def push(self, item: T) -> None:
+        if self.k == 0:
+            return
+        score = self._key(item)
+        heap = self._heap
+        full = len(heap) >= self.k
+        # Cheap rejection before building an entry: most items in a long stream
+        # score strictly below the current worst selected item.
+        if full and score < heap[0].score:
+            self._seq += 1
+            return
+        tie = self._tie_breaker(item) if self._tie_breaker else ""
+        entry = _Entry(score, tie, self._seq, item)
+        self._seq += 1
+        if not full:
+            heapq.heappush(heap, entry)
+        elif heap[0] < entry:
+            heapq.heapreplace(heap, entry)
+
+    def extend(self, items: Iterable[T]) -> None:
+        push = self.push
+        for item in items:
+            push(item)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def result(self) -> list[T]:
+        """Returns the selected items, best first."""
+        return [entry.item for entry in sorted(self._heap, reverse=True)]
+
+
+class TieredTopK(Generic[T]):
+    """Top-K selection across priority tiers with a separate quota per tier.
+
+    Items pushed for a tier without a quota are dropped. The result lists tiers in
+    ascending priority order (1 = highest priority), each ranked best first.
+    """
+
+    def __init__(
+        self,
+        quotas: Mapping[int, int],
+        key: Callable[[T], float],
+        tie_breaker: Callable[[T], str] | None = None,
+    ):
+        """
+        Args:
+            quotas: Maximum number of items to keep per priority tier.
+            key: Returns the score of an item, higher is better.
+            tie_breaker: Returns a string used to order items with equal scores.
+        """
+        self._selectors = {
+            tier: TopK(k, key, tie_breaker) for tier, k in sorted(quotas.items())
+        }
+
+    def push(self, tier: int, item: T) -> None:
+        if (selector := self._selectors.get(tier)) is not None:
+            selector.push(item)
+
+    def extend(self, tier: int, items: Iterable[T]) -> None:
+        if (selector := self._selectors.get(tier)) is not None:
+            selector.extend(items)
+
+    def result(self) -> list[T]:
+        return [
+            item for selector in self._selectors.values() for item in selector.result()
+        ]
+
+
+def top_k(
+    items: Iterable[T],
+    k: int,
+    key: Callable[[T], float],
+    tie_breaker: Callable[[T], str] | None = None,
+) -> list[T]:
+    """Returns the `k` highest scoring items, best first.
+
+    Args:
+        items: Items to select from, consumed lazily.
+        k: Maximum number of items to return.
+        key: Returns the score of an item, higher is better.
+        tie_breaker: Returns a string used to order items with equal scores.
+
+    Returns:
+        list[T]: At most `k` items ordered by descending score.
+    """
+    selector = TopK(k, key, tie_breaker)
+    selector.extend(items)
+    return selector.result()
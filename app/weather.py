@@ -1,16 +1,23 @@
+import itertools
 import os
-import urllib.parse
+import re
 from dataclasses import dataclass
-from typing import Any
 
 import logfire
+import restate
 from dotenv import load_dotenv
 from httpx import AsyncClient
 from pydantic import BaseModel
 from pydantic_ai import Agent, ModelRetry, RunContext
-from restate import Context, Service
+from restate import Context, RestateDurableFuture, RunOptions, Service, TerminalError
+from restate.server_context import restate_context_is_replaying
 
+from app.clients import mapbox
+from app.clients import weather as weather_client
+from app.clients.mapbox import LatLng
+from app.clients.weather import WeatherReport
 from app.restate import RestateAgent
+from app.schemas.weather import CityWeather
 
 load_dotenv()
 
@@ -33,39 +40,61 @@ weather_agent = Agent[Deps](
 )
 
 
-class LatLng(BaseModel):
-    lat: float
-    lng: float
+async def fetch_lat_lng(deps: Deps, location_description: str) -> LatLng | None:
+    """Geocodes a location with Mapbox, returns `None` if it could not be found."""
+    return await mapbox.geocode(deps.client, deps.geo_api_key, location_description)
+
+
+async def fetch_weather(deps: Deps, lat: float, lng: float) -> WeatherReport:
+    """Fetches the current weather at a location from Tomorrow.io."""
+    return await weather_client.fetch_weather(
+        deps.client, deps.weather_api_key, lat, lng
+    )
+
+
+async def fetch_city_weather(deps: Deps, location: str) -> CityWeather:
+    """Geocodes a location and fetches its weather as soon as the coordinates are in."""
+    lat_lng = await fetch_lat_lng(deps, location)
+    if lat_lng is None:
+        return CityWeather(location=location, error="Could not find the location")
+    weather = await fetch_weather(deps, lat_lng.lat, lat_lng.lng)
+    return CityWeather(
+        location=location, lat=lat_lng.lat, lng=lat_lng.lng, **weather.model_dump()
+    )
 
 
 @weather_agent.tool
-async def get_lat_lng(ctx: RunContext[Deps], location_description: str) -> LatLng:
-    """Get the latitude and longitude of a location.
+async def get_weather_for_location(
+    ctx: RunContext[Deps], location_description: str
+) -> CityWeather:
+    """Get the weather at a location, use this unless you already have coordinates.
 
     Args:
         ctx: The context.
         location_description: A description of a location.
     """
+    # Saves the model the round trip between geocoding and fetching the weather.
+    city_weather = await fetch_city_weather(ctx.deps, location_description)
+    if city_weather.error:
+        raise ModelRetry(city_weather.error)
+    return city_weather
 
-    params = {"access_token": ctx.deps.geo_api_key}
-    loc = urllib.parse.quote(location_description)
-    with logfire.span("calling geocoding API", params=params) as span:
-        r = await ctx.deps.client.get(
-            f"https://api.mapbox.com/geocoding/v5/mapbox.places/{loc}.json",
-            params=params,
-        )
-        r.raise_for_status()
-        data = r.json()
 
-    if features := data["features"]:
-        lng, lat = features[0]["center"]
-        return LatLng(lat=lat, lng=lng)
-    else:
-        raise ModelRetry("Could not find the location")
+@weather_agent.tool
+async def get_lat_lng(ctx: RunContext[Deps], location_description: str) -> LatLng:
+    """Get the latitude and longitude of a location.
+
+    Args:
+        ctx: The context.
+        location_description: A description of a location.
+    """
+    if lat_lng := await fetch_lat_lng(ctx.deps, location_description):
+        return lat_lng
+    raise ModelRetry("Could not find the location")
 
 
 @weather_agent.tool
-async def get_weather(ctx: RunContext[Deps], lat: float, lng: float) -> dict[str, Any]:
+async def get_weather(ctx: RunContext[Deps], lat: float, lng: float) -> WeatherReport:
     """Get the weather at a location.
 
     Args:
@@ -73,63 +102,196 @@ async def get_weather(ctx: RunContext[Deps], lat: float, lng: float) -> dict[str
         lat: Latitude of the location.
         lng: Longitude of the location.
     """
-    params = {
-        "apikey": ctx.deps.weather_api_key,
-        "location": f"{lat},{lng}",
-        "units": "metric",
-    }
-    with logfire.span("calling weather API", params=params) as span:
-        r = await ctx.deps.client.get(
-            "https://api.tomorrow.io/v4/weather/realtime", params=params
-        )
-        r.raise_for_status()
-        data = r.json()
-        span.set_attribute("response", data)
-
-    values = data["data"]["values"]
-    # https://docs.tomorrow.io/reference/data-layers-weather-codes
-    code_lookup = {
-        1000: "Clear, Sunny",
-        1100: "Mostly Clear",
-        1101: "Partly Cloudy",
-        1102: "Mostly Cloudy",
-        1001: "Cloudy",
-        2000: "Fog",
-        2100: "Light Fog",
-        4000: "Drizzle",
-        4001: "Rain",
-        4200: "Light Rain",
-        4201: "Heavy Rain",
-        5000: "Snow",
-        5001: "Flurries",
-        5100: "Light Snow",
-        5101: "Heavy Snow",
-        6000: "Freezing Drizzle",
-        6001: "Freezing Rain",
-        6200: "Light Freezing Rain",
-        6201: "Heavy Freezing Rain",
-        7000: "Ice Pellets",
-        7101: "Heavy Ice Pellets",
-        7102: "Light Ice Pellets",
-        8000: "Thunderstorm",
-    }
-    return {
-        "temperature": f"{values['temperatureApparent']}°C",
-        "description": code_lookup.get(values["weatherCode"], "Unknown"),
-    }
+    return await fetch_weather(ctx.deps, lat, lng)
 
 
 weather_service = Service(name="Weather_Service")
 
 example_city_or_cities = "Tokyo and Los Angeles"
+example_locations = ["Tokyo", "Los Angeles", "Paris", "Toronto"]
+
+# Maximum number of cities fetched concurrently.
+BATCH_FAN_OUT = 16
 
 
 class Prompt(BaseModel):
     city_or_cities: str = example_city_or_cities
 
 
+class WeatherBatchRequest(BaseModel):
+    locations: list[str] = example_locations
+    summarize: bool = False
+
+
+class WeatherBatchResponse(BaseModel):
+    results: list[CityWeather]
+    summary: str | None = None
+
+
+_fast_path_requests = logfire.metric_counter(
+    "weather.fast_path.requests",
+    unit="{request}",
+    description="Weather requests, by whether they skipped the model",
+)
+
+
+def record_fast_path(hit: bool) -> None:
+    # A replayed invocation was already counted when it first ran.
+    if restate_context_is_replaying.get():
+        return
+    _fast_path_requests.add(1, {"hit": hit})
+
+
+summary_agent = Agent(
+    "openai:gpt-4.1-mini",
+    instructions="Summarize the weather in the given cities, one short sentence per city.",
+)
+
+_CITY_SEPARATOR = re.compile(r"\s*,\s*")
+# The "and" before the last city, with or without a serial comma.
+_LAST_CITY_SEPARATOR = re.compile(r"\s*,?\s+and\s+", re.IGNORECASE)
+# Separators that could as well be part of one place's name.
+_NOT_A_LIST = re.compile(r"&|;")
+# Places whose name reads like a list of two.
+_NAMES_WITH_AND = frozenset(
+    {
+        "antigua and barbuda",
+        "bosnia and herzegovina",
+        "heard and mcdonald islands",
+        "saint kitts and nevis",
+        "sao tome and principe",
+        "trinidad and tobago",
+        "turks and caicos",
+        "turks and caicos islands",
+    }
+)
+_CITY_NAME = re.compile(r"[^\W\d_]+(?:[ .'-]+[^\W\d_]+){0,3}\.?")
+# Words that show a prompt is a question rather than a plain list of cities.
+_NOT_CITY_WORDS = frozenset(
+    {
+        "what",
+        "whats",
+        "how",
+        "is",
+        "are",
+        "will",
+        "weather",
+        "like",
+        "in",
+        "at",
+        "for",
+        "today",
+        "tomorrow",
+        "tonight",
+        "now",
+        "forecast",
+        "temperature",
+        "rain",
+        "please",
+    }
+)
+
+
+def parse_city_list(text: str) -> list[str] | None:
+    """Parses a plain list of cities, e.g. "Tokyo, Paris, and Los Angeles".
+
+    Cities are separated by commas, the last one may be joined with "and" instead
+    ("Tokyo and Los Angeles"). Returns `None` for anything that might be something
+    else, which the agent then handles: a single comma ("Portland, Oregon",
+    "Washington, D.C. and Boston"), more than one "and" or a comma after it,
+    "&" or ";" anywhere, places named like a list ("Trinidad and Tobago"), and
+    names with a lowercase word ("Tell me about Paris").
+    """
+    text = text.strip().rstrip(".!")
+    if not text or "?" in text:
+        return None
+    if text.count(",") == 1 or _NOT_A_LIST.search(text):
+        return None
+    head, *tail = _LAST_CITY_SEPARATOR.split(text)
+    if len(tail) > 1 or any("," in city for city in tail):
+        return None
+    cities = [city for city in _CITY_SEPARATOR.split(head) if city] + tail
+    if tail and f"{cities[-2]} and {cities[-1]}".lower() in _NAMES_WITH_AND:
+        return None
+    if not cities or len(cities) > BATCH_FAN_OUT:
+        return None
+    for city in cities:
+        if not _CITY_NAME.fullmatch(city):
+            return None
+        # State or country codes ("Los Angeles, CA") qualify the previous city.
+        if len(city) <= 3 and city.isupper():
+            return None
+        words = city.split()
+        if not all(word[0].isupper() for word in words):
+            return None
+        if any(word.lower() in _NOT_CITY_WORDS for word in words):
+            return None
+    return cities
+
+
+def format_weather_report(results: list[CityWeather]) -> str:
+    return " ".join(
+        f"{city.location}: {city.error}."
+        if city.error
+        else f"{city.location}: {city.description}, {city.temperature}."
+        for city in results
+    )
+
+
+async def fetch_cities_weather(ctx: Context, locations: list[str]) -> list[CityWeather]:
+    """Geocodes and fetches the weather for each location in its own durable step.
+
+    At most `BATCH_FAN_OUT` steps run at a time, the next one starts as soon as any
+    of them completes. Locations that cannot be found, or whose step fails
+    terminally, get an `error` instead of failing the whole call.
+    """
+    async with AsyncClient() as client:
+        deps = Deps(
+            client=client,
+            weather_api_key=os.getenv("WEATHER_API_KEY"),
+            geo_api_key=os.getenv("GEO_API_KEY"),
+        )
+
+        results: dict[int, CityWeather] = {}
+        # Steps are started in the order of `locations`, so the journal is the
+        # same on replay whichever step completes first.
+        waiting = iter(enumerate(locations))
+        running: dict[RestateDurableFuture[CityWeather], int] = {}
+        while True:
+            for index, location in itertools.islice(
+                waiting, BATCH_FAN_OUT - len(running)
+            ):
+                future = ctx.run_typed(
+                    f"Weather for {location}",
+                    fetch_city_weather,
+                    RunOptions(max_attempts=3, type_hint=CityWeather),
+                    deps=deps,
+                    location=location,
+                )
+                running[future] = index
+            if not running:
+                break
+            completed, _ = await restate.wait_completed(*running)
+            for future in completed:
+                index = running.pop(future)
+                try:
+                    results[index] = await future
+                except TerminalError as e:
+                    results[index] = CityWeather(
+                        location=locations[index], error=e.message
+                    )
+        return [results[index] for index in range(len(locations))]
+
+
 @weather_service.handler()
 async def handle_weather_request(ctx: Context, prompt: Prompt) -> str:
+    # Plain lists of cities skip the model entirely, only free-form prompts
+    # go through the agent.
+    cities = parse_city_list(prompt.city_or_cities)
+    record_fast_path(hit=cities is not None)
+    if cities:
+        return format_weather_report(await fetch_cities_weather(ctx, cities))
+
     async with AsyncClient() as client:
         weather_api_key = os.getenv("WEATHER_API_KEY")
         geo_api_key = os.getenv("GEO_API_KEY")
@@ -142,3 +304,24 @@ async def handle_weather_request(ctx: Context, prompt: Prompt) -> str:
             deps=deps,
         )
         return result.output
+
+
+@weather_service.handler()
+async def handle_weather_batch(
+    ctx: Context, request: WeatherBatchRequest
+) -> WeatherBatchResponse:
+    """Fetches the weather for many cities without letting a model pick the tools.
+
+    A single model call summarizes the results if `summarize` is set.
+    """
+    results = await fetch_cities_weather(ctx, request.locations)
+
+    summary = None
+    if request.summarize:
+        restate_agent = RestateAgent(summary_agent, restate_context=ctx)
+        result = await restate_agent.run(
+            WeatherBatchResponse(results=results).model_dump_json(exclude_none=True)
+        )
+        summary = result.output
+
+    return WeatherBatchResponse(results=results, summary=summary)
@@ -1,7 +1,5 @@
 import os
-import urllib.parse
 from dataclasses import dataclass
-from typing import Any
 
 import logfire
 import restate
@@ -11,7 +9,12 @@ from pydantic import BaseModel
 from pydantic_ai import Agent, ModelRetry, RunContext
 from restate import Context, RunOptions
 
+from app.clients import mapbox
+from app.clients import weather as weather_client
+from app.clients.mapbox import LatLng
+from app.clients.weather import WeatherReport
 from app.restate import RestateAgent
+from app.schemas.weather import CityWeather
 
 load_dotenv()
 
@@ -36,43 +39,65 @@ weather_agent = Agent[Deps](
 )
 
 
-class LatLng(BaseModel):
-    lat: float
-    lng: float
+async def fetch_lat_lng(ctx: RunContext[Deps], location_description: str) -> LatLng:
+    async def fetch_lat_lng():
+        lat_lng = await mapbox.geocode(
+            ctx.deps.client, ctx.deps.geo_api_key, location_description
+        )
+        if lat_lng is None:
+            raise ModelRetry("Could not find the location")
+        return lat_lng
+
+    return await ctx.deps.restate_context.run_typed(
+        "Getting lat/lng", fetch_lat_lng, RunOptions(type_hint=LatLng)
+    )
+
+
+async def fetch_weather(ctx: RunContext[Deps], lat: float, lng: float) -> WeatherReport:
+    async def fetch_weather():
+        return await weather_client.fetch_weather(
+            ctx.deps.client, ctx.deps.weather_api_key, lat, lng
+        )
+
+    return await ctx.deps.restate_context.run_typed(
+        "Fetching weather", fetch_weather, RunOptions(type_hint=WeatherReport)
+    )
 
 
 @weather_agent.tool
-async def get_lat_lng(ctx: RunContext[Deps], location_description: str) -> dict:
-    """Get the latitude and longitude of a location.
+async def get_weather_for_location(
+    ctx: RunContext[Deps], location_description: str
+) -> CityWeather:
+    """Get the weather at a location, use this unless you already have coordinates.
 
     Args:
         ctx: The context.
         location_description: A description of a location.
     """
-    params = {"access_token": ctx.deps.geo_api_key}
-    loc = urllib.parse.quote(location_description)
+    # Saves the model the round trip between geocoding and fetching the weather.
+    lat_lng = await fetch_lat_lng(ctx, location_description)
+    weather = await fetch_weather(ctx, lat_lng.lat, lat_lng.lng)
+    return CityWeather(
+        location=location_description,
+        lat=lat_lng.lat,
+        lng=lat_lng.lng,
+        **weather.model_dump(),
+    )
 
-    async def fetch_lat_lng():
-        with logfire.span("calling geocoding API", params=params) as span:
-            r = await ctx.deps.client.get(
-                f"https://api.mapbox.com/geocoding/v5/mapbox.places/{loc}.json",
-                params=params,
-            )
-            r.raise_for_status()
-            data = r.json()
-            if features := data["features"]:
-                lng, lat = features[0]["center"]
-                return LatLng(lat=lat, lng=lng)
-            else:
-                raise ModelRetry("Could not find the location")
 
-    return await ctx.deps.restate_context.run_typed(
-        "Getting lat/lng", fetch_lat_lng, RunOptions(type_hint=LatLng)
-    )
+@weather_agent.tool
+async def get_lat_lng(ctx: RunContext[Deps], location_description: str) -> LatLng:
+    """Get the latitude and longitude of a location.
+
+    Args:
+        ctx: The context.
+        location_description: A description of a location.
+    """
+    return await fetch_lat_lng(ctx, location_description)
 
 
 @weather_agent.tool
-async def get_weather(ctx: RunContext[Deps], lat: float, lng: float) -> dict[str, Any]:
+async def get_weather(ctx: RunContext[Deps], lat: float, lng: float) -> WeatherReport:
     """Get the weather at a location.
 
     Args:
@@ -80,57 +105,7 @@ async def get_weather(ctx: RunContext[Deps], lat: float, lng: float) -> dict[str
         lat: Latitude of the location.
         lng: Longitude of the location.
     """
-    params = {
-        "apikey": ctx.deps.weather_api_key,
-        "location": f"{lat},{lng}",
-        "units": "metric",
-    }
-
-    async def fetch_weather():
-        with logfire.span("calling weather API", params=params) as span:
-            r = await ctx.deps.client.get(
-                "https://api.tomorrow.io/v4/weather/realtime", params=params
-            )
-            r.raise_for_status()
-            data = r.json()
-            span.set_attribute("response", data)
-            values = data["data"]["values"]
-            # https://docs.tomorrow.io/reference/data-layers-weather-codes
-            code_lookup = {
-                1000: "Clear, Sunny",
-                1100: "Mostly Clear",
-                1101: "Partly Cloudy",
-                1102: "Mostly Cloudy",
-                1001: "Cloudy",
-                2000: "Fog",
-                2100: "Light Fog",
-                4000: "Drizzle",
-                4001: "Rain",
-                4200: "Light Rain",
-                4201: "Heavy Rain",
-                5000: "Snow",
-                5001: "Flurries",
-                5100: "Light Snow",
-                5101: "Heavy Snow",
-                6000: "Freezing Drizzle",
-                6001: "Freezing Rain",
-                6200: "Light Freezing Rain",
-                6201: "Heavy Freezing Rain",
-                7000: "Ice Pellets",
-                7101: "Heavy Ice Pellets",
-                7102: "Light Ice Pellets",
-                8000: "Thunderstorm",
-            }
-            return {
-                "temperature": f"{values['temperatureApparent']}°C",
-                "description": code_lookup.get(values["weatherCode"], "Unknown"),
-            }
-
-    weather_response_fut = ctx.deps.restate_context.run_typed(
-        "Fetching weather", fetch_weather
-    )
-
-    return await weather_response_fut
+    return await fetch_weather(ctx, lat, lng)
 
 
 weather_service_advanced = restate.Service(name="Weather_Service_Advanced")
@@ -147,7 +122,10 @@ async def handle_weather_request(ctx: Context, prompt: Prompt):
     async with AsyncClient() as client:
         geo_api_key = os.getenv("GEO_API_KEY")
         weather_api_key = os.getenv("WEATHER_API_KEY")
-        restate_agent = RestateAgent(weather_agent, restate_context=ctx)
+        # The tools journal their own steps, a `ctx.run` around them would nest them.
+        restate_agent = RestateAgent(
+            weather_agent, restate_context=ctx, disable_auto_wrapping_tools=True
+        )
         deps = Deps(
             client=client,
             restate_context=ctx,
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from unittest import mock
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+import app.chaining_typed as chaining_typed
+from app.chaining_typed import Prompt, run_typed_call_chaining
+from app.restate import Chain, RestateAgent, journal_usage
+from app.schemas.chaining import Metric
+from tests.fakes import FakeContext
+
+INVOCATIONS = 20
+
+# A fast completion of a short prompt, the model calls dominate either way.
+MODEL_LATENCY = 0.3
+
+METRICS = [
+    Metric(name="Customer satisfaction score", value=92, unit="points"),
+    Metric(name="Revenue growth", value=45, unit="%"),
+    Metric(name="Market share", value=23, unit="%"),
+    Metric(name="Customer churn", value=5, unit="%"),
+]
+
+TABLE = chaining_typed.format_metrics_table(chaining_typed.sort_metrics(METRICS))
+
+
+model_calls = 0
+
+
+async def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    global model_calls
+    model_calls += 1
+    await asyncio.sleep(MODEL_LATENCY)
+    if info.output_tools:
+        metrics = [metric.model_dump() for metric in METRICS]
+        return ModelResponse(
+            parts=[ToolCallPart(info.output_tools[0].name, {"response": metrics})]
+        )
+    return ModelResponse(parts=[TextPart(TABLE)])
+
+
+fake_model = FunctionModel(respond, model_name="fake")
+
+
+async def three_model_calls(ctx: FakeContext, prompt: Prompt) -> str:
+    """The chain as it was, with the sort and the table left to the model."""
+    agent = Agent(fake_model)
+
+    async def agent_call(step: str, prompt_text: str) -> str:
+        result = await RestateAgent(agent, ctx, step=step).run(prompt_text)
+        return result.output
+
+    table = await (
+        Chain(ctx)
+        .step(
+            "Extract metrics",
+            lambda text: agent_call("Extract metrics", text),
+            durable=True,
+        )
+        .step(
+            "Sort metrics",
+            lambda metrics: agent_call("Sort metrics", metrics),
+            durable=True,
+        )
+        .step(
+            "Format as table",
+            lambda lines: agent_call("Format as table", lines),
+            durable=True,
+        )
+        .run(prompt.message)
+    )
+    await journal_usage(ctx)
+    return table
+
+
+async def bench(name: str, handler) -> None:
+    global model_calls
+    model_calls = 0
+    start = time.perf_counter()
+    for _ in range(INVOCATIONS):
+        assert await handler(FakeContext(), Prompt()) == TABLE
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<17} model calls: {model_calls / INVOCATIONS:.0f}, "
+        f"{elapsed / INVOCATIONS * 1000:.0f} ms per invocation"
+    )
+
+
+async def main():
+    print(f"Fake model answering in {MODEL_LATENCY * 1000:.0f} ms")
+    await bench("three model calls", three_model_calls)
+    metrics_agent = Agent(
+        fake_model, output_type=list[Metric], instructions="Be concise."
+    )
+    with mock.patch.object(chaining_typed, "metrics_agent", metrics_agent):
+        await bench("one model call", run_typed_call_chaining)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter
+
+from httpx import AsyncClient, Response
+
+from app.util.hedging import HedgePolicy, Hedger
+
+HOST = "127.0.0.1"
+PORT = 8765
+REQUESTS = 1000
+CONCURRENCY = 8
+# Rare enough that the default p95 hedge delay stays below the spikes.
+SPIKE_RATE = 0.02
+SPIKE_SECONDS = 1.0
+BODY = b'{"data": {"values": {"temperatureApparent": 21.5, "weatherCode": 1000}}}'
+
+# Attempts seen per request id, so a hedged attempt gets its own latency.
+attempts: Counter[str] = Counter()
+
+
+def latency(request_id: str) -> float:
+    """The latency of the next attempt of a request, the same on every run."""
+    attempts[request_id] += 1
+    rng = random.Random(f"{request_id}:{attempts[request_id]}")
+    if rng.random() < SPIKE_RATE:
+        return SPIKE_SECONDS
+    return rng.uniform(0.01, 0.03)
+
+
+async def handle_connection(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """A minimal HTTP/1.1 stub that answers most requests in ~20ms, with rare spikes."""
+    try:
+        while head := await reader.readuntil(b"\r\n\r\n"):
+            path = head.split(b" ", 2)[1].decode()
+            await asyncio.sleep(latency(path.rpartition("=")[2]))
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(BODY)}\r\n\r\n".encode()
+                + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run(client: AsyncClient, hedger: Hedger) -> list[float]:
+    attempts.clear()
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def send_request(i: int) -> Response:
+        r = await client.get(f"http://{HOST}:{PORT}/v4/weather/realtime?request={i}")
+        r.raise_for_status()
+        return r
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await hedger.run(lambda: send_request(i))
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    return latencies
+
+
+def report(name: str, latencies: list[float], hedger: Hedger) -> None:
+    q = statistics.quantiles(latencies, n=100)
+    extra = hedger.metrics.hedged / max(1, hedger.metrics.requests)
+    print(
+        f"{name:<12} p50 {q[49] * 1000:7.1f} ms  p95 {q[94] * 1000:7.1f} ms  "
+        f"p99 {q[98] * 1000:7.1f} ms  max {max(latencies) * 1000:7.1f} ms  "
+        f"extra requests {extra:.1%}"
+    )
+
+
+async def main():
+    server = await asyncio.start_server(handle_connection, HOST, PORT)
+    async with server, AsyncClient() as client:
+        baseline = Hedger("stub", HedgePolicy(enabled=False))
+        report("no hedging", await run(client, baseline), baseline)
+
+        hedged = Hedger("stub", HedgePolicy(enabled=True))
+        report("hedged", await run(client, hedged), hedged)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
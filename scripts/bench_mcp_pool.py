@@ -0,0 +1,59 @@
+import asyncio
+import os
+import sys
+import time
+
+from pydantic_ai import Agent
+from pydantic_ai.mcp import MCPServerStdio
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from app.restate import RestateAgent, mcp_session_pool
+from tests.fakes import FakeContext
+
+INVOCATIONS = 10
+
+
+server = MCPServerStdio(sys.executable, ["-m", "scripts.mcp_server"], cwd=os.getcwd())
+
+
+def convert_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    """Calls the conversion tool once, then answers with its result."""
+    if len(messages) == 1:
+        return ModelResponse(
+            parts=[ToolCallPart("celsius_to_fahrenheit", {"celsius": 21.5})]
+        )
+    return ModelResponse(parts=[TextPart(str(messages[-1].parts[0].content))])
+
+
+agent = Agent(FunctionModel(convert_model), toolsets=[server])
+
+
+async def invoke() -> float:
+    start = time.perf_counter()
+    result = await RestateAgent(agent, restate_context=FakeContext()).run("21.5 °C?")
+    assert result.output == "70.7 °F", result.output
+    return time.perf_counter() - start
+
+
+async def main():
+    cold = []
+    for _ in range(INVOCATIONS):
+        cold.append(await invoke())
+        # Without the pool every invocation starts its own server.
+        await mcp_session_pool.close()
+
+    warm = [await invoke() for _ in range(INVOCATIONS)]
+    assert len(mcp_session_pool) == 1 and server.is_running
+    await mcp_session_pool.close()
+    assert not server.is_running
+
+    for name, latencies in (("new session", cold), ("pooled", warm)):
+        print(
+            f"{name:<12} first {latencies[0] * 1000:7.1f} ms  "
+            f"mean of rest {sum(latencies[1:]) / (len(latencies) - 1) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
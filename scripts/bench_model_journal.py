@@ -0,0 +1,86 @@
+import asyncio
+import time
+from typing import Any
+
+from pydantic import TypeAdapter
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from app.restate import RestateAgent
+from app.restate._model import MODEL_CALL_SERDE
+from tests.fakes import FakeContext
+
+STEPS = 25
+CITIES = [f"City {i}" for i in range(STEPS)]
+
+
+def multi_step_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    """Asks for the weather of one city per step, then answers."""
+    step = sum(isinstance(m, ModelResponse) for m in messages)
+    if step < STEPS:
+        return ModelResponse(
+            parts=[
+                ToolCallPart(
+                    "get_weather",
+                    {"location": CITIES[step]},
+                    tool_call_id=f"call_{step}",
+                )
+            ]
+        )
+    return ModelResponse(parts=[TextPart("It is sunny everywhere. " * 10)])
+
+
+agent = Agent(FunctionModel(multi_step_model))
+
+
+@agent.tool_plain
+def get_weather(location: str) -> dict[str, Any]:
+    return {"location": location, "temperature": "21 °C", "description": "Sunny"}
+
+
+async def main():
+    ctx = FakeContext()
+    result = await RestateAgent(agent, restate_context=ctx).run("Weather please")
+    messages = result.all_messages()
+    responses = [m for m in messages if isinstance(m, ModelResponse)]
+    calls = len(responses)
+
+    # What was journaled before: each response, dumped with a new TypeAdapter.
+    start = time.perf_counter()
+    before = sum(len(TypeAdapter(type(r)).dump_json(r)) for r in responses)
+    before_seconds = time.perf_counter() - start
+
+    # Journaling the whole conversation on every call grows quadratically.
+    start = time.perf_counter()
+    full_history = 0
+    for i, message in enumerate(messages):
+        if isinstance(message, ModelResponse):
+            full_history += len(ModelMessagesTypeAdapter.dump_json(messages[: i + 1]))
+    full_history_seconds = time.perf_counter() - start
+
+    journaled = [
+        MODEL_CALL_SERDE.deserialize(entry.value)
+        for entry in ctx.journal
+        if entry.name == "Model call"
+    ]
+    start = time.perf_counter()
+    after = sum(len(MODEL_CALL_SERDE.serialize(result)) for result in journaled)
+    after_seconds = time.perf_counter() - start
+    print(f"{calls} model calls, {len(messages)} messages")
+    print(
+        f"full history per call   {full_history:8d} bytes  "
+        f"{full_history_seconds * 1000:6.2f} ms"
+    )
+    print(f"response, new adapter   {before:8d} bytes  {before_seconds * 1000:6.2f} ms")
+    print(f"response + digest       {after:8d} bytes  {after_seconds * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
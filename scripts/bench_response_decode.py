@@ -0,0 +1,88 @@
+import json
+import timeit
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from app.clients.mapbox import LatLng, lat_lng_from_response
+from app.schemas.tavily import TavilyResponse
+
+ROUNDS = 200
+
+RESPONSES = Path(__file__).parent.parent / "responses"
+
+# The results of every query of a lead generator run, as Tavily answered them.
+TAVILY_RESPONSES = [
+    json.dumps(
+        {
+            "query": result["query"],
+            "follow_up_questions": None,
+            "answer": None,
+            "images": [],
+            "results": result["results"],
+            "response_time": 1.2,
+            "request_id": f"request-{i}",
+        }
+    ).encode()
+    for tier in json.loads((RESPONSES / "search_results_organized.json").read_bytes())
+    for i, result in enumerate(tier["tier_results"])
+]
+
+MAPBOX_RESPONSE = (RESPONSES / "location.json").read_bytes()
+
+
+class _Snippet(BaseModel):
+    url: str
+    title: str
+    content: str
+    score: float
+
+
+class _SnippetResponse(BaseModel):
+    """A projection of `TavilyResponse` without the raw content of the pages."""
+
+    query: str
+    results: list[_Snippet]
+
+
+def tavily_dict() -> list[TavilyResponse]:
+    """What the Tavily SDK and `TavilyResponse(**response)` used to do."""
+    return [TavilyResponse(**json.loads(r)) for r in TAVILY_RESPONSES]
+
+
+def tavily_json() -> list[TavilyResponse]:
+    return [TavilyResponse.model_validate_json(r) for r in TAVILY_RESPONSES]
+
+
+def tavily_projected() -> list[_SnippetResponse]:
+    return [_SnippetResponse.model_validate_json(r) for r in TAVILY_RESPONSES]
+
+
+def mapbox_dict() -> LatLng:
+    """What `fetch_lat_lng` used to do."""
+    lng, lat = json.loads(MAPBOX_RESPONSE)["features"][0]["center"]
+    return LatLng(lat=lat, lng=lng)
+
+
+def mapbox_json() -> LatLng | None:
+    return lat_lng_from_response(MAPBOX_RESPONSE)
+
+
+def bench(name: str, fn, rounds: int, unit: str) -> None:
+    seconds = min(timeit.repeat(fn, number=rounds, repeat=5)) / rounds
+    print(f"{name:<28} {seconds * 1e6:8.2f} µs per {unit}")
+
+
+if __name__ == "__main__":
+    assert tavily_json() == tavily_dict()
+    assert mapbox_json() == mapbox_dict()
+
+    tavily_bytes = sum(len(r) for r in TAVILY_RESPONSES)
+    print(f"{len(TAVILY_RESPONSES)} Tavily responses, {tavily_bytes} bytes")
+    bench("json + TavilyResponse(**)", tavily_dict, ROUNDS, "batch")
+    bench("model_validate_json", tavily_json, ROUNDS, "batch")
+    bench("projected, no raw_content", tavily_projected, ROUNDS, "batch")
+
+    print(f"Mapbox response, {len(MAPBOX_RESPONSE)} bytes")
+    bench("json + LatLng", mapbox_dict, ROUNDS * 100, "response")
+    bench("lat_lng_from_response", mapbox_json, ROUNDS * 100, "response")
@@ -0,0 +1,63 @@
+import json
+import tracemalloc
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.schemas.tavily import TAVILY_RESULTS, TavilyResult
+
+
+class ModelTavilyResult(BaseModel):
+    """What `TavilyResult` used to be."""
+
+    url: str = Field(description="URL of the search result")
+    title: str = Field(description="Title of the search result")
+    content: str = Field(description="Content snippet from the search result")
+    score: float = Field(description="Relevance score of the result")
+    raw_content: Optional[str] = Field(
+        default=None, description="Raw content if available"
+    )
+
+
+MODEL_TAVILY_RESULTS = TypeAdapter(List[ModelTavilyResult])
+
+
+def load_results(raw_content: bool) -> bytes:
+    """The search results of every query in the leads fixture, as one JSON list."""
+    with open("responses/leads.json", "r", encoding="utf-8") as f:
+        data = json.loads(f.read())
+    results = [
+        result
+        for tier in data["tiers"]
+        for query_results in tier["results"]
+        for result in query_results["results"]["results"]
+    ]
+    if not raw_content:
+        for result in results:
+            result.pop("raw_content", None)
+    return json.dumps(results).encode()
+
+
+def bytes_per_result(adapter: TypeAdapter, content: bytes) -> tuple[float, list]:
+    tracemalloc.start()
+    results = adapter.validate_json(content)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated / len(results), results
+
+
+if __name__ == "__main__":
+    for raw_content in (True, False):
+        content = load_results(raw_content)
+        before, models = bytes_per_result(MODEL_TAVILY_RESULTS, content)
+        after, results = bytes_per_result(TAVILY_RESULTS, content)
+        assert all(isinstance(r, TavilyResult) for r in results)
+        assert TAVILY_RESULTS.dump_json(results) == MODEL_TAVILY_RESULTS.dump_json(
+            models
+        )
+        label = "with raw_content" if raw_content else "without raw_content"
+        print(
+            f"{len(results)} results {label:<20} "
+            f"BaseModel {before:8.0f} B, slotted dataclass {after:8.0f} B per result "
+            f"({before - after:.0f} B saved)"
+        )
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from pydantic_ai.models.test import TestModel
+from pydantic_ai.tools import RunContext
+from pydantic_ai.toolsets.function import FunctionToolset
+from pydantic_ai.usage import RunUsage
+
+from app.clients.weather import WeatherReport
+from app.restate._toolset import (
+    _ANY_RESULT,
+    RestateContextRunResult,
+    _result_type,
+    _ToolResultType,
+)
+from app.search import TavilyResponse, search_agent
+from app.weather import LatLng, weather_agent
+
+ROUNDS = 2000
+RESPONSES = Path(__file__).parent.parent / "responses"
+
+weather = WeatherReport(temperature="21 °C", description="Sunny")
+search_results = TavilyResponse.model_validate(
+    json.loads((RESPONSES / "search_results.json").read_text())
+)
+
+
+async def tools(agent):
+    ctx = RunContext(deps=None, model=TestModel(), usage=RunUsage())
+    (toolset,) = [t for t in agent.toolsets if isinstance(t, FunctionToolset)]
+    return await toolset.get_tools(ctx)
+
+
+def round_trip(
+    result_type: _ToolResultType, output, revalidate: _ToolResultType | None = None
+) -> tuple[float, int, object]:
+    """Journals and replays `output`, optionally re-validating the replayed value."""
+    result = RestateContextRunResult(kind="output", output=output)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        buf = result_type.serde.serialize(result)
+        journaled = result_type.serde.deserialize(buf)
+        assert journaled is not None
+        replayed = journaled.output
+        if revalidate is not None:
+            replayed = revalidate.output.validate_python(replayed)
+    return (time.perf_counter() - start) / ROUNDS, len(buf), replayed
+
+
+async def main():
+    weather_tools = await tools(weather_agent)
+    search_tools = await tools(search_agent)
+    cases = [
+        ("get_lat_lng", weather_tools["get_lat_lng"], LatLng(lat=35.68, lng=139.69)),
+        ("get_weather", weather_tools["get_weather"], weather),
+        ("tavily_search", search_tools["tavily_search"], search_results),
+    ]
+    for name, tool, output in cases:
+        typed = _result_type(tool)
+        for label, result_type, revalidate in (
+            ("Any", _ANY_RESULT, None),
+            ("Any + validation", _ANY_RESULT, typed),
+            ("typed", typed, None),
+        ):
+            seconds, size, replayed = round_trip(result_type, output, revalidate)
+            print(
+                f"{name:<14} {label:<17}{seconds * 1e6:8.1f} µs/round trip  "
+                f"{size:6d} bytes  replayed as {type(replayed).__name__}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
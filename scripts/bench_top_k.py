@@ -0,0 +1,120 @@
+import copy
+import json
+import random
+import time
+
+from pydantic import BaseModel
+
+from app.schemas.tavily import TavilyResponse
+from app.util.top_k import TieredTopK
+
+SCALE = 100
+K = 50
+ROUNDS = 5
+
+
+# The shape of responses/leads.json, the single document leads used to be saved as.
+class QueryResults(BaseModel):
+    query: str
+    description: str
+    results: TavilyResponse
+
+
+class TierResults(BaseModel):
+    name: str
+    description: str
+    priority: int
+    results: list[QueryResults]
+
+
+class Leads(BaseModel):
+    company_context: str
+    total_tiers: int
+    usage_instructions: list[str]
+    tiers: list[TierResults]
+
+
+def load_scaled_leads() -> Leads:
+    """Loads the leads fixture with every query repeated `SCALE` times.
+
+    Copies get distinct URLs and jittered scores, as separate queries would return.
+    """
+    with open("responses/leads.json", "r", encoding="utf-8") as f:
+        data = json.loads(f.read())
+    rng = random.Random(0)
+    for tier in data["tiers"]:
+        scaled = []
+        for i in range(SCALE):
+            for query_results in tier["results"]:
+                query_results = copy.deepcopy(query_results)
+                for result in query_results["results"]["results"]:
+                    result["url"] = f"{result['url']}?copy={i}"
+                    result["score"] = float(result["score"]) * rng.uniform(0.5, 1.0)
+                scaled.append(query_results)
+        tier["results"] = scaled
+    return Leads(**data)
+
+
+def full_sort(leads: Leads) -> list[dict]:
+    return [
+        {
+            "title": lead.title,
+            "url": lead.url,
+            "content": lead.content,
+            "score": lead.score,
+        }
+        for lead in sorted(
+            (
+                result
+                for tier in leads.tiers
+                if tier.priority == 1
+                for query_results in tier.results
+                for result in query_results.results.results
+            ),
+            key=lambda x: x.score,
+            reverse=True,
+        )
+    ]
+
+
+def heap_top_k(leads: Leads) -> list[dict]:
+    selector = TieredTopK({1: K}, key=lambda x: x.score, tie_breaker=lambda x: x.url)
+    for tier in leads.tiers:
+        for query_results in tier.results:
+            selector.extend(tier.priority, query_results.results.results)
+    return [
+        {
+            "title": lead.title,
+            "url": lead.url,
+            "content": lead.content,
+            "score": lead.score,
+        }
+        for lead in selector.result()
+    ]
+
+
+def bench(name: str, fn, leads: Leads) -> list[dict]:
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        out = fn(leads)
+        timings.append(time.perf_counter() - start)
+    best = min(timings) * 1000
+    print(f"{name:<12} best of {ROUNDS}: {best:8.2f} ms  ({len(out)} leads)")
+    return out
+
+
+def main():
+    leads = load_scaled_leads()
+    total = sum(len(q.results.results) for tier in leads.tiers for q in tier.results)
+    print(f"{total} results across {len(leads.tiers)} tiers (fixture x{SCALE})")
+
+    sorted_leads = bench("full sort", full_sort, leads)
+    top_leads = bench("heap top-k", heap_top_k, leads)
+
+    expected = [lead["score"] for lead in sorted_leads[:K]]
+    assert [lead["score"] for lead in top_leads] == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import asyncio
+import random
+import time
+from unittest import mock
+
+import restate
+from restate import RunOptions
+
+from app import weather
+from app.schemas.weather import CityWeather
+from app.weather import Deps, WeatherBatchRequest, handle_weather_batch
+from tests.fakes import FakeContext, fake_gather, fake_wait_completed
+
+CITIES = 200
+
+# Most lookups are quick, a few hit a slow geocoding or weather response.
+FAST_LATENCY = (0.05, 0.15)
+SLOW_LATENCY = 1.0
+SLOW_RATIO = 0.05
+
+rng = random.Random(0)
+latencies = {
+    f"City {i}": SLOW_LATENCY
+    if rng.random() < SLOW_RATIO
+    else rng.uniform(*FAST_LATENCY)
+    for i in range(CITIES)
+}
+
+
+async def fake_fetch_city_weather(deps: Deps, location: str) -> CityWeather:
+    await asyncio.sleep(latencies[location])
+    return CityWeather(location=location, temperature="20°C")
+
+
+async def fetch_in_waves(ctx: FakeContext, locations: list[str]) -> list[CityWeather]:
+    """Fetches the cities as it was done before, in fixed waves of `BATCH_FAN_OUT`."""
+    results: list[CityWeather] = []
+    for i in range(0, len(locations), weather.BATCH_FAN_OUT):
+        batch = locations[i : i + weather.BATCH_FAN_OUT]
+        futures = [
+            ctx.run_typed(
+                f"Weather for {location}",
+                fake_fetch_city_weather,
+                RunOptions(max_attempts=3, type_hint=CityWeather),
+                deps=None,
+                location=location,
+            )
+            for location in batch
+        ]
+        await restate.gather(*futures)
+        results.extend([await future for future in futures])
+    return results
+
+
+async def bench(name: str, fetch) -> None:
+    start = time.perf_counter()
+    with mock.patch.object(weather, "fetch_cities_weather", fetch):
+        response = await handle_weather_batch(
+            FakeContext(), WeatherBatchRequest(locations=list(latencies))
+        )
+    elapsed = time.perf_counter() - start
+    assert len(response.results) == CITIES
+    print(
+        f"{name:<15} {elapsed:.2f} s, {CITIES / elapsed:.0f} cities/s, "
+        f"{elapsed / CITIES * 1000:.1f} ms per city"
+    )
+
+
+async def main():
+    print(
+        f"{CITIES} cities, fan-out {weather.BATCH_FAN_OUT}, "
+        f"{SLOW_RATIO:.0%} of lookups take {SLOW_LATENCY * 1000:.0f} ms"
+    )
+    with (
+        mock.patch.object(weather, "fetch_city_weather", fake_fetch_city_weather),
+        fake_gather(),
+        fake_wait_completed(),
+    ):
+        await bench("waves", fetch_in_waves)
+        await bench("sliding window", weather.fetch_cities_weather)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+import json
+import timeit
+
+from app.clients.weather import WEATHER_CODES, WeatherReport
+
+ROUNDS = 20_000
+
+# A Tomorrow.io realtime response, of which only two values are used.
+RESPONSE = json.dumps(
+    {
+        "data": {
+            "time": "2025-10-19T01:00:00Z",
+            "values": {
+                "cloudBase": 0.5,
+                "cloudCeiling": 0.5,
+                "cloudCover": 82,
+                "dewPoint": 14.1,
+                "freezingRainIntensity": 0,
+                "hailProbability": 0.4,
+                "hailSize": 0.0,
+                "humidity": 79,
+                "precipitationProbability": 0,
+                "pressureSeaLevel": 1016.2,
+                "pressureSurfaceLevel": 1010.5,
+                "rainIntensity": 0,
+                "sleetIntensity": 0,
+                "snowIntensity": 0,
+                "temperature": 17.8,
+                "temperatureApparent": 17.8,
+                "uvHealthConcern": 0,
+                "uvIndex": 0,
+                "visibility": 16,
+                "weatherCode": 1102,
+                "windDirection": 41,
+                "windGust": 4.2,
+                "windSpeed": 2.5,
+            },
+        },
+        "location": {
+            "lat": 35.6895,
+            "lon": 139.6917,
+            "name": "Tokyo, Japan",
+            "type": "administrative",
+        },
+    }
+).encode()
+
+
+def decode_dict() -> dict[str, str]:
+    """What `get_weather` used to do, with the lookup table rebuilt on every call."""
+    values = json.loads(RESPONSE)["data"]["values"]
+    code_lookup = dict(WEATHER_CODES)
+    return {
+        "temperature": f"{values['temperatureApparent']}°C",
+        "description": code_lookup.get(values["weatherCode"], "Unknown"),
+    }
+
+
+def decode_report() -> WeatherReport:
+    return WeatherReport.from_response(RESPONSE)
+
+
+if __name__ == "__main__":
+    assert decode_report().model_dump() == decode_dict()
+    print(f"{len(RESPONSE)} byte response")
+    for name, fn in (("json + dict", decode_dict), ("WeatherReport", decode_report)):
+        seconds = min(timeit.repeat(fn, number=ROUNDS, repeat=5)) / ROUNDS
+        print(f"{name:<14} {seconds * 1e6:6.2f} µs per response")
@@ -0,0 +1,98 @@
+import asyncio
+from unittest import mock
+
+from httpx import AsyncClient
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+import app.weather as weather
+from app.clients.weather import WeatherReport
+from app.weather import Deps, LatLng, weather_agent
+
+CITIES = ["Tokyo", "Los Angeles", "Paris", "Toronto"]
+
+
+async def fake_lat_lng(deps: Deps, location_description: str) -> LatLng:
+    return LatLng(lat=len(location_description), lng=0)
+
+
+async def fake_weather(deps: Deps, lat: float, lng: float) -> WeatherReport:
+    return WeatherReport(temperature="21°C", description="Sunny")
+
+
+def fake_model(combined: bool, parallel: bool) -> FunctionModel:
+    """A model that looks up the weather of `CITIES` with the tools it is given.
+
+    Args:
+        combined: Whether to use `get_weather_for_location`, or geocode first.
+        parallel: Whether to call the tools for every city in one step.
+    """
+
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        returns = [
+            part
+            for message in messages
+            for part in message.parts
+            if isinstance(part, ToolReturnPart)
+        ]
+        coordinates = [r for r in returns if r.tool_name == "get_lat_lng"]
+        done = [r for r in returns if r.tool_name != "get_lat_lng"]
+        if len(done) == len(CITIES):
+            return ModelResponse(parts=[TextPart("Sunny everywhere.")])
+
+        calls: list[ToolCallPart] = []
+        if combined:
+            pending = CITIES[len(done) :]
+            calls = [
+                ToolCallPart("get_weather_for_location", {"location_description": c})
+                for c in pending
+            ]
+        else:
+            # Fetch the weather for every city that was geocoded, then geocode the rest.
+            for r in coordinates[len(done) :]:
+                calls.append(ToolCallPart("get_weather", r.content.model_dump()))
+            if not calls:
+                pending = CITIES[len(coordinates) :]
+                calls = [
+                    ToolCallPart("get_lat_lng", {"location_description": c})
+                    for c in pending
+                ]
+        return ModelResponse(parts=calls if parallel else calls[:1])
+
+    return FunctionModel(respond)
+
+
+async def main():
+    # Stand in for the Mapbox and Tomorrow.io calls.
+    with (
+        mock.patch.object(weather, "fetch_lat_lng", fake_lat_lng),
+        mock.patch.object(weather, "fetch_weather", fake_weather),
+    ):
+        await bench()
+
+
+async def bench():
+    async with AsyncClient() as client:
+        deps = Deps(client=client, weather_api_key=None, geo_api_key=None)
+        for parallel in (True, False):
+            for combined in (False, True):
+                result = await weather_agent.run(
+                    f"What is the weather like in {', '.join(CITIES)}?",
+                    deps=deps,
+                    model=fake_model(combined, parallel),
+                )
+                print(
+                    f"{'parallel' if parallel else 'one call per step':<18} "
+                    f"{'combined tool' if combined else 'geocode first':<14} "
+                    f"{result.usage().requests} model round trips"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
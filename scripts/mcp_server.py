@@ -0,0 +1,19 @@
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("Local tools")
+
+
+@mcp.tool()
+def celsius_to_fahrenheit(celsius: float) -> str:
+    """Converts a temperature from Celsius to Fahrenheit."""
+    return f"{celsius * 9 / 5 + 32:.1f} °F"
+
+
+@mcp.tool()
+def fahrenheit_to_celsius(fahrenheit: float) -> str:
+    """Converts a temperature from Fahrenheit to Celsius."""
+    return f"{(fahrenheit - 32) * 5 / 9:.1f} °C"
+
+
+if __name__ == "__main__":
+    mcp.run()
@@ -0,0 +1,6 @@
+import os
+
+# The services build their agents when they are imported, which needs an API key
+# even though the tests never call the real models.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LOGFIRE_IGNORE_NO_CONFIG", "1")
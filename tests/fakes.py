@@ -0,0 +1,225 @@
+import asyncio
+import contextvars
+import dataclasses
+import functools
+import inspect
+import time
+from collections.abc import Awaitable, Callable, Coroutine
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+from unittest import mock
+
+import restate
+from restate import Context, RunOptions, TerminalError
+from restate.serde import DefaultSerde
+
+T = TypeVar("T")
+
+UNBOUNDED_ATTEMPTS = 20
+"""Stands in for "retry forever", so a broken retry policy can't hang a script."""
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    name: str
+    value: bytes = b""
+    """The serialized result of the step."""
+    failure: str | None = None
+    """The message of the `TerminalError` the step failed with, if it failed."""
+
+
+class Retry(Exception):
+    """Ends an execution after a step failed with a retryable error."""
+
+    def __init__(self, name: str, error: Exception):
+        super().__init__(f"{name} failed: {error!r}")
+        self.error = error
+
+
+@dataclass
+class Attempts:
+    """Failed attempts per journal entry, shared by the executions of one invocation."""
+
+    failed: dict[int, int] = field(default_factory=dict)
+    started: dict[int, float] = field(default_factory=dict)
+
+
+def _unsupported(self: Any, *args: Any, **kwargs: Any) -> Any:
+    raise NotImplementedError("FakeContext only supports run_typed")
+
+
+class FakeContext(Context):
+    """Stands in for a Restate context in the tests, journaling `run_typed` results.
+
+    Replaying: the entries of `journal` are returned in order instead of running their
+    actions, and must have the same names as the steps that replay them.
+
+    Retrying: a step failing with anything but a `TerminalError` raises `Retry`,
+    which ends the execution, unless the step is out of attempts, in which case the
+    error is journaled as a `TerminalError`. `run_handler` then runs the handler again,
+    replaying the journal, like Restate retries a `ctx.run`. Without `attempts`
+    the error is raised to the handler as is.
+
+    Actions start as soon as their step is created, so steps can run concurrently.
+    As in Restate, an action that isn't a coroutine function runs in an executor,
+    so one that returns a coroutine journals the coroutine, and fails.
+    """
+
+    def __init__(
+        self,
+        journal: list[JournalEntry] | None = None,
+        *,
+        attempts: Attempts | None = None,
+    ):
+        self.replay = list(journal or [])
+        self.attempts = attempts
+        self.calls: list[str] = []
+        """Names of the steps whose actions ran, rather than being replayed."""
+        self._entries: dict[int, JournalEntry] = {}
+        self._next = 0
+
+    @property
+    def journal(self) -> list[JournalEntry]:
+        """The entries completed so far, up to the first one still running."""
+        entries = []
+        while len(entries) in self._entries:
+            entries.append(self._entries[len(entries)])
+        return entries
+
+    @property
+    def names(self) -> list[str]:
+        return [entry.name for entry in self.journal]
+
+    def run_typed(
+        self,
+        name: str,
+        action: Callable[..., Any],
+        options: RunOptions[Any] = RunOptions(),
+        /,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        if isinstance(options.serde, DefaultSerde):
+            # Like Restate, type the default serde by the hint or the action.
+            type_hint = options.type_hint
+            if type_hint is None:
+                type_hint = inspect.signature(action, eval_str=True).return_annotation
+            options = dataclasses.replace(
+                options, serde=options.serde.with_maybe_type(type_hint)
+            )
+        index = self._next
+        self._next += 1
+        return asyncio.ensure_future(
+            self._run(index, name, functools.partial(action, *args, **kwargs), options)
+        )
+
+    async def _run(
+        self,
+        index: int,
+        name: str,
+        action: Callable[[], Any],
+        options: RunOptions[Any],
+    ) -> Any:
+        if index < len(self.replay):
+            entry = self.replay[index]
+            assert entry.name == name, f"journal mismatch: {entry.name!r} != {name!r}"
+        else:
+            entry = await self._execute(index, name, action, options)
+        self._entries[index] = entry
+        if entry.failure is not None:
+            raise TerminalError(entry.failure)
+        return options.serde.deserialize(entry.value)
+
+    async def _execute(
+        self,
+        index: int,
+        name: str,
+        action: Callable[[], Any],
+        options: RunOptions[Any],
+    ) -> JournalEntry:
+        self.calls.append(name)
+        if self.attempts is not None:
+            self.attempts.started.setdefault(index, time.monotonic())
+        try:
+            # Like Restate, only coroutine functions are awaited, anything else runs
+            # in an executor and its return value is journaled as is.
+            if inspect.iscoroutinefunction(action):
+                result = await action()
+            else:
+                loop = asyncio.get_running_loop()
+                call = functools.partial(contextvars.copy_context().run, action)
+                result = await loop.run_in_executor(None, call)
+        except TerminalError as e:
+            return JournalEntry(name, failure=e.message)
+        except Exception as e:
+            if self.attempts is None:
+                raise
+            failed = self.attempts.failed[index] = (
+                self.attempts.failed.get(index, 0) + 1
+            )
+            if failed >= (options.max_attempts or UNBOUNDED_ATTEMPTS) or (
+                options.max_retry_duration is not None
+                and time.monotonic() - self.attempts.started[index]
+                >= options.max_retry_duration.total_seconds()
+            ):
+                return JournalEntry(name, failure=str(e))
+            raise Retry(name, e) from e
+        return JournalEntry(name, value=options.serde.serialize(result))
+
+    # The tests only journal steps, the rest of the context isn't needed.
+    attach_invocation = awakeable = cancel_invocation = _unsupported
+    generic_call = generic_send = object_call = object_send = _unsupported
+    random = reject_awakeable = request = resolve_awakeable = run = _unsupported
+    service_call = service_send = sleep = time = uuid = _unsupported
+    workflow_call = workflow_send = _unsupported
+
+
+async def run_handler(
+    handler: Callable[[FakeContext], Awaitable[T]],
+    journal: list[JournalEntry] | None = None,
+) -> tuple[T, FakeContext]:
+    """Runs `handler` like Restate runs an invocation, retrying failed steps.
+
+    Every retry is a new execution of the handler, with a new context replaying what
+    the previous execution journaled. Returns the result and the last context.
+    """
+    attempts = Attempts()
+    journal = list(journal or [])
+    while True:
+        ctx = FakeContext(journal, attempts=attempts)
+        try:
+            return await handler(ctx), ctx
+        except Retry:
+            journal = ctx.journal
+
+
+async def _gather(*futures: Awaitable[Any]) -> list[Awaitable[Any]]:
+    await asyncio.gather(*futures, return_exceptions=True)
+    return list(futures)
+
+
+def fake_gather() -> Any:
+    """Patches `restate.gather`, which only accepts futures of a real context."""
+    return mock.patch.object(restate, "gather", _gather)
+
+
+async def _wait_completed(
+    *futures: asyncio.Future[Any],
+) -> tuple[list[asyncio.Future[Any]], list[asyncio.Future[Any]]]:
+    await asyncio.wait(futures, return_when=asyncio.FIRST_COMPLETED)
+    return [f for f in futures if f.done()], [f for f in futures if not f.done()]
+
+
+def fake_wait_completed() -> Any:
+    """Patches `restate.wait_completed`, which only accepts futures of a real context."""
+    return mock.patch.object(restate, "wait_completed", _wait_completed)
+
+
+def run_sync(test: Callable[[], Coroutine[Any, Any, None]]) -> Callable[[], None]:
+    """Turns an async test into a plain function, so that pytest can run it."""
+
+    @functools.wraps(test)
+    def wrapper() -> None:
+        asyncio.run(test())
+
+    return wrapper
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+from unittest import mock
+
+from app.util import artifacts
+from app.util.artifacts import ArtifactSink
+from tests.fakes import run_sync
+
+
+class BlockedWriter:
+    """Holds the sink's writer thread in `_encode` until `release` is called."""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self._encode = artifacts._encode
+
+    def encode(self, obj: Any, indent: int | None = None) -> bytes:
+        assert self.event.wait(timeout=5), "the writer was never released"
+        return self._encode(obj, indent)
+
+    def patch(self) -> Any:
+        return mock.patch.object(artifacts, "_encode", self.encode)
+
+    def release(self) -> None:
+        self.event.set()
+
+
+def files(root: str) -> list[str]:
+    return sorted(
+        str(p.relative_to(root)) for p in Path(root).rglob("*") if p.is_file()
+    )
+
+
+@run_sync
+async def test_each_artifact_is_written_once():
+    with TemporaryDirectory() as root:
+        sink = ArtifactSink(root)
+        writer = BlockedWriter()
+        with writer.patch():
+            # The second write comes in while the first one is still in flight.
+            queued = await asyncio.gather(
+                sink.write("inv", "a.json", {"n": 1}),
+                sink.write("inv", "a.json", {"n": 2}),
+            )
+            assert queued == [True, False], queued
+            writer.release()
+            await sink.flush()
+        assert not await sink.write("inv", "a.json", {"n": 3}), "the file exists"
+        assert await sink.write("other", "a.json", {"n": 4})
+        await sink.flush()
+        assert json.loads(sink.path("inv", "a.json").read_bytes()) == {"n": 1}
+        assert files(root) == ["inv/a.json", "other/a.json"], files(root)
+
+
+@run_sync
+async def test_writes_wait_for_a_slot_once_the_queue_is_full():
+    with TemporaryDirectory() as root:
+        sink = ArtifactSink(root, max_pending=2)
+        writer = BlockedWriter()
+        with writer.patch():
+            assert await sink.write("inv", "1.json", 1)
+            assert await sink.write("inv", "2.json", 2)
+            third = asyncio.create_task(sink.write("inv", "3.json", 3))
+            await asyncio.sleep(0.05)
+            assert not third.done(), "the third write should wait for a slot"
+            writer.release()
+            assert await third
+            await sink.flush()
+        assert files(root) == ["inv/1.json", "inv/2.json", "inv/3.json"], files(root)
+
+
+@run_sync
+async def test_flush_drains_queued_writes():
+    with TemporaryDirectory() as root:
+        sink = ArtifactSink(root, max_pending=4)
+        writer = BlockedWriter()
+        with writer.patch():
+            for i in range(4):
+                assert await sink.write("inv", f"{i}.json", i)
+            flush = asyncio.create_task(sink.flush())
+            await asyncio.sleep(0.05)
+            assert not flush.done(), "flush returned before the writes finished"
+            writer.release()
+            await flush
+        assert files(root) == [f"inv/{i}.json" for i in range(4)], files(root)
+
+
+@run_sync
+async def test_a_failed_write_leaves_no_artifact_behind():
+    write_bytes = Path.write_bytes
+
+    def crash_halfway(path: Path, data: bytes) -> int:
+        write_bytes(path, data[: len(data) // 2])
+        raise OSError("disk full")
+
+    with TemporaryDirectory() as root:
+        sink = ArtifactSink(root)
+        with mock.patch.object(Path, "write_bytes", crash_halfway):
+            assert await sink.write("inv", "a.json", {"values": list(range(100))})
+            await sink.flush()
+        assert not sink.path("inv", "a.json").exists()
+
+        # The truncated temporary file doesn't stop the artifact being written again.
+        assert await sink.write("inv", "a.json", {"values": list(range(100))})
+        await sink.flush()
+        data = json.loads(sink.path("inv", "a.json").read_bytes())
+        assert data == {"values": list(range(100))}, data
+
+
+@run_sync
+async def test_streams_are_published_when_closed():
+    with TemporaryDirectory() as root:
+        sink = ArtifactSink(root, max_pending=2)
+        path = sink.path("inv", "records.ndjson")
+        async with sink.stream("inv", "records.ndjson") as stream:
+            for i in range(10):
+                await stream.emit({"i": i})
+            assert not path.exists(), "the artifact was published before closing"
+        lines = path.read_bytes().splitlines()
+        assert [json.loads(line) for line in lines] == [{"i": i} for i in range(10)]
+
+        # A stream whose producer fails is discarded, the artifact stays as it was.
+        try:
+            async with sink.stream("inv", "failed.ndjson") as stream:
+                await stream.emit({"i": 0})
+                raise RuntimeError("producer failed")
+        except RuntimeError:
+            pass
+        # An existing artifact is never replaced.
+        async with sink.stream("inv", "records.ndjson") as stream:
+            await stream.emit({"i": -1})
+        assert path.read_bytes().splitlines() == lines
+        assert files(root) == ["inv/records.ndjson"], files(root)
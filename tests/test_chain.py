@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from restate import RunOptions
+
+from app.restate import CHAIN_INPUT, Chain
+from tests.fakes import FakeContext, fake_gather, run_handler, run_sync
+
+
+async def slow(value: str) -> str:
+    await asyncio.sleep(0.1)
+    return value
+
+
+def fan_out(ctx: FakeContext) -> Chain:
+    return (
+        Chain(ctx)
+        .step("Upper", lambda text: slow(text.upper()))
+        .step("Reverse", lambda text: slow(text[::-1]), inputs=[CHAIN_INPUT])
+        .step(
+            "Lengths",
+            lambda upper, reverse: [len(upper), len(reverse)],
+            inputs=["Upper", "Reverse"],
+            output_type=list[int],
+        )
+        .step(
+            "Combine",
+            lambda upper, reverse: f"{upper} {reverse}",
+            inputs=["Upper", "Reverse"],
+        )
+    )
+
+
+@run_sync
+async def test_independent_steps_run_concurrently():
+    ctx = FakeContext()
+    start = time.perf_counter()
+    with fake_gather():
+        outputs = await fan_out(ctx).run_all("abc")
+    elapsed = time.perf_counter() - start
+    assert outputs["Combine"] == "ABC cba", outputs
+    assert outputs["Lengths"] == [3, 3], outputs
+    assert ctx.names == ["Upper", "Reverse", "Lengths", "Combine"], ctx.names
+    assert elapsed < 0.18, elapsed
+
+
+@run_sync
+async def test_replay_skips_journaled_steps():
+    ctx = FakeContext()
+    with fake_gather():
+        result = await fan_out(ctx).run("abc")
+        replayed = FakeContext(journal=ctx.journal)
+        assert await fan_out(replayed).run("abc") == result
+    assert replayed.calls == [], replayed.calls
+
+
+@run_sync
+async def test_durable_steps_are_not_wrapped_in_a_step():
+    failures = [ConnectionError("combine failed")]
+
+    def combine(upper: str, summary: str) -> str:
+        if failures:
+            raise failures.pop()
+        return f"{upper} {summary}"
+
+    async def handler(ctx: FakeContext) -> str:
+        async def summarize(text: str) -> str:
+            # Stands in for an agent run, which journals its own model calls.
+            return await ctx.run_typed(
+                "Model call", lambda: text[:2], RunOptions(type_hint=str)
+            )
+
+        return await (
+            Chain(ctx)
+            .step("Upper", str.upper)
+            .step("Summarize", summarize, inputs=[CHAIN_INPUT], durable=True)
+            .step("Combine", combine, inputs=["Upper", "Summarize"])
+            .run("abc")
+        )
+
+    # The retry of "Combine" replays the model call, which a `ctx.run` around it
+    # would have skipped, putting the journal out of step.
+    result, ctx = await run_handler(handler)
+    assert result == "ABC ab", result
+    assert ctx.names == ["Upper", "Model call", "Combine"], ctx.names
+    assert ctx.calls == ["Combine"], ctx.calls
+
+
+@run_sync
+async def test_steps_returning_coroutines_are_awaited():
+    ctx = FakeContext()
+    chain = Chain(ctx).step("Upper", lambda text: slow(text.upper()))
+    assert await chain.run("abc") == "ABC"
+    # Handed to `run_typed` as is, the coroutine would be journaled, like in Restate.
+    coroutine = slow("abc")
+    try:
+        await ctx.run_typed("Lower", lambda: coroutine, RunOptions(type_hint=str))
+    except Exception as e:
+        assert "coroutine" in str(e), e
+    else:
+        raise AssertionError("expected the coroutine to fail to serialize")
+    finally:
+        coroutine.close()
+
+
+@run_sync
+async def test_rejects_unknown_and_duplicate_steps():
+    chain = Chain(FakeContext()).step("A", str.upper)
+    for name, inputs in (("B", ["Missing"]), ("A", None)):
+        try:
+            chain.step(name, str.upper, inputs=inputs)
+        except ValueError:
+            continue
+        raise AssertionError(f"expected a ValueError for {name!r}")
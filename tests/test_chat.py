@@ -0,0 +1,124 @@
+from typing import cast
+from unittest import mock
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from restate import ObjectContext
+
+from app import chat
+from app.chat import (
+    HISTORY_OUTPUT_SERDE,
+    HISTORY_SERDE,
+    MAX_HISTORY_BYTES,
+    SUMMARY_PREFIX,
+    compact_history,
+    history_size,
+)
+from tests.fakes import FakeContext, run_sync
+
+
+def summarize(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    return ModelResponse(parts=[TextPart("They talked about the weather.")])
+
+
+def turn(n: int, answer_bytes: int) -> list[ModelMessage]:
+    """A turn in which the model calls two tools before it answers."""
+    return [
+        ModelRequest(parts=[UserPromptPart(f"Question {n}")]),
+        ModelResponse(parts=[ToolCallPart("lookup", {"n": n}, f"{n}-a")]),
+        ModelRequest(parts=[ToolReturnPart("lookup", "found", f"{n}-a")]),
+        ModelResponse(parts=[ToolCallPart("lookup", {"n": -n}, f"{n}-b")]),
+        ModelRequest(parts=[ToolReturnPart("lookup", "found", f"{n}-b")]),
+        ModelResponse(parts=[TextPart("x" * answer_bytes)]),
+    ]
+
+
+def history(*answer_bytes: int) -> list[ModelMessage]:
+    return [m for n, size in enumerate(answer_bytes) for m in turn(n, size)]
+
+
+async def compact(
+    messages: list[ModelMessage],
+) -> tuple[list[ModelMessage], FakeContext]:
+    ctx = FakeContext()
+    with mock.patch.object(chat, "compaction_agent", Agent(FunctionModel(summarize))):
+        compacted = await compact_history(cast(ObjectContext, ctx), messages)
+    return compacted, ctx
+
+
+def assert_tool_calls_have_their_returns(messages: list[ModelMessage]) -> None:
+    calls = {
+        part.tool_call_id
+        for m in messages
+        for part in m.parts
+        if isinstance(part, ToolCallPart)
+    }
+    returns = {
+        part.tool_call_id
+        for m in messages
+        for part in m.parts
+        if isinstance(part, ToolReturnPart)
+    }
+    assert calls == returns, (calls, returns)
+
+
+@run_sync
+async def test_histories_within_the_cap_are_kept():
+    messages = history(*[1_000] * 4)
+    compacted, ctx = await compact(messages)
+    assert compacted == messages
+    assert ctx.names == [], ctx.names
+
+
+@run_sync
+async def test_old_turns_are_summarized_without_splitting_tool_calls():
+    messages = history(*[4_000] * 10)
+    assert history_size(messages) > MAX_HISTORY_BYTES
+    compacted, ctx = await compact(messages)
+    assert ctx.names == ["Model call"], ctx.names
+
+    summary, *kept = compacted
+    assert isinstance(summary, ModelRequest)
+    assert isinstance(part := summary.parts[0], SystemPromptPart)
+    assert part.content == SUMMARY_PREFIX + "They talked about the weather."
+    # The last 8 messages start in the middle of the 9th turn, which is kept whole.
+    assert kept == messages[-12:]
+    assert_tool_calls_have_their_returns(compacted)
+    assert history_size(compacted) <= MAX_HISTORY_BYTES
+
+
+@run_sync
+async def test_recent_turns_are_dropped_whole_when_the_summary_is_not_enough():
+    messages = history(*[1_000] * 8, 20_000, 20_000)
+    compacted, _ = await compact(messages)
+    assert compacted[1:] == messages[-6:]
+    assert_tool_calls_have_their_returns(compacted)
+    assert history_size(compacted) <= MAX_HISTORY_BYTES
+
+
+def test_serde_round_trips_small_and_large_histories():
+    small = history(100)
+    buf = HISTORY_SERDE.serialize(small)
+    assert len(buf) <= 4096 and buf.startswith(b"["), buf[:20]
+    assert HISTORY_SERDE.deserialize(buf) == small
+
+    large = history(*[4_000] * 3)
+    buf = HISTORY_SERDE.serialize(large)
+    assert not buf.startswith(b"["), "histories over 4 KB are compressed"
+    assert len(buf) < history_size(large), (len(buf), history_size(large))
+    assert HISTORY_SERDE.deserialize(buf) == large
+
+    # Histories stored compressed can be read by a serde that never compresses.
+    assert HISTORY_OUTPUT_SERDE.deserialize(buf) == large
+    assert HISTORY_OUTPUT_SERDE.serialize(large).startswith(b"[")
+    assert HISTORY_SERDE.deserialize(b"") is None
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from restate.server_context import restate_context_is_replaying
+
+from app import weather
+from app.weather import parse_city_list, record_fast_path
+
+
+def test_parses_comma_separated_cities():
+    assert parse_city_list("Tokyo") == ["Tokyo"]
+    assert parse_city_list("Tokyo, Paris, Los Angeles.") == [
+        "Tokyo",
+        "Paris",
+        "Los Angeles",
+    ]
+    assert parse_city_list("St. Louis, New York, Ho Chi Minh City") == [
+        "St. Louis",
+        "New York",
+        "Ho Chi Minh City",
+    ]
+
+
+def test_parses_cities_joined_with_and():
+    assert parse_city_list("Tokyo and Los Angeles") == ["Tokyo", "Los Angeles"]
+    assert parse_city_list("Tokyo, Paris, and Los Angeles") == [
+        "Tokyo",
+        "Paris",
+        "Los Angeles",
+    ]
+    assert parse_city_list("Tokyo, Paris, Berlin AND Rome") == [
+        "Tokyo",
+        "Paris",
+        "Berlin",
+        "Rome",
+    ]
+
+
+def test_leaves_qualified_places_to_the_agent():
+    for text in (
+        "Portland, Oregon",
+        "Portland, Oregon and Seattle",
+        "Paris, France, and Berlin, Germany",
+        "Washington, D.C. and Boston",
+        "Trinidad and Tobago",
+        "Paris, Berlin, and Trinidad and Tobago",
+        "Tokyo and Paris and Berlin",
+        "Tokyo & Paris",
+        "Los Angeles, CA, Boston, MA",
+    ):
+        assert parse_city_list(text) is None, text
+
+
+def test_leaves_questions_to_the_agent():
+    for text in (
+        "Tell me about Paris and London",
+        "Tell me about Paris, London, Berlin",
+        "What's the weather in Tokyo?",
+        "Weather Tokyo, Paris, Berlin",
+        "Rio de Janeiro, Lima, Quito",
+    ):
+        assert parse_city_list(text) is None, text
+
+
+def test_replays_are_not_counted():
+    with mock.patch.object(weather, "_fast_path_requests") as requests:
+        record_fast_path(hit=True)
+        token = restate_context_is_replaying.set(True)
+        try:
+            record_fast_path(hit=True)
+            record_fast_path(hit=False)
+        finally:
+            restate_context_is_replaying.reset(token)
+        record_fast_path(hit=False)
+    assert requests.add.call_args_list == [
+        mock.call(1, {"hit": True}),
+        mock.call(1, {"hit": False}),
+    ], requests.add.call_args_list
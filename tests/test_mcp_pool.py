@@ -0,0 +1,137 @@
+import asyncio
+import time
+from typing import cast
+
+from pydantic_ai.mcp import MCPServer
+
+from app.restate import MCPSessionPool
+from tests.fakes import run_sync
+
+INVOCATIONS = 10
+
+
+class FakeServer:
+    """Counts how often it is opened, closed and pinged, like an `MCPServer` it is
+    only opened by the first task entering it and closed by the last one exiting."""
+
+    def __init__(self, name: str, startup: float = 0):
+        self.name = name
+        self.startup = startup
+        self.healthy = True
+        self.opened = self.closed = self.pings = 0
+        self._running_count = 0
+        self._client = self
+
+    async def __aenter__(self) -> "FakeServer":
+        if self._running_count == 0:
+            await asyncio.sleep(self.startup)
+            self.opened += 1
+        self._running_count += 1
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self._running_count -= 1
+        if self._running_count == 0:
+            self.closed += 1
+
+    async def send_ping(self) -> None:
+        self.pings += 1
+        if not self.healthy:
+            raise ConnectionError(f"{self.name} went away")
+
+    @property
+    def is_running(self) -> bool:
+        return self._running_count > 0
+
+    def __repr__(self) -> str:
+        return f"FakeServer({self.name!r})"
+
+
+def fake_servers(*names: str, startup: float = 0) -> list[FakeServer]:
+    return [FakeServer(name, startup) for name in names]
+
+
+def mcp(server: FakeServer) -> MCPServer:
+    return cast(MCPServer, server)
+
+
+@run_sync
+async def test_concurrent_acquires_share_one_session():
+    pool = MCPSessionPool()
+    [server] = fake_servers("a", startup=0.05)
+    await asyncio.gather(*(pool.acquire(mcp(server)) for _ in range(3)))
+    assert (server.opened, len(pool)) == (1, 1), (server.opened, len(pool))
+    await pool.close()
+    assert server.closed == 1 and not server.is_running
+
+
+@run_sync
+async def test_slow_server_does_not_block_others():
+    pool = MCPSessionPool()
+    [slow] = fake_servers("slow", startup=0.3)
+    [fast] = fake_servers("fast")
+    opening = asyncio.create_task(pool.acquire(mcp(slow)))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await pool.acquire(mcp(fast))
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.1, elapsed
+    await opening
+    await pool.close()
+
+
+@run_sync
+async def test_health_check_reopens_broken_sessions():
+    pool = MCPSessionPool(health_check_interval=0)
+    [server] = fake_servers("a")
+    await pool.acquire(mcp(server))
+    await pool.acquire(mcp(server))
+    assert (server.pings, server.opened) == (1, 1), (server.pings, server.opened)
+    server.healthy = False
+    await pool.acquire(mcp(server))
+    assert (server.pings, server.opened, server.closed) == (2, 2, 1)
+    assert len(pool) == 1 and server.is_running
+    await pool.close()
+
+
+@run_sync
+async def test_sessions_in_use_are_not_checked():
+    pool = MCPSessionPool(health_check_interval=0)
+    [server] = fake_servers("a")
+    await pool.acquire(mcp(server))
+    async with server:
+        await pool.acquire(mcp(server))
+    assert server.pings == 0, server.pings
+    await pool.close()
+
+
+@run_sync
+async def test_reaper_closes_idle_sessions():
+    pool = MCPSessionPool(idle_timeout=0.05, reap_interval=0.02)
+    idle, busy = fake_servers("idle", "busy")
+    await pool.acquire(mcp(idle))
+    await pool.acquire(mcp(busy))
+    async with busy:
+        await asyncio.sleep(0.15)
+        # Nothing acquired a session in the meantime, the reaper closed it.
+        assert (idle.closed, busy.closed, len(pool)) == (1, 0, 1)
+    await asyncio.sleep(0.1)
+    assert (busy.closed, len(pool)) == (1, 0), (busy.closed, len(pool))
+    await asyncio.sleep(0.05)
+    # With no sessions left the reaper stops, the next acquire starts it again.
+    assert pool._reaper is not None and pool._reaper.done()
+
+
+@run_sync
+async def test_max_sessions_closes_least_recently_used():
+    pool = MCPSessionPool(max_sessions=2)
+    a, b, c, d = fake_servers("a", "b", "c", "d")
+    for server in (a, b, c):
+        await pool.acquire(mcp(server))
+    assert (a.closed, b.closed, len(pool)) == (1, 0, 2)
+    # A session in use is kept, even when it is the least recently used.
+    async with b:
+        await pool.acquire(mcp(d))
+    assert (b.closed, c.closed, len(pool)) == (0, 1, 2)
+    await pool.close()
+    assert not any(server.is_running for server in (a, b, c, d))
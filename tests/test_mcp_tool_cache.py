@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+from typing import Any, cast
+from unittest import mock
+
+from pydantic_ai.mcp import MCPServer
+from pydantic_ai.models.test import TestModel
+from pydantic_ai.tools import RunContext, ToolDefinition
+from pydantic_ai.usage import RunUsage
+
+import app.restate._toolset as toolset
+from app.restate import MCPToolCache
+from app.restate._toolset import (
+    MCP_GET_TOOLS_SERDE,
+    RestateMCPGetToolsContextRunResult,
+    RestateMCPServer,
+)
+from tests.fakes import FakeContext, JournalEntry, run_sync
+
+
+def tool_defs(*names: str) -> dict[str, ToolDefinition]:
+    return {name: ToolDefinition(name=name) for name in names}
+
+
+class FakeServer:
+    """Lists `tool_names`, counting how often it is asked."""
+
+    def __init__(self, *tool_names: str):
+        self.tool_names = tool_names
+        self.listed = 0
+
+    async def get_tools(self, ctx: RunContext[Any]) -> dict[str, Any]:
+        self.listed += 1
+        return {
+            name: self.tool_for_tool_def(tool_def)
+            for name, tool_def in tool_defs(*self.tool_names).items()
+        }
+
+    def tool_for_tool_def(self, tool_def: ToolDefinition) -> Any:
+        return SimpleNamespace(tool_def=tool_def)
+
+
+async def list_tools(server: FakeServer, ctx: FakeContext) -> list[str]:
+    restate_server = RestateMCPServer(cast(MCPServer, server), ctx)
+    run_context = RunContext(deps=None, model=TestModel(), usage=RunUsage())
+    return list(await restate_server.get_tools(run_context))
+
+
+def journaled(*names: str) -> JournalEntry:
+    result = RestateMCPGetToolsContextRunResult(output=tool_defs(*names))
+    return JournalEntry("get mcp tools", MCP_GET_TOOLS_SERDE.serialize(result))
+
+
+@run_sync
+async def test_listed_tools_are_reused_across_invocations():
+    cache = MCPToolCache()
+    server = FakeServer("add", "subtract")
+    with mock.patch.object(toolset, "mcp_tool_cache", cache):
+        for _ in range(3):
+            assert await list_tools(server, FakeContext()) == ["add", "subtract"]
+    assert server.listed == 1, server.listed
+
+
+@run_sync
+async def test_replayed_tools_are_not_cached():
+    cache = MCPToolCache()
+    server = FakeServer("add", "subtract")
+    with mock.patch.object(toolset, "mcp_tool_cache", cache):
+        await list_tools(server, FakeContext())
+        entry = cache._entries[id(server)]
+        # An invocation from before a tool was added replays the tools it had.
+        old = FakeContext(journal=[journaled("add")])
+        assert await list_tools(server, old) == ["add"]
+        assert cache._entries[id(server)] is entry
+        assert await list_tools(server, FakeContext()) == ["add", "subtract"]
+        # Once invalidated, nothing the replay saw is served from the cache either.
+        cache.invalidate(cast(MCPServer, server))
+        await list_tools(server, FakeContext(journal=[journaled("add")]))
+        assert cache.tool_defs(cast(MCPServer, server)) is None
+    assert server.listed == 1, server.listed
@@ -0,0 +1,136 @@
+import asyncio
+from datetime import timedelta
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from app.restate import (
+    ModelRoute,
+    ModelRouter,
+    RestateAgent,
+    RunPolicy,
+    RunPolicyRegistry,
+)
+from app.restate._model import MODEL_CALL_SERDE
+from tests.fakes import FakeContext, run_sync
+
+
+def answer_as(name: str) -> FunctionModel:
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        return ModelResponse(parts=[TextPart(name)])
+
+    return FunctionModel(respond, model_name=name)
+
+
+def failing(name: str) -> FunctionModel:
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        raise ConnectionError(f"{name} is down")
+
+    return FunctionModel(respond, model_name=name)
+
+
+def slow(name: str, seconds: float) -> FunctionModel:
+    async def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(seconds)
+        return ModelResponse(parts=[TextPart(name)])
+
+    return FunctionModel(respond, model_name=name)
+
+
+async def hang(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    await asyncio.sleep(10)
+    raise AssertionError("should have timed out")
+
+
+large, small, fallback = answer_as("large"), answer_as("small"), answer_as("fallback")
+agent = Agent(large)
+
+
+async def run(
+    router: ModelRouter,
+    step: str,
+    prompt: str = "Sort",
+    ctx: FakeContext | None = None,
+    policies: RunPolicyRegistry | None = None,
+) -> str:
+    restate_agent = RestateAgent(
+        agent,
+        ctx or FakeContext(),
+        step=step,
+        model_router=router,
+        run_policies=policies or RunPolicyRegistry(),
+    )
+    return (await restate_agent.run(prompt)).output
+
+
+@run_sync
+async def test_routes_by_step_and_prompt_size():
+    router = ModelRouter(
+        routes=[
+            ModelRoute(small, steps=frozenset({"Sort metrics"})),
+            ModelRoute(fallback, max_prompt_chars=10),
+        ]
+    )
+    assert await run(router, "Sort metrics", "x" * 100) == "small"
+    assert await run(router, "Extract metrics", "x" * 5) == "fallback"
+    assert await run(router, "Extract metrics", "x" * 100) == "large"
+
+
+@run_sync
+async def test_falls_back_on_timeout():
+    router = ModelRouter(routes=[ModelRoute(FunctionModel(hang))], fallback=fallback)
+    policies = RunPolicyRegistry(
+        model=RunPolicy(max_attempts=1, attempt_timeout=timedelta(milliseconds=50))
+    )
+    ctx = FakeContext()
+    output = await asyncio.wait_for(
+        run(router, "Sort metrics", ctx=ctx, policies=policies), timeout=2
+    )
+    assert output == "fallback", output
+    journaled = MODEL_CALL_SERDE.deserialize(ctx.journal[0].value)
+    assert journaled is not None and journaled.model == "fallback", journaled
+
+
+@run_sync
+async def test_skips_unhealthy_models():
+    down = failing("down")
+    router = ModelRouter(
+        routes=[ModelRoute(down)], fallback=fallback, min_health_calls=2
+    )
+    for _ in range(2):
+        try:
+            await run(router, "Sort metrics")
+        except ConnectionError:
+            pass
+    assert router.health(down).error_rate == 1.0
+    assert await run(router, "Sort metrics") == "fallback"
+
+
+@run_sync
+async def test_skips_models_over_the_latency_budget():
+    sluggish = slow("sluggish", 0.05)
+    router = ModelRouter(
+        routes=[ModelRoute(sluggish)],
+        fallback=fallback,
+        min_health_calls=2,
+        latency_budgets={"Sort metrics": 0.02},
+    )
+    assert [await run(router, "Sort metrics") for _ in range(3)] == [
+        "sluggish",
+        "sluggish",
+        "fallback",
+    ]
+    p95 = router.health(sluggish).p95
+    assert p95 is not None and p95 >= 0.05, p95
+    # Steps without a budget keep the routed model, however slow.
+    assert await run(router, "Extract metrics") == "sluggish"
+
+
+@run_sync
+async def test_replay_returns_the_journaled_model():
+    ctx = FakeContext()
+    routed = ModelRouter(routes=[ModelRoute(small)])
+    assert await run(routed, "Sort metrics", ctx=ctx) == "small"
+    replayed = FakeContext(journal=ctx.journal)
+    assert await run(ModelRouter(), "Sort metrics", ctx=replayed) == "small"
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from datetime import timedelta
+from unittest import mock
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from restate import TerminalError
+
+import app.restate._model as restate_model
+from app.restate import RestateAgent, RunPolicy, RunPolicyRegistry
+from tests.fakes import FakeContext, JournalEntry, run_handler, run_sync
+
+
+class HangingModel:
+    """Hangs on the first `hangs` calls, recording whether they were cancelled."""
+
+    def __init__(self, hangs: int):
+        self.hangs = hangs
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(
+        self, messages: list[ModelMessage], info: AgentInfo
+    ) -> ModelResponse:
+        self.calls += 1
+        if self.calls <= self.hangs:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return ModelResponse(parts=[TextPart("done")])
+
+
+def policies(**kwargs) -> RunPolicyRegistry:
+    return RunPolicyRegistry(model=RunPolicy(**kwargs))
+
+
+async def run(
+    model: HangingModel,
+    registry: RunPolicyRegistry,
+    journal: list[JournalEntry] | None = None,
+) -> tuple[str, FakeContext]:
+    """Runs an agent on `model`, each retry replaying the journal like Restate."""
+
+    async def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        return await model(messages, info)
+
+    async def handler(ctx: FakeContext) -> str:
+        agent = Agent(FunctionModel(respond))
+        result = await RestateAgent(agent, ctx, run_policies=registry).run("Go")
+        return result.output
+
+    return await asyncio.wait_for(run_handler(handler, journal), timeout=2)
+
+
+def record_timeouts(timeouts: list[str]):
+    return mock.patch.object(
+        restate_model,
+        "record_model_call_timeout",
+        lambda usage, step, model: timeouts.append(step),
+    )
+
+
+@run_sync
+async def test_hung_attempts_are_cancelled_and_retried():
+    timeouts: list[str] = []
+    model = HangingModel(hangs=2)
+    registry = policies(max_attempts=3, attempt_timeout=timedelta(milliseconds=50))
+    with record_timeouts(timeouts):
+        output, ctx = await run(model, registry)
+    assert output == "done", output
+    assert (model.calls, model.cancelled) == (3, 2), (model.calls, model.cancelled)
+    assert len(timeouts) == 2, timeouts
+    assert ctx.calls == ["Model call"], ctx.calls
+
+
+@run_sync
+async def test_retry_duration_bounds_all_attempts():
+    timeouts: list[str] = []
+    model = HangingModel(hangs=100)
+    registry = policies(
+        attempt_timeout=timedelta(milliseconds=50),
+        max_retry_duration=timedelta(milliseconds=120),
+    )
+    start = time.perf_counter()
+    with record_timeouts(timeouts):
+        try:
+            await run(model, registry)
+        except TerminalError:
+            pass
+        else:
+            raise AssertionError("expected a TerminalError")
+    elapsed = time.perf_counter() - start
+    # Every attempt is a new execution of the handler, yet the retry duration
+    # counts from the first one: three attempts, then no more.
+    assert model.calls == 3 and model.cancelled == 3, model.calls
+    assert len(timeouts) == 3, timeouts
+    assert elapsed < 0.3, elapsed
+
+
+@run_sync
+async def test_replay_returns_the_journaled_failure():
+    model = HangingModel(hangs=100)
+    registry = policies(attempt_timeout=timedelta(milliseconds=50))
+    journal = [JournalEntry("Model call", failure="Model call timed out")]
+    try:
+        await run(model, registry, journal)
+    except TerminalError as e:
+        assert "timed out" in str(e), e
+    else:
+        raise AssertionError("expected a TerminalError")
+    # A replayed step stays failed, without another attempt or timeout.
+    assert model.calls == 0, model.calls
@@ -0,0 +1,52 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from pydantic import ValidationError
+
+from app.schemas.lead_generator import TierQueryResults
+from app.schemas.tavily import TavilyResponse, TavilyResult
+from app.util.ndjson import iter_ndjson, iter_tavily_results
+
+
+def tier_results(query: str, priority: int) -> TierQueryResults:
+    result = TavilyResult(
+        url=f"https://example.com/{query}", title=query, content="", score=0.5
+    )
+    return TierQueryResults(
+        query=query,
+        description="",
+        results=TavilyResponse(
+            query=query, results=[result], response_time=0.1, request_id=query
+        ),
+        tier=f"Tier {priority}",
+        priority=priority,
+    )
+
+
+def write_lines(root: str, *lines: bytes) -> Path:
+    path = Path(root) / "leads.ndjson"
+    path.write_bytes(b"".join(lines))
+    return path
+
+
+LINES = [tier_results(q, p).model_dump_json().encode() for q, p in (("a", 1), ("b", 2))]
+
+
+def test_reads_a_final_line_without_a_newline():
+    with TemporaryDirectory() as root:
+        path = write_lines(root, LINES[0], b"\n\n", LINES[1])
+        assert [r.query for r in iter_ndjson(path, TierQueryResults)] == ["a", "b"]
+        assert [r.title for r in iter_tavily_results(path, priority=2)] == ["b"]
+
+
+def test_a_truncated_final_line_fails_after_the_complete_ones():
+    with TemporaryDirectory() as root:
+        path = write_lines(root, LINES[0], b"\n", LINES[1][:-10])
+        results = iter_tavily_results(path)
+        assert next(results).title == "a"
+        try:
+            next(results)
+        except ValidationError:
+            pass
+        else:
+            raise AssertionError("expected the truncated line to fail validation")
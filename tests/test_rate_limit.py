@@ -0,0 +1,163 @@
+import asyncio
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any
+from unittest import mock
+
+import httpx
+from restate import TerminalError
+
+from app.clients import tavily
+from app.util import rate_limit
+from app.util.rate_limit import (
+    RateLimitConfig,
+    RateLimited,
+    RateLimiter,
+    parse_retry_after,
+    rate_limiter,
+)
+from tests.fakes import run_sync
+
+
+class FakeClock:
+    """Stands in for `time` and `asyncio.sleep` in the rate limiter, sleeping
+    advances the clock instead of waiting."""
+
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+    def patch(self) -> Any:
+        return mock.patch.multiple(
+            rate_limit,
+            time=self,
+            asyncio=mock.Mock(sleep=self.sleep, Lock=asyncio.Lock),
+        )
+
+
+async def throttle(limiter: RateLimiter, retry_after: float | None = None) -> None:
+    async with limiter.limit():
+        raise RateLimited(limiter.name, retry_after)
+
+
+@run_sync
+async def test_tokens_refill_at_the_configured_rate():
+    clock = FakeClock()
+    with clock.patch():
+        limiter = RateLimiter("test", RateLimitConfig(qps=2, burst=3, adaptive=False))
+        for _ in range(3):
+            await limiter.acquire()
+        assert clock.now == 1_000.0, "the burst is sent back to back"
+        await limiter.acquire()
+        assert clock.now == 1_000.5, clock.now
+        clock.now += 10
+        for _ in range(3):
+            await limiter.acquire()
+        assert clock.now == 1_010.5, "the bucket refills up to the burst"
+        await limiter.acquire()
+        assert clock.now == 1_011.0, clock.now
+    assert limiter.metrics.requests == 8, limiter.metrics
+    assert limiter.metrics.wait_seconds == 1.0, limiter.metrics
+
+
+@run_sync
+async def test_retry_after_blocks_the_bucket():
+    clock = FakeClock()
+    with clock.patch():
+        limiter = RateLimiter("test", RateLimitConfig(qps=10, burst=10, adaptive=False))
+        try:
+            await throttle(limiter, retry_after=5)
+        except RateLimited:
+            pass
+        await limiter.acquire()
+        assert clock.now == 1_005.0, clock.now
+
+        assert parse_retry_after({"Retry-After": "2.5"}) == 2.5
+        date = datetime.fromtimestamp(clock.now + 30, timezone.utc)
+        assert (
+            parse_retry_after({"retry-after": format_datetime(date, usegmt=True)}) == 30
+        )
+        assert parse_retry_after({"Retry-After": "soon"}) is None
+
+
+@run_sync
+async def test_throttling_halves_the_rate_and_successes_add_it_back():
+    clock = FakeClock()
+    config = RateLimitConfig(qps=4, burst=100, min_qps=1.5, increase=0.5)
+    with clock.patch():
+        limiter = RateLimiter("test", config)
+        for expected in (2.0, 1.5):
+            try:
+                await throttle(limiter)
+            except RateLimited:
+                pass
+            assert limiter.qps == expected, limiter.qps
+        for expected in (2.0, 2.5, 3.0, 3.5, 4.0, 4.0):
+            async with limiter.limit():
+                pass
+            assert limiter.qps == expected, limiter.qps
+
+
+@run_sync
+async def test_throttled_requests_fail_terminally_once_the_retry_budget_is_spent():
+    clock = FakeClock()
+    config = RateLimitConfig(qps=10, burst=10, min_retries=2, retry_ratio=0.5)
+    with clock.patch():
+        limiter = RateLimiter("test", config)
+        for _ in range(2):
+            try:
+                await throttle(limiter)
+            except RateLimited:
+                pass
+        try:
+            await throttle(limiter)
+        except TerminalError as e:
+            assert e.status_code == 429, e.status_code
+        else:
+            raise AssertionError("expected a TerminalError")
+        assert limiter.metrics.retries_denied == 1, limiter.metrics
+
+        # Two successes save up another retry.
+        for _ in range(2):
+            async with limiter.limit():
+                pass
+        try:
+            await throttle(limiter)
+        except RateLimited:
+            pass
+
+
+def tavily_client(status_code: int) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(status_code))
+    )
+
+
+@run_sync
+async def test_tavily_errors_are_not_counted_as_successes():
+    with mock.patch.dict(rate_limit._rate_limiters, clear=True):
+        limiter = rate_limiter("tavily")
+        limiter.record_throttled()
+        qps = limiter.qps
+        for status_code, error in (
+            (432, TerminalError),
+            (433, TerminalError),
+            (500, httpx.HTTPStatusError),
+        ):
+            async with tavily_client(status_code) as client:
+                try:
+                    await tavily.search(client, "key", "weather")
+                except error as e:
+                    if isinstance(e, TerminalError):
+                        assert e.status_code == status_code, e.status_code
+                else:
+                    raise AssertionError(f"expected {error.__name__}")
+            assert limiter.qps == qps, (status_code, limiter.qps)
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import timedelta
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelResponse,
+    RetryPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from restate import TerminalError
+
+from app.restate import RestateAgent, RunPolicy, RunPolicyRegistry
+from tests.fakes import FakeContext, run_handler, run_sync
+
+
+class FlakyTool:
+    """Fails the first `failures` calls, optionally by hanging for `delay` seconds."""
+
+    def __init__(self, failures: int, delay: float = 0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, city: str) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            raise ConnectionError("weather service unavailable")
+        return f"Sunny in {city}"
+
+
+def tool_then_answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    """Calls the tool once, then answers with what it returned."""
+    last = messages[-1].parts[-1]
+    if isinstance(last, ToolReturnPart):
+        return ModelResponse(parts=[TextPart(last.content)])
+    if isinstance(last, RetryPromptPart):
+        return ModelResponse(parts=[TextPart(f"Sorry: {last.content}")])
+    return ModelResponse(parts=[ToolCallPart("get_weather", {"city": "Tokyo"})])
+
+
+def make_agent(tool: FlakyTool) -> Agent:
+    agent = Agent(FunctionModel(tool_then_answer))
+
+    @agent.tool_plain
+    async def get_weather(city: str) -> str:
+        return await tool(city)
+
+    return agent
+
+
+async def run(tool: FlakyTool, policy: RunPolicy) -> str:
+    policies = RunPolicyRegistry()
+    policies.register("get_weather", policy)
+    agent = make_agent(tool)
+
+    async def handler(ctx: FakeContext) -> str:
+        restate_agent = RestateAgent(agent, ctx, run_policies=policies)
+        result = await restate_agent.run("Weather in Tokyo?")
+        return result.output
+
+    output, _ = await run_handler(handler)
+    return output
+
+
+@run_sync
+async def test_retries_until_success():
+    tool = FlakyTool(failures=2)
+    output = await run(tool, RunPolicy(max_attempts=3))
+    assert output == "Sunny in Tokyo", output
+    assert tool.calls == 3
+
+
+@run_sync
+async def test_gives_up_after_max_attempts():
+    tool = FlakyTool(failures=5)
+    try:
+        await run(tool, RunPolicy(max_attempts=2))
+    except TerminalError as e:
+        assert "weather service unavailable" in str(e), e
+    else:
+        raise AssertionError("expected a TerminalError")
+    assert tool.calls == 2
+
+
+@run_sync
+async def test_attempt_timeout():
+    tool = FlakyTool(failures=1, delay=10)
+    policy = RunPolicy(max_attempts=3, attempt_timeout=timedelta(milliseconds=50))
+    output = await asyncio.wait_for(run(tool, policy), timeout=2)
+    assert output == "Sunny in Tokyo", output
+    assert tool.calls == 2
+
+
+@run_sync
+async def test_fast_fail_reports_to_model():
+    tool = FlakyTool(failures=1, delay=10)
+    policy = RunPolicy(fast_fail=True, attempt_timeout=timedelta(milliseconds=50))
+    output = await asyncio.wait_for(run(tool, policy), timeout=2)
+    assert output.startswith("Sorry: TimeoutError"), output
+    assert tool.calls == 1
@@ -0,0 +1,177 @@
+import asyncio
+from datetime import timedelta
+from typing import Any
+
+from pydantic_ai import Agent, ModelRetry
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelResponse,
+    RetryPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from app.restate import (
+    BATCHED_TOOL_METADATA,
+    PURE_TOOL_METADATA,
+    RestateAgent,
+    RunPolicy,
+    RunPolicyRegistry,
+)
+from tests.fakes import FakeContext, run_handler, run_sync
+
+
+def parallel_tool_calls(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    """Calls every tool in one step, then answers with all their results."""
+    if len(messages) == 1:
+        return ModelResponse(
+            parts=[
+                ToolCallPart("celsius_to_fahrenheit", {"celsius": 20}),
+                ToolCallPart("get_city", {}),
+                ToolCallPart("celsius_to_fahrenheit", {"celsius": 30}),
+                ToolCallPart("kelvin", {"celsius": 0}),
+                ToolCallPart("get_weather", {"city": "Tokyo"}),
+            ]
+        )
+    returns = [p for p in messages[-1].parts if isinstance(p, ToolReturnPart)]
+    return ModelResponse(parts=[TextPart(", ".join(str(p.content) for p in returns))])
+
+
+agent = Agent(FunctionModel(parallel_tool_calls))
+calls: list[str] = []
+
+
+@agent.tool_plain(metadata=PURE_TOOL_METADATA)
+def get_city() -> str:
+    calls.append("get_city")
+    return "Tokyo"
+
+
+@agent.tool_plain(metadata=BATCHED_TOOL_METADATA)
+def celsius_to_fahrenheit(celsius: float) -> float:
+    calls.append("celsius_to_fahrenheit")
+    return celsius * 9 / 5 + 32
+
+
+@agent.tool_plain(metadata=BATCHED_TOOL_METADATA)
+def kelvin(celsius: float) -> float:
+    calls.append("kelvin")
+    return celsius + 273.15
+
+
+@agent.tool_plain
+def get_weather(city: str) -> str:
+    calls.append("get_weather")
+    return f"Sunny in {city}"
+
+
+@run_sync
+async def test_pure_tools_run_inline_and_batched_tools_share_an_entry():
+    calls.clear()
+    ctx = FakeContext()
+    result = await RestateAgent(agent, restate_context=ctx).run("Convert")
+    assert result.output == "68.0, Tokyo, 86.0, 273.15, Sunny in Tokyo", result.output
+    assert ctx.names == [
+        "Model call",
+        "Calling celsius_to_fahrenheit, kelvin",
+        "Calling get_weather",
+        "Model call",
+    ], ctx.names
+    assert sorted(calls) == [
+        "celsius_to_fahrenheit",
+        "celsius_to_fahrenheit",
+        "get_city",
+        "get_weather",
+        "kelvin",
+    ], calls
+
+
+@run_sync
+async def test_batched_tools_with_different_policies_get_their_own_entries():
+    calls.clear()
+    policies = RunPolicyRegistry()
+    policies.register("kelvin", RunPolicy(max_attempts=5))
+    ctx = FakeContext()
+    result = await RestateAgent(agent, restate_context=ctx, run_policies=policies).run(
+        "Convert"
+    )
+    assert result.output == "68.0, Tokyo, 86.0, 273.15, Sunny in Tokyo", result.output
+    assert ctx.names == [
+        "Model call",
+        "Calling celsius_to_fahrenheit",
+        "Calling kelvin",
+        "Calling get_weather",
+        "Model call",
+    ], ctx.names
+
+
+def call_flaky_once(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    """Calls `flaky`, then answers with what it returned or the retry it asked for."""
+    if len(messages) == 1:
+        return ModelResponse(parts=[ToolCallPart("flaky", {})])
+    part = messages[-1].parts[0]
+    assert isinstance(part, (ToolReturnPart, RetryPromptPart))
+    return ModelResponse(parts=[TextPart(f"{part.part_kind}: {part.content}")])
+
+
+def flaky_agent(metadata: dict[str, Any] | None, error: Exception) -> Agent:
+    """An agent whose `flaky` tool fails with `error` on its first call."""
+    flaky_agent = Agent(FunctionModel(call_flaky_once))
+    failed: list[Exception] = []
+
+    @flaky_agent.tool_plain(metadata=metadata)
+    async def flaky() -> str:
+        if not failed:
+            failed.append(error)
+            raise error
+        return "ok"
+
+    return flaky_agent
+
+
+@run_sync
+async def test_model_retry_is_handled_the_same_batched_or_not():
+    for metadata in (None, BATCHED_TOOL_METADATA):
+        # Restate retries the step, the model never sees the failure.
+        retried = flaky_agent(metadata, ModelRetry("try again"))
+        result, ctx = await run_handler(
+            lambda ctx: RestateAgent(
+                retried,
+                restate_context=ctx,
+                run_policies=RunPolicyRegistry(),
+            ).run("Go")
+        )
+        assert result.output == "tool-return: ok", (metadata, result.output)
+        assert ctx.names == ["Model call", "Calling flaky", "Model call"], ctx.names
+
+        # With fast_fail the model is asked to retry instead.
+        fast_failed = flaky_agent(metadata, ModelRetry("try again"))
+        result, ctx = await run_handler(
+            lambda ctx: RestateAgent(
+                fast_failed,
+                restate_context=ctx,
+                run_policies=RunPolicyRegistry(default=RunPolicy(fast_fail=True)),
+            ).run("Go")
+        )
+        assert result.output == "retry-prompt: try again", (metadata, result.output)
+
+
+@run_sync
+async def test_batched_tool_calls_are_bounded_by_the_attempt_timeout():
+    slow_agent = Agent(FunctionModel(call_flaky_once))
+
+    @slow_agent.tool_plain(metadata=BATCHED_TOOL_METADATA)
+    async def flaky() -> str:
+        await asyncio.sleep(10)
+        return "ok"
+
+    policies = RunPolicyRegistry(
+        default=RunPolicy(attempt_timeout=timedelta(milliseconds=10), fast_fail=True)
+    )
+    ctx = FakeContext()
+    result = await RestateAgent(
+        slow_agent, restate_context=ctx, run_policies=policies
+    ).run("Go")
+    assert result.output == "retry-prompt: TimeoutError", result.output
@@ -0,0 +1,117 @@
+import json
+from pathlib import Path
+from unittest import mock
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+import app.search as search
+import app.weather_advanced as weather_advanced
+from app.clients.mapbox import LatLng
+from app.clients.weather import WeatherReport
+from app.schemas.tavily import TavilyResponse
+from app.schemas.weather import CityWeather
+from tests.fakes import FakeContext, run_sync
+
+RESPONSES = Path(__file__).parent.parent / "responses"
+
+
+async def fake_geocode(*args) -> LatLng:
+    return LatLng(lat=35.68, lng=139.76)
+
+
+async def fake_fetch_weather(*args) -> WeatherReport:
+    return WeatherReport(temperature="21°C", description="Sunny")
+
+
+async def fake_search(*args, **kwargs) -> TavilyResponse:
+    return TavilyResponse.model_validate(
+        json.loads((RESPONSES / "search_results.json").read_text())
+    )
+
+
+def call_once(tool: str, args: dict) -> FunctionModel:
+    """Calls `tool` with `args`, then answers with what the tool returned."""
+
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        returns = [
+            part
+            for message in messages
+            for part in message.parts
+            if isinstance(part, ToolReturnPart)
+        ]
+        if not returns:
+            return ModelResponse(parts=[ToolCallPart(tool, args)])
+        return ModelResponse(parts=[TextPart(returns[0].model_response_str())])
+
+    return FunctionModel(respond)
+
+
+async def ask_weather(ctx: FakeContext) -> str:
+    model = call_once("get_weather_for_location", {"location_description": "Tokyo"})
+    agent = Agent(model, toolsets=weather_advanced.weather_agent.toolsets)
+    with (
+        mock.patch.object(weather_advanced, "weather_agent", agent),
+        mock.patch.object(weather_advanced.mapbox, "geocode", fake_geocode),
+        mock.patch.object(
+            weather_advanced.weather_client, "fetch_weather", fake_fetch_weather
+        ),
+    ):
+        return await weather_advanced.handle_weather_request(
+            ctx, weather_advanced.Prompt(city_or_cities="Tokyo")
+        )
+
+
+async def ask_search(ctx: FakeContext) -> str:
+    model = call_once("tavily_search", {"query": "box scores"})
+    agent = Agent(model, toolsets=search.search_agent.toolsets)
+    with (
+        mock.patch.object(search, "search_agent", agent),
+        mock.patch.object(search.tavily, "search", fake_search),
+    ):
+        return await search.handle_search_request(ctx, search.Prompt())
+
+
+@run_sync
+async def test_combined_tool_journals_its_own_steps():
+    ctx = FakeContext()
+    output = await ask_weather(ctx)
+    weather = CityWeather.model_validate_json(output)
+    assert weather == CityWeather(
+        location="Tokyo",
+        lat=35.68,
+        lng=139.76,
+        temperature="21°C",
+        description="Sunny",
+    ), weather
+    assert ctx.names == [
+        "Model call",
+        "Getting lat/lng",
+        "Fetching weather",
+        "Model call",
+    ], ctx.names
+    replayed = FakeContext(journal=ctx.journal)
+    assert await ask_weather(replayed) == output
+    assert replayed.calls == [], replayed.calls
+
+
+@run_sync
+async def test_search_tool_journals_its_own_step():
+    ctx = FakeContext()
+    output = await ask_search(ctx)
+    assert ctx.names == [
+        "Getting todays date",
+        "Model call",
+        "Getting search results",
+        "Model call",
+    ], ctx.names
+    replayed = FakeContext(journal=ctx.journal)
+    assert await ask_search(replayed) == output
+    assert replayed.calls == [], replayed.calls
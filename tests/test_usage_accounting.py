@@ -0,0 +1,113 @@
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.usage import RequestUsage, UsageLimits
+from restate import Context, RunOptions, TerminalError
+
+from app.restate import (
+    RestateAgent,
+    WorkflowBudget,
+    invocation_usage,
+    journal_usage,
+    set_budget,
+)
+from tests.fakes import FakeContext, run_handler, run_sync
+
+
+def tool_then_answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    usage = RequestUsage(input_tokens=100, output_tokens=10, cache_read_tokens=40)
+    if len(messages) == 1 and info.function_tools:
+        return ModelResponse(parts=[ToolCallPart("lookup", {})], usage=usage)
+    return ModelResponse(parts=[TextPart("done")], usage=usage)
+
+
+researcher = Agent(FunctionModel(tool_then_answer), name="researcher")
+writer = Agent(FunctionModel(tool_then_answer))
+
+
+@researcher.tool_plain
+def lookup() -> str:
+    return "found"
+
+
+async def run_both(ctx: FakeContext) -> None:
+    await RestateAgent(researcher, ctx).run("Research")
+    await RestateAgent(writer, ctx, step="Writing").run("Write")
+
+
+@run_sync
+async def test_adds_up_usage_by_step():
+    ctx = FakeContext()
+    await run_both(ctx)
+    usage = invocation_usage(ctx)
+    assert list(usage.steps) == ["researcher", "Writing"], usage.steps
+    research = usage.steps["researcher"].usage
+    assert (research.requests, research.tool_calls) == (2, 1), research
+    assert research.input_tokens == 200 and research.cache_read_tokens == 80
+    total = usage.total
+    assert (total.requests, total.total_tokens) == (3, 330), total
+
+
+@run_sync
+async def test_replay_adds_up_to_the_same_usage():
+    ctx = FakeContext()
+    await run_both(ctx)
+    replayed = FakeContext(journal=ctx.journal)
+    await run_both(replayed)
+    assert invocation_usage(replayed).total == invocation_usage(ctx).total
+
+
+@run_sync
+async def test_journaled_usage_replaces_replayed_usage():
+    ctx = FakeContext()
+    await run_both(ctx)
+    await journal_usage(ctx)
+    # A replay that skips both agents, as if they ran inside a journaled `ctx.run`.
+    replayed = FakeContext(journal=ctx.journal[-1:])
+    usage = await journal_usage(replayed)
+    assert usage.total == invocation_usage(ctx).total, usage
+
+
+@run_sync
+async def test_limits_apply_to_the_whole_invocation():
+    ctx = FakeContext()
+    await set_budget(ctx, WorkflowBudget(limits=UsageLimits(request_limit=2)))
+    try:
+        await run_both(ctx)
+    except TerminalError as e:
+        assert "used up its budget after 2 model calls" in str(e), e
+    else:
+        raise AssertionError("expected a TerminalError")
+    # The researcher used both requests, the writer was stopped before calling.
+    assert invocation_usage(ctx).total.requests == 2
+
+
+@run_sync
+async def test_retried_step_sees_the_replayed_usage():
+    seen: list[int] = []
+
+    async def search(ctx: Context) -> str:
+        seen.append(invocation_usage(ctx).total.requests)
+        invocation_usage(ctx).check_budget()
+        if len(seen) == 1:
+            raise ConnectionError("search failed")
+        return "results"
+
+    async def handler(ctx: FakeContext) -> None:
+        await set_budget(ctx, WorkflowBudget(limits=UsageLimits(request_limit=3)))
+        await RestateAgent(researcher, ctx).run("Research")
+        await ctx.run_typed(
+            "Searching", search, RunOptions(max_attempts=3, type_hint=str), ctx
+        )
+        await RestateAgent(writer, ctx, step="Writing").run("Write")
+
+    _, ctx = await run_handler(handler)
+    # The retry replays the researcher's model calls, which count towards the budget.
+    assert seen == [2, 2], seen
+    assert ctx.calls == ["Searching", "Model call"], ctx.calls
+    assert invocation_usage(ctx).total.requests == 3
@@ -0,0 +1,65 @@
+import asyncio
+from unittest import mock
+
+from restate import TerminalError
+
+from app import weather
+from app.schemas.weather import CityWeather
+from app.weather import Deps, WeatherBatchRequest, handle_weather_batch
+from tests.fakes import FakeContext, fake_wait_completed, run_sync
+
+LOCATIONS = ["Slow", "Tokyo", "Paris", "Atlantis", "Toronto", "Lima", "Oslo", "Rome"]
+
+
+class FakeLookups:
+    """Looks up cities instantly, except "Slow", which only completes once every
+    other city is done, and "Atlantis", which fails."""
+
+    def __init__(self) -> None:
+        self.running = 0
+        self.max_running = 0
+        self.others_done = asyncio.Event()
+        self.done: list[str] = []
+
+    async def fetch(self, deps: Deps, location: str) -> CityWeather:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if location == "Slow":
+                await asyncio.wait_for(self.others_done.wait(), timeout=1)
+            else:
+                await asyncio.sleep(0)
+            if location == "Atlantis":
+                raise TerminalError("Could not find the location")
+            return CityWeather(location=location, temperature="20°C")
+        finally:
+            self.running -= 1
+            self.done.append(location)
+            if len(self.done) == len(LOCATIONS) - 1:
+                self.others_done.set()
+
+
+async def fetch_batch(ctx: FakeContext, lookups: FakeLookups):
+    with (
+        mock.patch.object(weather, "fetch_city_weather", lookups.fetch),
+        mock.patch.object(weather, "BATCH_FAN_OUT", 3),
+        fake_wait_completed(),
+    ):
+        return await handle_weather_batch(ctx, WeatherBatchRequest(locations=LOCATIONS))
+
+
+@run_sync
+async def test_a_slow_city_does_not_hold_up_the_others():
+    lookups = FakeLookups()
+    ctx = FakeContext()
+    response = await fetch_batch(ctx, lookups)
+    assert lookups.done[-1] == "Slow", lookups.done
+    assert lookups.max_running == 3, lookups.max_running
+    assert [city.location for city in response.results] == LOCATIONS
+    errors = {city.location: city.error for city in response.results if city.error}
+    assert errors == {"Atlantis": "Could not find the location"}, errors
+
+    # The steps are journaled in the order of the locations, so a replay matches.
+    replayed = FakeContext(ctx.journal)
+    assert await fetch_batch(replayed, FakeLookups()) == response
+    assert replayed.calls == [], replayed.calls
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.usage import RequestUsage, UsageLimits
+from restate import TerminalError
+
+from app.restate import (
+    RestateAgent,
+    WorkflowBudget,
+    invocation_usage,
+    set_budget,
+)
+from tests.fakes import FakeContext, run_sync
+
+
+def answer_as(name: str) -> FunctionModel:
+    """A model that answers with its name and the length of the prompt it got."""
+
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        prompt = next(
+            p.content for p in messages[-1].parts if isinstance(p, UserPromptPart)
+        )
+        return ModelResponse(
+            parts=[TextPart(f"{name}:{len(prompt)}")],
+            usage=RequestUsage(input_tokens=400, output_tokens=100),
+        )
+
+    return FunctionModel(respond, model_name=name)
+
+
+agent = Agent(answer_as("large"))
+small = answer_as("small")
+
+BUDGET = WorkflowBudget(
+    limits=UsageLimits(total_tokens_limit=2000),
+    degrade_at=0.5,
+    degraded_model=small,
+    max_degraded_part_chars=10,
+)
+
+
+async def run_steps(ctx: FakeContext, steps: int) -> list[str]:
+    restate_agent = RestateAgent(agent, ctx)
+    return [(await restate_agent.run("x" * 50)).output for _ in range(steps)]
+
+
+@run_sync
+async def test_degrades_then_stops():
+    ctx = FakeContext()
+    await set_budget(ctx, BUDGET)
+    outputs = await run_steps(ctx, 4)
+    # 500 tokens per call: the third call starts with half the budget used.
+    assert outputs == ["large:50", "large:50", "small:22", "small:22"], outputs
+    try:
+        await run_steps(ctx, 1)
+    except TerminalError as e:
+        assert "used up its budget after 4 model calls, 2000 tokens" in str(e), e
+    else:
+        raise AssertionError("expected a TerminalError")
+
+
+@run_sync
+async def test_replay_ignores_the_clock():
+    ctx = FakeContext()
+    await set_budget(ctx, WorkflowBudget(wall_time=timedelta(seconds=60)))
+    outputs = await run_steps(ctx, 2)
+    # Replayed long after the wall time ran out, the journaled calls still replay.
+    replayed = FakeContext(journal=ctx.journal)
+    await set_budget(replayed, WorkflowBudget(wall_time=timedelta(seconds=60)))
+    usage = invocation_usage(replayed)
+    assert usage.budget_started is not None
+    usage.budget_started -= 3600
+    assert await run_steps(replayed, 2) == outputs
+    try:
+        await run_steps(replayed, 1)
+    except TerminalError as e:
+        assert "used up its budget" in str(e), e
+    else:
+        raise AssertionError("expected a TerminalError")